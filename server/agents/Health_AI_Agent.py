@@ -2,45 +2,114 @@
 import os
 import logging
 import json
-import base64
-import subprocess
 import asyncio
+import copy
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime
-from operator import itemgetter
 
 # LangChain / langchain_core
-from langchain.chains import LLMChain
 from langchain.memory.chat_memory import BaseChatMemory
-from langchain.agents import initialize_agent, AgentType
+from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain.memory.summary import ConversationSummaryMemory
 from langchain_core.messages import trim_messages
-from langchain_core.messages.human import HumanMessage
 from langchain_core.messages.system import SystemMessage
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.runnables import RunnablePassthrough
 
 # MongoDB Chat
-from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
-
-# Pydub for audio
-from pydub import AudioSegment
+from services.db.chat_turns import ChatTurnHistory
+from services.db.chat_summary import (
+    search_past_summaries,
+    asearch_past_summaries,
+    index_chat_summary,
+    aindex_chat_summary,
+    invalidate_past_summaries,
+    ainvalidate_past_summaries,
+)
 
 # Custom modules
 from .ai_agent import AIAgent
+from .prompts import AGENT_PROMPT, assemble_prompt_inputs
 from services.azure_mongodb import MongoDBClient
+from services.ai import get_deepseek_llm
+from services.llm_cache import get_llm_cache, normalize_text, is_semantic_lookup_enabled
 from services.azure_form_recognizer import extract_text_from_file
 from services.text_to_speech_service import text_to_speech
 from models.user import User
-from services.db.user import get_user_profile_by_user_id
-from utils.consts import SYSTEM_MESSAGE
-from utils.agents import fetch_meme  # or as needed
+from services.db.user import (
+    get_user_profile_by_user_id,
+    aget_user_profile_by_user_id,
+    get_preferred_language,
+    aget_preferred_language,
+)
+from utils.consts import (
+    SYSTEM_MESSAGE,
+    MEME_BRANCH_TIMEOUT,
+    TTS_BRANCH_TIMEOUT,
+    POST_RESPONSE_MAX_WORKERS,
+    SUMMARY_MAX_WORKERS,
+    CHAT_HISTORY_MAX_MESSAGES,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    MEME_TOPIC_KEY_TOKENS,
+)
+from services.meme_catalog import meme_catalog
+from agents.tool_executor import ParallelToolAgentExecutor
+
+# Shared by every agent in the process for the meme and TTS branches of a turn
+_post_response_pool = ThreadPoolExecutor(max_workers=POST_RESPONSE_MAX_WORKERS, thread_name_prefix="post-response")
+# Rolling summary updates that run after a turn has been answered
+_summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS, thread_name_prefix="rolling-summary")
+_background_tasks = set()
+
+
+class _StreamCancelled(Exception):
+    """
+    Raised inside a streaming agent run once its client has disconnected.
+    """
+
+
+class _StreamingQueueHandler(BaseCallbackHandler):
+    """
+    Forwards generated tokens and tool calls from an agent run to a queue, and stops
+    the run at its next model call or token once the stream has been cancelled.
+    """
+
+    # Let _StreamCancelled propagate out of the run instead of being logged and ignored
+    raise_error = True
+
+    def __init__(self, events: queue.Queue, cancelled: threading.Event):
+        self.events = events
+        self.cancelled = cancelled
+
+    def _check_cancelled(self):
+        if self.cancelled.is_set():
+            raise _StreamCancelled()
+
+    def on_chat_model_start(self, serialized: dict, messages: list, **kwargs) -> None:
+        self._check_cancelled()
+
+    def on_llm_start(self, serialized: dict, prompts: list, **kwargs) -> None:
+        self._check_cancelled()
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self._check_cancelled()
+        # Function-call deltas arrive with empty content
+        if token:
+            self.events.put(("token", {"token": token}))
+
+    def on_tool_start(self, serialized: dict, input_str: str, **kwargs) -> None:
+        self.events.put(("tool", {"name": (serialized or {}).get("name")}))
+
 
 class HealthAIAgent(AIAgent):
     """
     A class that retains user mood logic, memory stubs, and advanced functionality,
-    but uses OPENAI_FUNCTIONS to avoid streaming with tool calls.
+    and runs a tool-calling agent whose parallel tool calls execute concurrently.
     """
 
     def __init__(
@@ -58,25 +127,9 @@ class HealthAIAgent(AIAgent):
 
         super().__init__(formatted_system_message, tool_names)
 
-        # This prompt skeleton includes placeholders for 'past_summaries' and others
-        # plus old "MessagesPlaceholder" for advanced memory usage if needed
-        self.base_prompt_messages = [
-            ("system", self.system_message.content),
-            ("system", "{past_summaries}"),
-            ("system", "You can retrieve information about the AI using the 'agent_facts' tool."),
-            ("system", "You can generate suggestions using the 'generate_suggestions' tool."),
-            ("system", "You can search for information using the 'web_search_bing' tool."),
-            ("system", "You can search for textbook PDFs using the 'textbook_search' tool."),
-            ("system", "You can search for textbooks using the 'gutendex_textbook_search' tool."),
-            ("system", "You can search for information using the 'web_search_tavily' tool."),
-            ("system", "You can search for locations using the 'location_search_gplaces' tool."),
-            ("system", "You can retrieve your user profile using the 'user_profile_retrieval' tool."),
-            ("system", "You can generate documents using the 'generate_document' tool."),
-            ("system", "You can fetch popular memes using the 'fetch_meme' tool."),
-            ("system", "user_id:{user_id}"),       
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),  # If your chain uses an internal scratchpad
-        ]
+        # One-off instructions for the next turn (e.g. the greeting); they go into the
+        # variable part of the prompt so the compiled prefix stays identical across turns
+        self.turn_instructions = ""
 
         # Directory for generated audio
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -84,25 +137,47 @@ class HealthAIAgent(AIAgent):
         self.generated_audio_dir = os.path.join(project_root, "generated_audio")
         os.makedirs(self.generated_audio_dir, exist_ok=True)
 
-        # We'll create the agent later (non-streaming). 
+        # We'll create the agents later (non-streaming and streaming).
         self.agent_executor = None
+        self.streaming_agent_executor = None
+        # Both wrapped once with the windowed chat history
+        self.agent_with_history = None
+        self.streaming_agent_with_history = None
+
+    def spawn(self) -> "HealthAIAgent":
+        """
+        Returns a cheap per-request view of this agent. The view shares the LLM, embeddings,
+        tools and agent executor, but owns its system message and turn instructions so
+        per-request edits stay local.
+        """
+        view = copy.copy(self)
+        view.system_message = SystemMessage(content=self.system_message.content)
+        view.turn_instructions = ""
+        return view
 
     # ---------------------------------------------------------------------
     # 1) GET/SET Chat History & Memory
     # ---------------------------------------------------------------------
-    def get_session_history(self, session_id: str) -> MongoDBChatMessageHistory:
+    def get_session_history(self, session_id: str) -> ChatTurnHistory:
         """
         Retrieves chat history for a session from MongoDB.
         """
-        CONNECTION_STRING = MongoDBClient.get_mongodb_variables()
-        history = MongoDBChatMessageHistory(
-            CONNECTION_STRING,
+        history = ChatTurnHistory(session_id)
+        logging.info(f"Retrieved chat history for session {session_id}")
+        return history
+
+    def get_windowed_session_history(self, session_id: str) -> ChatTurnHistory:
+        """
+        Retrieves the recent window of a session's chat history, bounded by
+        CHAT_HISTORY_MAX_MESSAGES and CHAT_HISTORY_TOKEN_BUDGET. Older turns are
+        replaced by the chat's rolling summary.
+        """
+        return ChatTurnHistory(
             session_id,
-            MongoDBClient.get_db_name(),
-            collection_name="chat_turns"
+            max_messages=CHAT_HISTORY_MAX_MESSAGES,
+            token_budget=CHAT_HISTORY_TOKEN_BUDGET,
+            include_summary=True,
         )
-        logging.info(f"Retrieved chat history for session {session_id}")
-        return history or []
 
     def get_agent_memory(self, user_id: str, chat_id: int) -> BaseChatMemory:
         """
@@ -119,7 +194,7 @@ class HealthAIAgent(AIAgent):
         """
         agent_with_history = RunnableWithMessageHistory(
             executor,
-            get_session_history=self.get_session_history,
+            get_session_history=self.get_windowed_session_history,
             input_messages_key="input",
             history_messages_key="chat_turns",
             verbose=True
@@ -129,13 +204,24 @@ class HealthAIAgent(AIAgent):
     # ---------------------------------------------------------------------
     # 2) OLD MOOD LOGIC
     # ---------------------------------------------------------------------
-    def get_user_mood(self, user_id, chat_id) -> str:
+    def _get_mood_trimmer(self):
         """
-        Analyzes session history from MongoDB to detect user's mood in a single adjective.
+        Builds the trimmer that keeps the last messages the mood is read from.
         """
-        history: BaseChatMessageHistory = self.get_session_history(f"{user_id}-{chat_id}")
-        history_log = asyncio.run(history.aget_messages())
+        # Trim messages if they're too large
+        return trim_messages(
+            max_tokens=65,
+            strategy="last",
+            token_counter=self.llm,
+            include_system=True,
+            allow_partial=False,
+            start_on="human",
+        )
 
+    def _get_mood_chain(self):
+        """
+        Builds the chain that reads the user's mood from the trimmed session history.
+        """
         # We'll ask the LLM to interpret the mood:
         instructions = """
         Given the messages provided, describe the user's mood in a single adjective.
@@ -149,26 +235,50 @@ class HealthAIAgent(AIAgent):
                 MessagesPlaceholder(variable_name="messages"),
             ]
         )
+        return prompt | self.llm
 
-        # Trim messages if they're too large
-        trimmer = trim_messages(
-            max_tokens=65,
-            strategy="last",
-            token_counter=self.llm,
-            include_system=True,
-            allow_partial=False,
-            start_on="human",
-        )
-        trimmer.invoke(history_log)
+    @staticmethod
+    def _get_mood_cache_key(messages: list) -> str:
+        return "\n".join(f"{message.type}: {message.content}" for message in messages)
 
-        chain = RunnablePassthrough.assign(messages=itemgetter("messages") | trimmer) | prompt | self.llm
-        response = chain.invoke({"messages": history_log})
+    @staticmethod
+    def _parse_mood(response) -> str:
         mood = response.content.strip()
         if mood == "None":
             mood = "neutral"
         logging.info(f"The user is feeling: {mood}")
         return mood
 
+    def get_user_mood(self, user_id, chat_id) -> str:
+        """
+        Analyzes session history from MongoDB to detect user's mood in a single adjective.
+        Answers are cached by the trimmed messages, so repeated exchanges skip the LLM call.
+        """
+        # The mood chain trims to the last few messages, so only the recent window is loaded
+        history: BaseChatMessageHistory = ChatTurnHistory(f"{user_id}-{chat_id}", max_messages=CHAT_HISTORY_MAX_MESSAGES)
+        trimmed = self._get_mood_trimmer().invoke(history.messages)
+
+        return get_llm_cache("mood", self.embedding_model).get_or_compute(
+            self._get_mood_cache_key(trimmed),
+            lambda: self._parse_mood(self._get_mood_chain().invoke({"messages": trimmed})),
+        )
+
+    async def aget_user_mood(self, user_id, chat_id) -> str:
+        """
+        Async version of get_user_mood.
+        """
+        # The mood chain trims to the last few messages, so only the recent window is loaded
+        history: BaseChatMessageHistory = ChatTurnHistory(f"{user_id}-{chat_id}", max_messages=CHAT_HISTORY_MAX_MESSAGES)
+        # The trimmer counts tokens with the LLM's tokenizer, which is CPU-bound (and may load its encoding)
+        trimmed = await asyncio.to_thread(self._get_mood_trimmer().invoke, await history.aget_messages())
+
+        async def compute():
+            return self._parse_mood(await self._get_mood_chain().ainvoke({"messages": trimmed}))
+
+        return await get_llm_cache("mood", self.embedding_model).aget_or_compute(
+            self._get_mood_cache_key(trimmed), compute
+        )
+
     # ---------------------------------------------------------------------
     # 3) Chat ID Helper
     # ---------------------------------------------------------------------
@@ -190,41 +300,66 @@ class HealthAIAgent(AIAgent):
             return most_recent_chat_summary.get("chat_id")
         return None
 
+    @staticmethod
+    async def aget_chat_id(user_id):
+        """
+        Async version of get_chat_id.
+        """
+        db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+        most_recent_chat_summary = await db["chat_summaries"].find_one(
+            {"user_id": user_id},
+            sort=[("chat_id", -1)]
+        )
+        if most_recent_chat_summary:
+            return most_recent_chat_summary.get("chat_id")
+        return None
+
     # ---------------------------------------------------------------------
-    # 4) INITIALIZE AGENT with AgentType.OPENAI_FUNCTIONS (NO streaming)
+    # 4) INITIALIZE AGENT with parallel tool calls
     # ---------------------------------------------------------------------
-    def _initialize_agent_executor(self):
+    def _build_executor(self, llm) -> AgentExecutor:
         """
-        Creates a non-streaming function-calling agent with OPENAI_FUNCTIONS.
+        Builds a tool-calling agent executor on the shared prompt of agents/prompts.py.
+        The model may request several tools in one response; they run concurrently.
         """
-        if self.agent_executor is not None:
-            return  # Only create once
-
-        # Instead of create_tool_calling_agent, we do:
-        self.agent_executor = initialize_agent(
+        agent = create_openai_tools_agent(llm, self.tools, AGENT_PROMPT)
+        return ParallelToolAgentExecutor(
+            agent=agent,
             tools=self.tools,
-            llm=self.llm,
-            agent=AgentType.OPENAI_FUNCTIONS,  # Key to no streaming
             verbose=True,
             handle_parsing_errors=True
         )
 
+    def _initialize_agent_executor(self):
+        """
+        Creates a non-streaming tool-calling agent with parallel tool calls,
+        plus a token-streaming twin used by the SSE endpoint.
+        """
+        if self.agent_executor is not None:
+            return  # Only create once
+
+        self.agent_executor = self._build_executor(self.llm)
+
+        # Same agent on a streaming LLM; tool calls are aggregated from the stream
+        self.streaming_agent_executor = self._build_executor(get_deepseek_llm(streaming=True))
+
+        self.agent_with_history = self.get_agent_with_history(self.agent_executor)
+        self.streaming_agent_with_history = self.get_agent_with_history(self.streaming_agent_executor)
+
     # ---------------------------------------------------------------------
     # 5) MAIN RUN METHOD
     # ---------------------------------------------------------------------
-    def run(
+    def _prepare_turn(
         self,
         message: str,
         file_content: bytes = None,
         file_mime_type: str = None,
-        with_history: bool = True,
         user_id: str = None,
-        chat_id: int = None,
-        turn_id: int = None
-    ) -> dict:
+        chat_id: int = None
+    ) -> tuple:
         """
-        Primary method: processes user input, optionally file content,
-        returns a dict with AI text + meme + audio, etc.
+        Resolves the chat and builds the agent inputs for one turn.
+        Returns (chat_id, session_id, inputs).
         """
         # If chat_id not provided, fetch the most recent from DB
         if chat_id is None:
@@ -232,15 +367,9 @@ class HealthAIAgent(AIAgent):
 
         session_id = f"{user_id}-{chat_id}"
 
-        # Grab past conversation summaries from DB
-        db_client = MongoDBClient.get_client()
-        db_name = MongoDBClient.get_db_name()
-        db = db_client[db_name]
-        chat_summary_collection = db["chat_summaries"]
-
-        past_summaries_cursor = chat_summary_collection.find({"user_id": user_id}).sort("chat_id", -1)
-        past_summaries = list(past_summaries_cursor)
-        summaries_text = "\n".join([summary.get("summary_text", "") for summary in past_summaries])
+        # Grab the past conversation summaries most relevant to the message, within the token budget
+        summaries_text = search_past_summaries(user_id, message, exclude_chat_id=chat_id)
+        language = get_preferred_language(user_id)
 
         # If we have a file, extract text
         extracted_text = ""
@@ -248,66 +377,264 @@ class HealthAIAgent(AIAgent):
             extracted_text = extract_text_from_file(file_content, file_mime_type)
             logging.info(f"Extracted text from file: {extracted_text[:500]}")
 
-        # Build final set of system/human messages
-        prompt_messages = self.base_prompt_messages.copy()
-        if extracted_text:
-            # Insert an extra system message describing the file content
-            prompt_messages.insert(
-                2,
-                ("system", f"The user has provided a document:\n{extracted_text}")
-            )
+        inputs = self._build_inputs(message, user_id, language, summaries_text, extracted_text)
+        return chat_id, session_id, inputs
 
-        # Turn these messages into a ChatPromptTemplate
-        prompt = ChatPromptTemplate.from_messages(prompt_messages)
+    async def _aprepare_turn(
+        self,
+        message: str,
+        file_content: bytes = None,
+        file_mime_type: str = None,
+        user_id: str = None,
+        chat_id: int = None
+    ) -> tuple:
+        """
+        Async version of _prepare_turn.
+        """
+        if chat_id is None:
+            chat_id = await self.aget_chat_id(user_id)
 
-        # Render the final prompt
-        rendered_prompt = prompt.format(
-            input=message,
-            user_id=user_id,
+        session_id = f"{user_id}-{chat_id}"
+
+        summaries_text, language = await asyncio.gather(
+            asearch_past_summaries(user_id, message, exclude_chat_id=chat_id),
+            aget_preferred_language(user_id),
+        )
+
+        extracted_text = ""
+        if file_content and file_mime_type:
+            # The Form Recognizer client is synchronous
+            extracted_text = await asyncio.to_thread(extract_text_from_file, file_content, file_mime_type)
+            logging.info(f"Extracted text from file: {extracted_text[:500]}")
+
+        inputs = self._build_inputs(message, user_id, language, summaries_text, extracted_text)
+        return chat_id, session_id, inputs
+
+    def _build_inputs(self, message: str, user_id: str, language: str, summaries_text: str, extracted_text: str) -> dict:
+        """
+        Builds the agent inputs: the compiled prefix of this role and language, then the
+        per-turn context, then the user's message. Only the message is stored in the history.
+        """
+        inputs, _ = assemble_prompt_inputs(
+            self.desired_role,
+            message,
+            user_id,
+            language=language,
             past_summaries=summaries_text,
-            agent_scratchpad= [],
+            document_text=extracted_text,
+            instructions=self.turn_instructions,
         )
+        return inputs
 
-        # Initialize our function-calling agent if not done already
-        self._initialize_agent_executor()
+    def _get_runnable(self, with_history: bool, streaming: bool = False):
+        """
+        Returns the agent executor to run, wrapped with the chat history if requested.
+        """
+        if streaming:
+            return self.streaming_agent_with_history if with_history else self.streaming_agent_executor
+        return self.agent_with_history if with_history else self.agent_executor
 
-        # If you want to wrap with memory/history, do so:
+    def _invoke_executor(self, inputs: dict, session_id: str, with_history: bool = True, callbacks: list = None, streaming: bool = False) -> str:
+        """
+        Runs the agent on the turn inputs and returns the AI text response.
+        """
+        config = {"callbacks": callbacks} if callbacks else {}
         if with_history:
-            self.agent_executor = self.get_agent_with_history(self.agent_executor)
-            result = self.agent_executor.invoke(
-                {"input": rendered_prompt},
-                config={"configurable": {"session_id": session_id}}
-            )
-            ai_text_response = result["output"]
-        else:
-            ai_text_response = self.agent_executor.run(rendered_prompt)
+            config["configurable"] = {"session_id": session_id}
+        result = self._get_runnable(with_history, streaming).invoke(inputs, config=config)
+        return result["output"]
 
+    def run(
+        self,
+        message: str,
+        file_content: bytes = None,
+        file_mime_type: str = None,
+        with_history: bool = True,
+        user_id: str = None,
+        chat_id: int = None,
+        turn_id: int = None
+    ) -> dict:
+        """
+        Primary method: processes user input, optionally file content,
+        returns a dict with AI text + meme + audio, etc.
+        """
+        chat_id, session_id, inputs = self._prepare_turn(
+            message, file_content, file_mime_type, user_id, chat_id
+        )
 
-        try:
+        # Initialize our function-calling agent if not done already
+        self._initialize_agent_executor()
 
-            # If it's the first turn, is_initial = True
-            is_initial = (turn_id == 0)
+        ai_text_response = self._invoke_executor(inputs, session_id, with_history)
+        if with_history:
+            self._schedule_summary_update(user_id, chat_id)
 
-            # Meme logic
-            meme_topic = self.determine_meme_topic(ai_text_response, is_initial=is_initial)
-            fetch_meme_tool = self.get_tool_by_name("fetch_meme")
-            meme_url = fetch_meme_tool.func(meme_topic) if fetch_meme_tool else None
+        try:
+            return self._post_process(ai_text_response, user_id, chat_id, turn_id)
+        except Exception as e:
+            logging.error(f"Error during agent execution: {e}", exc_info=True)
+            raise
 
-            # TTS
-            audio_url = self.convert_text_to_speech(ai_text_response, user_id, chat_id, turn_id)
+    async def _ainvoke_executor(self, inputs: dict, session_id: str, with_history: bool = True) -> str:
+        """
+        Async version of _invoke_executor.
+        """
+        config = {"configurable": {"session_id": session_id}} if with_history else {}
+        result = await self._get_runnable(with_history).ainvoke(inputs, config=config)
+        return result["output"]
 
+    async def arun(
+        self,
+        message: str,
+        file_content: bytes = None,
+        file_mime_type: str = None,
+        with_history: bool = True,
+        user_id: str = None,
+        chat_id: int = None,
+        turn_id: int = None
+    ) -> dict:
+        """
+        Async version of run(), for the async request path.
+        """
+        chat_id, session_id, inputs = await self._aprepare_turn(
+            message, file_content, file_mime_type, user_id, chat_id
+        )
+        self._initialize_agent_executor()
 
-            # Return structured
-            return {
-                "message": ai_text_response,
-                "meme_url": meme_url,
-                "audio_url": audio_url,
-            }
+        ai_text_response = await self._ainvoke_executor(inputs, session_id, with_history)
+        if with_history:
+            self._aschedule_summary_update(user_id, chat_id)
 
+        try:
+            return await self._apost_process(ai_text_response, user_id, chat_id, turn_id)
         except Exception as e:
             logging.error(f"Error during agent execution: {e}", exc_info=True)
             raise
 
+    def stream(
+        self,
+        message: str,
+        file_content: bytes = None,
+        file_mime_type: str = None,
+        with_history: bool = True,
+        user_id: str = None,
+        chat_id: int = None,
+        turn_id: int = None
+    ):
+        """
+        Streaming variant of run(). Yields (event, data) tuples: a "token" event per
+        generated token, a "tool" event whenever the agent calls a tool, then a single
+        "done" event carrying the same dict run() returns, or an "error" event.
+
+        Closing the generator (the client disconnected) cancels the run: it stops at its
+        next model call or token, tool calls already in flight end within their budgets,
+        and neither the history nor the post-processing of the turn is written.
+        """
+        chat_id, session_id, inputs = self._prepare_turn(
+            message, file_content, file_mime_type, user_id, chat_id
+        )
+        self._initialize_agent_executor()
+
+        events = queue.Queue()
+        cancelled = threading.Event()
+        handler = _StreamingQueueHandler(events, cancelled)
+
+        def worker():
+            try:
+                ai_text_response = self._invoke_executor(
+                    inputs, session_id, with_history, callbacks=[handler], streaming=True
+                )
+                if cancelled.is_set():
+                    raise _StreamCancelled()
+                if with_history:
+                    self._schedule_summary_update(user_id, chat_id)
+                events.put(("done", self._post_process(ai_text_response, user_id, chat_id, turn_id)))
+            except _StreamCancelled:
+                logging.info(f"Streaming turn of chat {chat_id} for user {user_id} cancelled by the client.")
+            except Exception as e:
+                logging.error(f"Error during streaming agent execution: {e}", exc_info=True)
+                events.put(("error", {"error": str(e)}))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+        try:
+            while True:
+                event, data = events.get()
+                yield event, data
+                if event in ("done", "error"):
+                    return
+        finally:
+            # Runs on GeneratorExit as well; a finished worker ignores it
+            cancelled.set()
+
+    def _post_process(self, ai_text_response: str, user_id: str, chat_id: int, turn_id: int) -> dict:
+        """
+        Attaches the meme and the TTS audio to the AI text response.
+        Both branches run concurrently, each bounded by its own deadline; a branch that
+        misses its deadline or fails leaves its field empty instead of failing the turn.
+        """
+        # If it's the first turn, is_initial = True
+        is_initial = (turn_id == 0)
+
+        started = time.monotonic()
+        branches = {
+            "meme_url": (
+                _post_response_pool.submit(self.get_meme_url, ai_text_response, is_initial),
+                MEME_BRANCH_TIMEOUT,
+                None,
+            ),
+            "audio_url": (
+                _post_response_pool.submit(self.convert_text_to_speech, ai_text_response, user_id, chat_id, turn_id),
+                TTS_BRANCH_TIMEOUT,
+                "",
+            ),
+        }
+
+        # Return structured
+        response = {"message": ai_text_response}
+        for key, (future, timeout, fallback) in branches.items():
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                response[key] = future.result(timeout=remaining)
+            except FuturesTimeoutError:
+                logging.warning(f"Post-response branch '{key}' missed its {timeout}s deadline.")
+                response[key] = fallback
+            except Exception as e:
+                logging.error(f"Post-response branch '{key}' failed: {e}", exc_info=True)
+                response[key] = fallback
+
+        logging.info(f"Post-response stage finished in {time.monotonic() - started:.2f}s.")
+        return response
+
+    async def _apost_process(self, ai_text_response: str, user_id: str, chat_id: int, turn_id: int) -> dict:
+        """
+        Async version of _post_process, with the same per-branch deadlines.
+        """
+        is_initial = (turn_id == 0)
+
+        started = time.monotonic()
+        branches = {
+            "meme_url": (self.aget_meme_url(ai_text_response, is_initial), MEME_BRANCH_TIMEOUT, None),
+            "audio_url": (self.aconvert_text_to_speech(ai_text_response, user_id, chat_id, turn_id), TTS_BRANCH_TIMEOUT, ""),
+        }
+        results = await asyncio.gather(
+            *(asyncio.wait_for(branch, timeout) for branch, timeout, _ in branches.values()),
+            return_exceptions=True,
+        )
+
+        response = {"message": ai_text_response}
+        for (key, (_, timeout, fallback)), result in zip(branches.items(), results):
+            if isinstance(result, asyncio.TimeoutError):
+                logging.warning(f"Post-response branch '{key}' missed its {timeout}s deadline.")
+                result = fallback
+            elif isinstance(result, Exception):
+                logging.error(f"Post-response branch '{key}' failed: {result}")
+                result = fallback
+            response[key] = result
+
+        logging.info(f"Post-response stage finished in {time.monotonic() - started:.2f}s.")
+        return response
+
     # ---------------------------------------------------------------------
     # 6) TTS + Meme + Lipsync + Expressions (unchanged from old)
     # ---------------------------------------------------------------------
@@ -320,29 +647,89 @@ class HealthAIAgent(AIAgent):
                 return tool
         return None
 
-    def determine_meme_topic(self, ai_response: str, is_initial: bool = False) -> str:
+    def get_meme_url(self, ai_response: str, is_initial: bool = False) -> str:
         """
-        Asks LLM to decide on a meme topic, narrower if is_initial=True.
+        Picks a meme topic for the AI response and serves a matching meme from the meme catalog.
         """
+        if not self.get_tool_by_name("fetch_meme"):
+            return None
+        meme_topic = self.determine_meme_topic(ai_response, is_initial=is_initial)
+        return meme_catalog.get_meme_url(meme_topic)
+
+    async def aget_meme_url(self, ai_response: str, is_initial: bool = False) -> str:
+        """
+        Async version of get_meme_url.
+        """
+        if not self.get_tool_by_name("fetch_meme"):
+            return None
+        meme_topic = await self.adetermine_meme_topic(ai_response, is_initial=is_initial)
+        return await meme_catalog.aget_meme_url(meme_topic)
+
+    @staticmethod
+    def _get_meme_topic_prompt(ai_response: str, is_initial: bool = False) -> str:
         if is_initial:
-            prompt = (
+            return (
                 "Analyze the following AI response and pick the best welcoming meme topic from the list:\n"
                 "welcome, hello, introduction, greeting.\n\n"
                 f"AI response:\n{ai_response}\n\n"
                 "Return only the topic."
             )
-        else:
-            prompt = (
-                "Analyze the AI response and determine the best meme topic. Return only the topic.\n\n"
-                f"{ai_response}"
-            )
+        return (
+            "Analyze the AI response and determine the best meme topic. Return only the topic.\n\n"
+            f"{ai_response}"
+        )
+
+    def _get_meme_topic_cache(self, is_initial: bool = False):
+        """
+        Returns the meme topic cache, or None unless LLM_CACHE_SEMANTIC is on. Responses
+        rarely repeat word for word, so only the similarity lookup makes the cache pay off.
+        """
+        if not is_semantic_lookup_enabled():
+            return None
+        return get_llm_cache("meme_topic_initial" if is_initial else "meme_topic", self.embedding_model)
+
+    @staticmethod
+    def _get_meme_topic_cache_key(ai_response: str) -> str:
+        # The opening of a response sets its tone; a short key also keeps the embedding call cheap
+        return normalize_text(ai_response, max_tokens=MEME_TOPIC_KEY_TOKENS)
+
+    def determine_meme_topic(self, ai_response: str, is_initial: bool = False) -> str:
+        """
+        Asks LLM to decide on a meme topic, narrower if is_initial=True.
+        With LLM_CACHE_SEMANTIC, topics are cached by the opening of the response, and
+        responses that open alike share a topic.
+        """
+        prompt = self._get_meme_topic_prompt(ai_response, is_initial)
+        cache = self._get_meme_topic_cache(is_initial)
         try:
-            response = self.llm.invoke(prompt)
-            return response.content.strip().lower()
+            if cache is None:
+                return self.llm.invoke(prompt).content.strip().lower()
+            return cache.get_or_compute(
+                self._get_meme_topic_cache_key(ai_response),
+                lambda: self.llm.invoke(prompt).content.strip().lower(),
+            )
         except Exception as e:
             logging.error(f"Meme topic determination failed: {e}")
             return "funny"
 
+    async def adetermine_meme_topic(self, ai_response: str, is_initial: bool = False) -> str:
+        """
+        Async version of determine_meme_topic.
+        """
+        prompt = self._get_meme_topic_prompt(ai_response, is_initial)
+        cache = self._get_meme_topic_cache(is_initial)
+
+        async def compute():
+            response = await self.llm.ainvoke(prompt)
+            return response.content.strip().lower()
+
+        try:
+            if cache is None:
+                return await compute()
+            return await cache.aget_or_compute(self._get_meme_topic_cache_key(ai_response), compute)
+        except Exception as e:
+            logging.error(f"Meme topic determination failed: {e}")
+            return "funny"
 
     def convert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int) -> tuple:
         """
@@ -355,53 +742,154 @@ class HealthAIAgent(AIAgent):
                 return "", ""
 
             preferred_language = user.preferredLanguage or "en"
-            audio_data = text_to_speech(text, preferred_language=preferred_language)
-            if not audio_data:
-                raise ValueError("No audio data from TTS.")
-
-            filename = f"{user_id}_{chat_id}_{turn_id}.wav"
-            file_path = os.path.join(self.generated_audio_dir, filename)
-            with open(file_path, "wb") as f:
-                f.write(audio_data)
-
-            backend_base_url = os.getenv("BACKEND_BASE_URL", "http://localhost:8000")
-            audio_url = f"{backend_base_url}/ai_mentor/download_audio/{filename}"
-            return audio_url
+            return self._synthesize_audio(text, preferred_language, f"{user_id}_{chat_id}_{turn_id}.wav")
         except Exception as e:
             logging.error(f"TTS conversion error: {e}")
             return "", ""
 
-    
-    
+    async def aconvert_text_to_speech(self, text: str, user_id: str, chat_id: int, turn_id: int) -> tuple:
+        """
+        Async version of convert_text_to_speech.
+        """
+        try:
+            user = await User.afind_by_id(user_id)
+            if not user:
+                logging.warning(f"User with ID {user_id} not found.")
+                return "", ""
+
+            preferred_language = user.preferredLanguage or "en"
+            # The Speech SDK and the file write are blocking
+            return await asyncio.to_thread(
+                self._synthesize_audio, text, preferred_language, f"{user_id}_{chat_id}_{turn_id}.wav"
+            )
+        except Exception as e:
+            logging.error(f"TTS conversion error: {e}")
+            return "", ""
+
+    def _synthesize_audio(self, text: str, preferred_language: str, filename: str) -> str:
+        """
+        Synthesizes the text into generated_audio/<filename> and returns its download URL.
+        """
+        audio_data = text_to_speech(text, preferred_language=preferred_language)
+        if not audio_data:
+            raise ValueError("No audio data from TTS.")
+
+        file_path = os.path.join(self.generated_audio_dir, filename)
+        with open(file_path, "wb") as f:
+            f.write(audio_data)
+
+        backend_base_url = os.getenv("BACKEND_BASE_URL", "http://localhost:8000")
+        audio_url = f"{backend_base_url}/ai_mentor/download_audio/{filename}"
+        return audio_url
 
     # ---------------------------------------------------------------------
     # 7) Summarization & Finalization
     # ---------------------------------------------------------------------
-    def get_summary_from_chat_history(self, user_id, chat_id):
+    def _fold_into_summary(self, messages: list, existing_summary: str) -> str:
+        """
+        Folds new messages into an existing summary with a single LLM call.
+        """
+        summarizer = ConversationSummaryMemory(llm=self.llm, return_messages=False)
+        return summarizer.predict_new_summary(messages, existing_summary)
+
+    async def _afold_into_summary(self, messages: list, existing_summary: str) -> str:
+        summarizer = ConversationSummaryMemory(llm=self.llm, return_messages=False)
+        return await summarizer.apredict_new_summary(messages, existing_summary)
+
+    @staticmethod
+    def _watermark_filter(user_id, chat_id, watermark: int) -> dict:
+        # A missing watermark counts as 0; matching on it makes concurrent folds lose cleanly
+        return {
+            "user_id": user_id,
+            "chat_id": int(chat_id),
+            "summarized_message_count": watermark if watermark else {"$in": [0, None]},
+        }
+
+    def update_rolling_summary(self, user_id, chat_id) -> str:
+        """
+        Folds the messages after the persisted watermark into the chat's rolling summary.
+        The cost depends on the number of unsummarized messages, not on the chat length.
         """
-        Summarizes the entire conversation using ConversationSummaryMemory
-        (or a simpler approach if needed).
+        chat_summary_collection = MongoDBClient.get_client()[MongoDBClient.get_db_name()]["chat_summaries"]
+        chat_summary = chat_summary_collection.find_one(
+            {"user_id": user_id, "chat_id": int(chat_id)},
+            {"summary_text": 1, "summarized_message_count": 1}
+        ) or {}
+        watermark = chat_summary.get("summarized_message_count") or 0
+        summary = chat_summary.get("summary_text", "") if watermark else ""
+
+        history = self.get_session_history(f"{user_id}-{chat_id}")
+        tail = history.get_messages_after(watermark)
+        if not tail:
+            return summary
+
+        summary = self._fold_into_summary(tail, summary)
+        result = chat_summary_collection.update_one(
+            self._watermark_filter(user_id, chat_id, watermark),
+            {"$set": {"summary_text": summary, "summarized_message_count": watermark + len(tail)}}
+        )
+        if result.matched_count == 0:
+            logging.info(f"Rolling summary of chat {chat_id} was updated concurrently; keeping the stored one.")
+        return summary
+
+    async def aupdate_rolling_summary(self, user_id, chat_id) -> str:
+        """
+        Async version of update_rolling_summary.
         """
-        history: BaseChatMessageHistory = self.get_session_history(f"{user_id}-{chat_id}")
-        memory = ConversationSummaryMemory(
-            llm=self.llm,
-            chat_memory=history,
-            return_messages=False,
-            input_key="input",
-            output_key="output"
+        chat_summary_collection = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]["chat_summaries"]
+        chat_summary = await chat_summary_collection.find_one(
+            {"user_id": user_id, "chat_id": int(chat_id)},
+            {"summary_text": 1, "summarized_message_count": 1}
+        ) or {}
+        watermark = chat_summary.get("summarized_message_count") or 0
+        summary = chat_summary.get("summary_text", "") if watermark else ""
+
+        history = self.get_session_history(f"{user_id}-{chat_id}")
+        tail = await history.aget_messages_after(watermark)
+        if not tail:
+            return summary
+
+        summary = await self._afold_into_summary(tail, summary)
+        result = await chat_summary_collection.update_one(
+            self._watermark_filter(user_id, chat_id, watermark),
+            {"$set": {"summary_text": summary, "summarized_message_count": watermark + len(tail)}}
         )
+        if result.matched_count == 0:
+            logging.info(f"Rolling summary of chat {chat_id} was updated concurrently; keeping the stored one.")
+        return summary
+
+    def _schedule_summary_update(self, user_id, chat_id):
+        """
+        Refreshes the rolling summary off the request path after a turn.
+        """
+        def update():
+            try:
+                self.update_rolling_summary(user_id, chat_id)
+            except Exception as e:
+                logging.error(f"Rolling summary update failed for chat {chat_id}: {e}", exc_info=True)
+
+        _summary_pool.submit(update)
 
-        messages = asyncio.run(history.aget_messages())
+    def _aschedule_summary_update(self, user_id, chat_id):
+        """
+        Async version of _schedule_summary_update; runs as a task on the current loop.
+        """
+        async def update():
+            try:
+                await self.aupdate_rolling_summary(user_id, chat_id)
+            except Exception as e:
+                logging.error(f"Rolling summary update failed for chat {chat_id}: {e}", exc_info=True)
 
-        # Pair up messages in (human, AI) if possible
-        for i in range(0, len(messages), 2):
-            if i + 1 < len(messages):
-                human_msg = messages[i]
-                ai_msg = messages[i + 1]
-                if isinstance(human_msg, HumanMessage) and not isinstance(ai_msg, HumanMessage):
-                    memory.save_context({"input": human_msg.content}, {"output": ai_msg.content})
+        task = asyncio.get_running_loop().create_task(update())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
-        summary = memory.load_memory_variables({}).get("history", "")
+    def get_summary_from_chat_history(self, user_id, chat_id):
+        """
+        Returns the conversation summary, folding in only the messages
+        that the rolling summary has not covered yet.
+        """
+        summary = self.update_rolling_summary(user_id, chat_id)
         logging.info(f"Generated summary: {summary}")
         return summary
 
@@ -422,11 +910,91 @@ class HealthAIAgent(AIAgent):
             {"user_id": user_id, "chat_id": int(chat_id)},
             {"$set": {"perceived_mood": mood, "summary_text": summary}}
         )
+        # Embed the summary so later chats can retrieve it by relevance
+        index_chat_summary(user_id, chat_id, summary)
+        invalidate_past_summaries(user_id)
         logging.info(f"perform_final_processes: updated mood={mood}, summary length={len(summary)} for chat={chat_id}.")
 
+    async def aget_summary_from_chat_history(self, user_id, chat_id):
+        """
+        Async version of get_summary_from_chat_history.
+        """
+        summary = await self.aupdate_rolling_summary(user_id, chat_id)
+        logging.info(f"Generated summary: {summary}")
+        return summary
+
+    async def aperform_final_processes(self, user_id, chat_id):
+        """
+        Async version of perform_final_processes; mood and summary are computed concurrently.
+        """
+        db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+
+        mood, summary = await asyncio.gather(
+            self.aget_user_mood(user_id, chat_id),
+            self.aget_summary_from_chat_history(user_id, chat_id),
+        )
+
+        await db["chat_summaries"].update_one(
+            {"user_id": user_id, "chat_id": int(chat_id)},
+            {"$set": {"perceived_mood": mood, "summary_text": summary}}
+        )
+        await aindex_chat_summary(user_id, chat_id, summary)
+        await ainvalidate_past_summaries(user_id)
+        logging.info(f"aperform_final_processes: updated mood={mood}, summary length={len(summary)} for chat={chat_id}.")
+
     # ---------------------------------------------------------------------
     # 8) get_initial_greeting
     # ---------------------------------------------------------------------
+    def _apply_greeting_instructions(self, preferred_language: str, is_first_session: bool):
+        """
+        Sets the greeting instructions for the next turn of this agent. The language enforcement
+        is part of the compiled prompt prefix and the past summaries are part of the turn context.
+        """
+        instructions = []
+
+        if is_first_session:
+            introduction = """
+    This is your first session with the user. Be polite and introduce yourself in a warm, empathetic, and inviting manner.
+
+    In this session, aim to understand the user's health and wellness objectives. Ask open-ended questions to uncover any key concerns or goals—whether they pertain to nutrition, mental well-being, fitness, or other aspects of a healthy lifestyle.
+
+    **Important Disclaimer:**
+    - You are here to provide general health and wellness advice, not to replace professional medical care. Encourage the user to seek a qualified healthcare provider for medical diagnosis and treatment where needed.
+
+    **Language Enforcement:**
+    - The user’s preferred language is {preferred_language}.
+    - You must respond exclusively in {preferred_language}, regardless of the user’s initial greeting language.
+    - For example, if the user’s profile says “zh” for Chinese, all messages should be in Chinese. If the user’s profile says “fr,” respond in French, etc.
+    - If you genuinely cannot continue in {preferred_language}, apologize in {preferred_language} and ask for clarification.
+
+
+    Explain that you are here to support their wellness journey by offering evidence-based tips, mental health encouragement, lifestyle recommendations, and motivational guidance. Ensure the user feels welcomed, understood, and optimistic about improving their overall well-being.
+    """
+            instructions.append(introduction.format(preferred_language=preferred_language))
+
+        self.turn_instructions = "\n".join(instructions)
+
+    def _new_chat_summary(self, user_id: str, chat_id: int) -> dict:
+        return {
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "desired_role": self.desired_role,
+            "perceived_mood": "",
+            "summary_text": "",
+            "concerns_progress": []
+        }
+
+    @staticmethod
+    def _new_user_journey(user_id: str) -> dict:
+        return {
+            "user_id": user_id,
+            "patient_goals": [],
+            "therapy_type": [],
+            "last_updated": datetime.now().isoformat(),
+            "therapy_plan": [],
+            "mental_health_concerns": []
+        }
+
     def get_initial_greeting(self, user_id: str) -> dict:
         db_client = MongoDBClient.get_client()
         db_name = MongoDBClient.get_db_name()
@@ -445,64 +1013,58 @@ class HealthAIAgent(AIAgent):
         print("user_profile", user_profile)
         preferred_language = user_profile.get("preferredLanguage", "en")
 
-        # Add language enforcement instruction
-        language_instruction = (
-            f"\n\n**Language Enforcement:** Respond exclusively in {preferred_language} using the correct script. "
-            "Do not use any other language, even if the user writes in another language. "
-            "All responses must be in {preferred_language} without exception."
-        )
-        self.system_message.content += language_instruction
-
-        # (Existing logic)
-        past_summaries_cursor = chat_summary_collection.find({"user_id": user_id}).sort("chat_id", -1)
-        past_summaries = list(past_summaries_cursor)
-        recent_summaries = past_summaries[:2]
-        summaries_text = "\n".join([summary.get("summary_text", "") for summary in recent_summaries])
-        if summaries_text:
-            self.system_message.content += f"\nPrevious Summaries:\n{summaries_text}"
-
         now = datetime.now()
         chat_id = int(now.timestamp())
 
-        chat_summary_collection.insert_one({
-            "user_id": user_id,
-            "chat_id": chat_id,
-            "desired_role": self.desired_role,
-            "perceived_mood": "",
-            "summary_text": "",
-            "concerns_progress": []
-        })
+        chat_summary_collection.insert_one(self._new_chat_summary(user_id, chat_id))
+        invalidate_past_summaries(user_id)
 
         if not user_journey:
-            user_journey_collection.insert_one({
-                "user_id": user_id,
-                "patient_goals": [],
-                "therapy_type": [],
-                "last_updated": datetime.now().isoformat(),
-                "therapy_plan": [],
-                "mental_health_concerns": []
-            })
-            introduction = """
-    This is your first session with the user. Be polite and introduce yourself in a warm, empathetic, and inviting manner.
+            user_journey_collection.insert_one(self._new_user_journey(user_id))
 
-    In this session, aim to understand the user's health and wellness objectives. Ask open-ended questions to uncover any key concerns or goals—whether they pertain to nutrition, mental well-being, fitness, or other aspects of a healthy lifestyle.
+        self._apply_greeting_instructions(preferred_language, is_first_session=not user_journey)
 
-    **Important Disclaimer:**
-    - You are here to provide general health and wellness advice, not to replace professional medical care. Encourage the user to seek a qualified healthcare provider for medical diagnosis and treatment where needed.
+        # Then run the first message with turn_id=0
+        response = self.run(
+            message="",
+            with_history=True,
+            user_id=user_id,
+            chat_id=chat_id,
+            turn_id=0
+        )
 
-    **Language Enforcement:**
-    - The user’s preferred language is {preferred_language}.
-    - You must respond exclusively in {preferred_language}, regardless of the user’s initial greeting language.
-    - For example, if the user’s profile says “zh” for Chinese, all messages should be in Chinese. If the user’s profile says “fr,” respond in French, etc.
-    - If you genuinely cannot continue in {preferred_language}, apologize in {preferred_language} and ask for clarification.
+        return {
+            "message": response,
+            "chat_id": chat_id
+        }
 
+    async def aget_initial_greeting(self, user_id: str) -> dict:
+        """
+        Async version of get_initial_greeting.
+        """
+        db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
 
-    Explain that you are here to support their wellness journey by offering evidence-based tips, mental health encouragement, lifestyle recommendations, and motivational guidance. Ensure the user feels welcomed, understood, and optimistic about improving their overall well-being.
-    """
-            self.system_message.content += introduction
+        user_journey_collection = db["user_journeys"]
+        chat_summary_collection = db["chat_summaries"]
 
-        # Then run the first message with turn_id=0
-        response = self.run(
+        user_journey, user_profile_json = await asyncio.gather(
+            user_journey_collection.find_one({"user_id": user_id}),
+            aget_user_profile_by_user_id(user_id),
+        )
+        user_profile = json.loads(user_profile_json) if user_profile_json else {}
+        preferred_language = user_profile.get("preferredLanguage", "en")
+
+        chat_id = int(datetime.now().timestamp())
+
+        await chat_summary_collection.insert_one(self._new_chat_summary(user_id, chat_id))
+        await ainvalidate_past_summaries(user_id)
+
+        if not user_journey:
+            await user_journey_collection.insert_one(self._new_user_journey(user_id))
+
+        self._apply_greeting_instructions(preferred_language, is_first_session=not user_journey)
+
+        response = await self.arun(
             message="",
             with_history=True,
             user_id=user_id,
@@ -513,4 +1075,4 @@ class HealthAIAgent(AIAgent):
         return {
             "message": response,
             "chat_id": chat_id
-        }
\ No newline at end of file
+        }
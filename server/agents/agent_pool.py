@@ -0,0 +1,143 @@
+"""
+This module contains the AgentPool class, a process-wide registry of HealthAIAgent prototypes.
+
+Building a HealthAIAgent creates the LLM client, the embeddings client, the toolbox and the
+vector store retrievers. These pieces never change between requests, so the pool builds them
+once per (desired_role, tool_names) and hands out cheap per-request views of the prototype.
+The pool keeps at most AGENT_POOL_MAX_PROTOTYPES prototypes, since roles come from clients.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import logging
+import threading
+from concurrent.futures import Future
+from cachetools import LRUCache
+
+from .Health_AI_Agent import HealthAIAgent
+from utils.consts import AI_MENTOR_TOOL_NAMES, AGENT_POOL_MAX_PROTOTYPES
+
+logger = logging.getLogger(__name__)
+
+
+"""Step 2: Define the AgentPool class"""
+class AgentPool:
+    """
+    A per-process LRU registry of HealthAIAgent prototypes keyed by role and tool set.
+    """
+    _prototypes: LRUCache = LRUCache(maxsize=AGENT_POOL_MAX_PROTOTYPES)
+    # key -> Future of a prototype being built; concurrent requests for the key wait on it
+    _building: dict[tuple, Future] = {}
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def _get_key(desired_role: str, tool_names: list[str]) -> tuple:
+        return desired_role, tuple(sorted(set(tool_names)))
+
+    @classmethod
+    def get_agent(cls, tool_names: list[str] = AI_MENTOR_TOOL_NAMES, desired_role: str = "MemeMingle") -> HealthAIAgent:
+        """
+        Returns a per-request agent view, building the prototype on first use.
+
+        Args:
+            tool_names (list[str]): The names of the tools the agent may use.
+            desired_role (str): The role the agent plays in the conversation.
+
+        Returns:
+            HealthAIAgent: An agent sharing the prototype's immutable pieces.
+        """
+        return cls._get_prototype(cls._get_key(desired_role, tool_names)).spawn()
+
+    @classmethod
+    def _get_prototype(cls, key: tuple) -> HealthAIAgent:
+        """
+        Returns the prototype of a key. A cold build runs outside the pool lock, so lookups
+        of other keys are not blocked by it; concurrent requests for the same key share it.
+        """
+        with cls._lock:
+            prototype = cls._prototypes.get(key)
+            if prototype is not None:
+                cls._hits += 1
+                return prototype
+            cls._misses += 1
+            future = cls._building.get(key)
+            is_builder = future is None
+            if is_builder:
+                future = cls._building[key] = Future()
+
+        if not is_builder:
+            return future.result()
+
+        try:
+            prototype = cls._build_prototype(key)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with cls._lock:
+                cls._building.pop(key, None)
+        future.set_result(prototype)
+        return prototype
+
+    @classmethod
+    def _build_prototype(cls, key: tuple) -> HealthAIAgent:
+        """
+        Builds and registers the prototype for a key. Called without the pool lock.
+        A prototype missing tools whose vector store is not available yet is not registered,
+        so the next request builds it again with the tools once their collections exist.
+        """
+        desired_role, tool_names = key
+        logger.info(f"Building agent prototype for role '{desired_role}' with {len(tool_names)} tools.")
+        prototype = HealthAIAgent(tool_names=list(tool_names), desired_role=desired_role)
+        prototype._initialize_agent_executor()
+        if prototype.missing_tool_names:
+            logger.warning(
+                f"Not caching the agent prototype for role '{desired_role}': "
+                f"missing tools {prototype.missing_tool_names}."
+            )
+            return prototype
+        with cls._lock:
+            cls._prototypes[key] = prototype
+        return prototype
+
+    @classmethod
+    def warm_up(cls, roles: list[str] = None, tool_names: list[str] = AI_MENTOR_TOOL_NAMES):
+        """
+        Builds the prototypes for the given roles ahead of the first request.
+        Roles default to the comma-separated AGENT_POOL_WARM_ROLES environment variable.
+        """
+        if roles is None:
+            roles = [role.strip() for role in os.getenv("AGENT_POOL_WARM_ROLES", "MemeMingle").split(",") if role.strip()]
+
+        for role in roles:
+            try:
+                cls._get_prototype(cls._get_key(role, tool_names))
+                logger.info(f"Warmed agent prototype for role '{role}'.")
+            except Exception as e:
+                logger.error(f"Failed to warm agent prototype for role '{role}': {e}", exc_info=True)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """
+        Returns the pool size along with its hit and miss counts.
+        """
+        with cls._lock:
+            return {
+                "size": len(cls._prototypes),
+                "max_size": cls._prototypes.maxsize,
+                "building": len(cls._building),
+                "hits": cls._hits,
+                "misses": cls._misses,
+            }
+
+    @classmethod
+    def clear(cls):
+        """
+        Drops every prototype, e.g. after the toolbox or system message changed.
+        """
+        with cls._lock:
+            cls._prototypes.clear()
+            cls._hits = 0
+            cls._misses = 0
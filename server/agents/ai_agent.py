@@ -6,29 +6,21 @@ This module defines a general structure for AI agents in the app.
 import logging
 
 # -- 3rd Party libraries --
-from langchain_community.vectorstores.azure_cosmos_db import (
-    AzureCosmosDBVectorSearch,
-    CosmosDBSimilarityType,
-    CosmosDBVectorSearchType,
-)
 from langchain.agents import Tool
 from langchain.tools import StructuredTool
 from langchain_core.messages import SystemMessage
 from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_community.document_loaders.mongodb import MongodbLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.schema import Document
 
 # MongoDB
 from pymongo.database import Database
 
 # -- Custom Modules --
 from services.azure_mongodb import MongoDBClient
-from services.ai import (
-    get_deepseek_llm,
-    get_azure_openai_embeddings,
-)
+from services.ai import get_deepseek_llm
+from services.embedding_cache import get_cached_embeddings
+from services.retriever_registry import RetrieverRegistry
 from utils.docs import format_docs
 from .tools import toolbox
 
@@ -41,7 +33,8 @@ class AIAgent:
     def __init__(self, system_message: str, tool_names: list[str] = []):
         self.db: Database = (MongoDBClient.get_client())[MongoDBClient.get_db_name()]
         self.llm = get_deepseek_llm()            # streaming=False inside
-        self.embedding_model = get_azure_openai_embeddings()
+        # Shared by every agent; repeated texts skip the remote embedding call
+        self.embedding_model = get_cached_embeddings()
         self.system_message = SystemMessage(content=system_message)
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -50,6 +43,8 @@ class AIAgent:
                 MessagesPlaceholder(variable_name="agent_scratchpad"),
             ]
         )
+        # Tools skipped because their vector store was not available yet
+        self.missing_tool_names: list[str] = []
         self.tools = self._create_agent_tools(tool_names)
         # NOTE: self.agent_executor is not assigned here by default.
         # Subclasses typically build an agent executor themselves.
@@ -66,84 +61,9 @@ class AIAgent:
 
     def _get_vector_store_retriever(self, collection_name, top_k=3) -> VectorStoreRetriever:
         """
-        Returns a vector store retriever for a given collection using Azure Cosmos DB.
+        Returns the retriever of a collection's vector store from the process-wide registry.
         """
-        db = self.db
-        db_name = MongoDBClient.get_db_name()
-        CONNECTION_STRING = MongoDBClient.get_mongodb_variables()
-        embeddings_model = self.embedding_model
-        vector_store_name = f"{collection_name}_vector_store"
-        vector_store_collection = self.db[vector_store_name]
-
-        # Check if the vector store exists
-        if db[vector_store_name].find_one({}):
-            logging.info(f"Vector store '{vector_store_name}' exists. Loading existing vector store.")
-            vector_store = AzureCosmosDBVectorSearch.from_connection_string(
-                connection_string=CONNECTION_STRING,
-                namespace=f"{db_name}.{vector_store_name}",
-                embedding=embeddings_model,
-                index_name="VectorSearchIndex",
-                embedding_key="vectorContent",
-                text_key="textContent",
-            )
-        else:
-            logging.info(f"Vector store '{vector_store_name}' does not exist. Creating new vector store.")
-            # Manually fetch documents from MongoDB
-            collection = db[collection_name]
-            documents_cursor = collection.find({})
-            documents = list(documents_cursor)
-            logging.info(f"Loaded {len(documents)} documents from collection '{collection_name}'.")
-
-            # Create LangChain Document objects
-            docs = []
-            for doc in documents:
-                page_content = doc.get('fact', '')
-                metadata = {'sample_query': doc.get('sample_query', '')}
-                if page_content.strip():
-                    docs.append(Document(page_content=page_content, metadata=metadata))
-
-            logging.info(f"Documents with content: {len(docs)}")
-
-            if not docs:
-                logging.error("No documents to index. Exiting retriever creation.")
-                return None
-
-            # Split the documents
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=20,
-                length_function=len,
-                is_separator_regex=False,
-            )
-
-            docs = text_splitter.split_documents(docs)
-            logging.info(f"Split documents into {len(docs)} chunks.")
-            if not docs:
-                logging.error("No documents to index after splitting. Exiting retriever creation.")
-                return None
-
-            # Create the vector store
-            vector_store = AzureCosmosDBVectorSearch.from_documents(
-                docs,
-                embeddings_model,
-                collection=vector_store_collection,
-                index_name="vectorSearchIndex",
-            )
-
-            num_lists = 1
-            dimensions = 1536
-            similarity_algorithm = CosmosDBSimilarityType.COS
-            kind = CosmosDBVectorSearchType.VECTOR_IVF
-            m = 16
-            ef_construction = 64
-
-            vector_store.create_index(
-                num_lists, dimensions, similarity_algorithm, kind, m, ef_construction
-            )
-            logging.info("Vector store index created successfully.")
-
-        retriever = vector_store.as_retriever(search_kwargs={"k": top_k})
-        return retriever
+        return RetrieverRegistry.get_retriever(collection_name, top_k)
 
     def _create_agent_tools(self, tool_names=[]) -> list[Tool]:
         """
@@ -170,6 +90,10 @@ class AIAgent:
 
             if tool_dict.get("retriever", False):
                 retriever = self._get_vector_store_retriever(tool_name)
+                if retriever is None:
+                    logging.error(f"Skipping tool 'vector_search_{tool_name}': its vector store is not available.")
+                    self.missing_tool_names.append(tool_name)
+                    continue
                 retriever_chain = retriever | format_docs
 
                 def retriever_func(query: str):
@@ -189,6 +113,7 @@ class AIAgent:
                     StructuredTool(
                         name=tool_name,
                         func=func,
+                        coroutine=tool_dict.get("coroutine"),
                         description=description,
                         args_schema=args_schema,
                     )
@@ -0,0 +1,73 @@
+"""
+This module contains the background finalization of chats.
+
+Finalizing a chat (mood detection and summarization) takes several LLM calls, so the
+finalize endpoint only queues a job and the worker pool of the finalization queue runs it.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import logging
+
+from .agent_pool import AgentPool
+from services.job_queue import JobQueue
+from utils.consts import FINALIZATION_JOBS_COLLECTION, FINALIZATION_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+"""Step 2: Define the finalization job"""
+def _finalize_chat(payload: dict):
+    agent = AgentPool.get_agent()
+    agent.perform_final_processes(payload["user_id"], payload["chat_id"])
+
+
+finalization_queue = JobQueue(
+    FINALIZATION_JOBS_COLLECTION,
+    handler=_finalize_chat,
+    workers=int(os.getenv("FINALIZATION_WORKERS", FINALIZATION_WORKERS)),
+)
+
+
+"""Step 3: Define the helpers used by the routes"""
+def get_finalization_job_id(user_id: str, chat_id: int) -> str:
+    return f"{user_id}-{int(chat_id)}"
+
+
+def serialize_job(job: dict) -> dict:
+    """
+    Returns the public view of a job document.
+    """
+    return {
+        "job_id": job["_id"],
+        "status": job.get("status"),
+        "attempts": job.get("attempts", 0),
+        "last_error": job.get("last_error"),
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None,
+        "updated_at": job["updated_at"].isoformat() if job.get("updated_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None,
+    }
+
+
+def enqueue_finalization(user_id: str, chat_id: int) -> dict:
+    """
+    Queues the finalization of a chat; queuing a chat that is already pending is a no-op.
+
+    Args:
+        user_id (str): The user's identifier.
+        chat_id (int): The chat to finalize.
+
+    Returns:
+        dict: The public view of the job.
+    """
+    job_id = get_finalization_job_id(user_id, chat_id)
+    job = finalization_queue.enqueue(job_id, {"user_id": user_id, "chat_id": int(chat_id)})
+    return serialize_job(job)
+
+
+def get_finalization_status(user_id: str, chat_id: int):
+    """
+    Returns the public view of a chat's finalization job, or None if it was never queued.
+    """
+    job = finalization_queue.get_job(get_finalization_job_id(user_id, chat_id))
+    return serialize_job(job) if job else None
@@ -0,0 +1,119 @@
+"""
+This module assembles the prompt of the HealthAIAgent.
+
+The prompt is split into a static prefix, compiled once per role and language, the chat
+history, and a variable per-turn context placed after both. Keeping the prefix byte-identical
+across turns lets the provider's prompt/KV cache reuse it, along with the history before
+the new turn.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+from functools import lru_cache
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from utils.consts import SYSTEM_MESSAGE, language_mapping
+from utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+"""Step 2: Define the prompt pieces"""
+TOOL_INSTRUCTIONS = [
+    "You can retrieve information about the AI using the 'agent_facts' tool.",
+    "You can generate suggestions using the 'generate_suggestions' tool.",
+    "You can search for information using the 'web_search_bing' tool.",
+    "You can search for textbook PDFs using the 'textbook_search' tool.",
+    "You can search for textbooks using the 'gutendex_textbook_search' tool.",
+    "You can search for information using the 'web_search_tavily' tool.",
+    "You can search for locations using the 'location_search_gplaces' tool.",
+    "You can retrieve your user profile using the 'user_profile_retrieval' tool.",
+    "You can generate documents using the 'generate_document' tool.",
+    "You can fetch popular memes using the 'fetch_meme' tool.",
+]
+
+# The agent prompt: static prefix first, variable content last. Within a chat the
+# windowed history only grows at its end until the window starts to slide, so the
+# prefix and the history form the cacheable part. The turn context (past summaries,
+# document, instructions) changes every turn, so it comes after them, right before
+# the message.
+AGENT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "{static_prefix}"),
+        MessagesPlaceholder(variable_name="chat_turns", optional=True),
+        ("system", "{turn_context}"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ]
+)
+
+
+"""Step 3: Define the prompt assembly functions"""
+@lru_cache(maxsize=256)
+def compile_prompt_prefix(role: str, language: str = "en") -> tuple[str, int]:
+    """
+    Compiles the constant part of the prompt for a role and a language.
+
+    Args:
+        role (str): The role the agent plays.
+        language (str): The user's preferred language code.
+
+    Returns:
+        tuple[str, int]: The prefix text and its token count.
+    """
+    language_name = language_mapping.get(language, language)
+    sections = [
+        SYSTEM_MESSAGE.format(role=role),
+        "\n".join(TOOL_INSTRUCTIONS),
+        f"**Language Enforcement:** Respond exclusively in {language_name} ({language}) using the correct script.",
+    ]
+    prefix = "\n\n".join(sections)
+    return prefix, count_tokens(prefix)
+
+
+def assemble_prompt_inputs(
+    role: str,
+    message: str,
+    user_id: str,
+    language: str = "en",
+    past_summaries: str = "",
+    document_text: str = "",
+    instructions: str = "",
+) -> tuple[dict, dict]:
+    """
+    Builds the agent inputs for one turn.
+
+    Args:
+        role (str): The role the agent plays.
+        message (str): The user's message.
+        user_id (str): The user's identifier.
+        language (str): The user's preferred language code.
+        past_summaries (str): The digest of the user's past chats.
+        document_text (str): Text extracted from an uploaded document.
+        instructions (str): Extra one-off instructions, e.g. for the greeting.
+
+    Returns:
+        tuple[dict, dict]: The agent inputs and the token count of each prompt section.
+    """
+    static_prefix, prefix_tokens = compile_prompt_prefix(role, language)
+
+    context_sections = {
+        "instructions": instructions,
+        "past_summaries": f"Previous Summaries:\n{past_summaries}" if past_summaries else "",
+        "document": f"The user has provided a document:\n{document_text}" if document_text else "",
+        "user_id": f"user_id:{user_id}",
+    }
+    turn_context = "\n\n".join(section for section in context_sections.values() if section)
+
+    section_tokens = {"static_prefix": prefix_tokens}
+    section_tokens.update({name: count_tokens(section) for name, section in context_sections.items()})
+    section_tokens["input"] = count_tokens(message)
+    logger.info(f"Prompt section tokens: {section_tokens}")
+
+    inputs = {
+        "static_prefix": static_prefix,
+        "turn_context": turn_context,
+        "input": message,
+    }
+    return inputs, section_tokens
@@ -0,0 +1,373 @@
+"""
+This module contains the agent executor that runs the tool calls of a model turn in parallel.
+
+When the model asks for several tools in one response, the calls run concurrently, at most
+TOOL_CALL_MAX_PER_TURN of them at once; their observations are still returned to the model
+in the requested order. Each tool has its own bounded pool, so a slow tool only delays its
+own calls. Every call has a latency budget, counted from the moment it starts running, and
+goes through the circuit breaker of its tool: a call that fails, times out or hits an open
+breaker returns a short fallback observation, so a slow third-party API cannot stall the
+agent loop. A call that waits its whole budget for a free slot never runs and returns the
+fallback without counting against the breaker. The latency of every call is recorded per tool.
+"""
+
+"""Step 1: Import necessary modules"""
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from functools import partial
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FuturesTimeoutError
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+
+from services.circuit_breaker import get_circuit_breaker
+from utils.consts import (
+    TOOL_CALL_MAX_WORKERS,
+    TOOL_CALL_MAX_WORKERS_BY_TOOL,
+    TOOL_CALL_MAX_PER_TURN,
+    TOOL_TIMEOUTS,
+    TOOL_DEFAULT_TIMEOUT,
+    TOOL_SLOW_CALL_RATIO,
+)
+
+logger = logging.getLogger(__name__)
+
+# tool name -> the pool running its sync calls, and the semaphore limiting its async calls
+_tool_pools: dict[str, ThreadPoolExecutor] = {}
+_tool_slots: dict[str, asyncio.Semaphore] = {}
+_pools_lock = threading.Lock()
+_tool_stats: dict[str, dict] = {}
+_parallel_stats = {"steps": 0, "parallel_steps": 0}
+_stats_lock = threading.Lock()
+# Limits the tool calls of the async agent step running in the current context
+_aturn_slots: contextvars.ContextVar = contextvars.ContextVar("tool_call_turn_slots", default=None)
+
+
+"""Step 2: Define the tool latency metrics"""
+def _record_tool_call(tool_name: str, seconds: float, outcome: str):
+    """
+    Records a tool call; outcome is "ok", "error", "timeout", "queue_timeout" or "rejected".
+    """
+    with _stats_lock:
+        stats = _tool_stats.setdefault(
+            tool_name,
+            {"calls": 0, "errors": 0, "timeouts": 0, "queue_timeouts": 0, "rejected": 0, "total_seconds": 0.0, "max_seconds": 0.0},
+        )
+        stats["calls"] += 1
+        if outcome == "error":
+            stats["errors"] += 1
+        elif outcome == "timeout":
+            stats["timeouts"] += 1
+        elif outcome == "queue_timeout":
+            stats["queue_timeouts"] += 1
+        elif outcome == "rejected":
+            stats["rejected"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+
+def _record_step(actions: int):
+    with _stats_lock:
+        _parallel_stats["steps"] += 1
+        _parallel_stats["parallel_steps"] += int(actions > 1)
+
+
+def get_tool_call_stats() -> dict:
+    """
+    Returns the number of agent steps that ran tools (and ran more than one at once),
+    with the call, error, timeout, queue timeout and rejection counts and average and maximum latency per tool.
+    """
+    with _stats_lock:
+        tools = {
+            tool_name: {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "timeouts": stats["timeouts"],
+                "queue_timeouts": stats["queue_timeouts"],
+                "rejected": stats["rejected"],
+                "avg_ms": round(stats["total_seconds"] / stats["calls"] * 1000, 1),
+                "max_ms": round(stats["max_seconds"] * 1000, 1),
+            }
+            for tool_name, stats in _tool_stats.items()
+        }
+        return {**_parallel_stats, "tools": tools}
+
+
+"""Step 3: Define the latency budget helpers"""
+def get_tool_timeout(tool_name: str) -> float:
+    return TOOL_TIMEOUTS.get(tool_name, TOOL_DEFAULT_TIMEOUT)
+
+
+def get_tool_max_workers(tool_name: str) -> int:
+    return TOOL_CALL_MAX_WORKERS_BY_TOOL.get(tool_name, TOOL_CALL_MAX_WORKERS)
+
+
+def _get_tool_pool(tool_name: str) -> ThreadPoolExecutor:
+    with _pools_lock:
+        pool = _tool_pools.get(tool_name)
+        if pool is None:
+            pool = _tool_pools[tool_name] = ThreadPoolExecutor(
+                max_workers=get_tool_max_workers(tool_name), thread_name_prefix=f"tool-{tool_name}"
+            )
+        return pool
+
+
+def _get_tool_slots(tool_name: str) -> asyncio.Semaphore:
+    # The async views share one event loop, so one semaphore per tool serves every async call
+    with _pools_lock:
+        slots = _tool_slots.get(tool_name)
+        if slots is None:
+            slots = _tool_slots[tool_name] = asyncio.Semaphore(get_tool_max_workers(tool_name))
+        return slots
+
+
+def _get_fallback_step(agent_action: AgentAction, reason: str) -> AgentStep:
+    observation = (
+        f"The {agent_action.tool} tool is unavailable right now ({reason}). "
+        "Answer without it, or use another tool."
+    )
+    return AgentStep(action=agent_action, observation=observation)
+
+
+def _get_queue_timeout_step(agent_action: AgentAction) -> AgentStep:
+    """
+    Returns the fallback of a call that never got a slot. The call did not run, so it does not
+    count against the breaker, and a half-open breaker may allow another trial.
+    """
+    get_circuit_breaker(agent_action.tool).release_request()
+    _record_tool_call(agent_action.tool, 0.0, "queue_timeout")
+    logger.warning(f"Tool '{agent_action.tool}' waited its {get_tool_timeout(agent_action.tool)}s budget for a free slot.")
+    return _get_fallback_step(agent_action, "too many calls were waiting for it")
+
+
+def _record_outcome(agent_action: AgentAction, seconds: float, error: Exception = None, timed_out: bool = False):
+    """
+    Reports a finished call to the tool's circuit breaker and metrics; slow calls count against the breaker.
+    """
+    breaker = get_circuit_breaker(agent_action.tool)
+    timeout = get_tool_timeout(agent_action.tool)
+    if timed_out:
+        breaker.record_failure("timeout")
+        _record_tool_call(agent_action.tool, seconds, "timeout")
+    elif error is not None:
+        breaker.record_failure("error")
+        _record_tool_call(agent_action.tool, seconds, "error")
+    else:
+        if seconds >= timeout * TOOL_SLOW_CALL_RATIO:
+            breaker.record_failure("slow")
+        else:
+            breaker.record_success()
+        _record_tool_call(agent_action.tool, seconds, "ok")
+
+
+class _PendingToolCall:
+    """
+    A tool call of an agent step. The step's _ToolCallWindow submits it to the pool of its
+    tool, and its latency budget starts when a thread of that pool runs it.
+    """
+
+    def __init__(self, agent_action: AgentAction, func):
+        self.agent_action = agent_action
+        self.func = func
+        self.future = None
+        self.queued_at = time.monotonic()
+        self.started = None
+        self.finished_at = None
+        self.window = None
+        self._submitted = threading.Event()
+        self._picked_up = threading.Event()
+
+    def start(self, on_done):
+        self.future = _get_tool_pool(self.agent_action.tool).submit(self._run)
+        # Results are collected in order, so the call's own end time is taken when it finishes
+        self.future.add_done_callback(self._set_finished)
+        self.future.add_done_callback(on_done)
+        self._submitted.set()
+
+    def _run(self):
+        # A call picked up after waiting its whole budget is skipped; the model gets its fallback
+        if time.monotonic() - self.queued_at < get_tool_timeout(self.agent_action.tool):
+            self.started = time.monotonic()
+        self._picked_up.set()
+        return self.func() if self.started is not None else None
+
+    def _cancel(self) -> bool:
+        """
+        Cancels the call if no thread has picked it up. Returns False if one has.
+        """
+        if self.window.withdraw(self):
+            return True
+        # It left the window, so it is being submitted or already is
+        self._submitted.wait()
+        return self.future.cancel()
+
+    def _set_finished(self, _future: Future):
+        self.finished_at = time.monotonic()
+
+    def _get_elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started
+
+    def result(self) -> AgentStep:
+        timeout = get_tool_timeout(self.agent_action.tool)
+        # A call waits for a slot of the step and then a thread of its tool's pool, at most its own budget
+        if not self._picked_up.wait(max(self.queued_at + timeout - time.monotonic(), 0)) and not self._cancel():
+            self._picked_up.wait()
+        if self.started is None:
+            return _get_queue_timeout_step(self.agent_action)
+        # A pool thread can pick the call up before submit() has returned its future
+        self._submitted.wait()
+        try:
+            step = self.future.result(timeout=max(self.started + timeout - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            # The call keeps a thread of its tool's pool until the HTTP timeouts end it; the model moves on now
+            _record_outcome(self.agent_action, time.monotonic() - self.started, timed_out=True)
+            logger.warning(f"Tool '{self.agent_action.tool}' exceeded its {timeout}s budget.")
+            return _get_fallback_step(self.agent_action, "it timed out")
+        except Exception as e:
+            _record_outcome(self.agent_action, self._get_elapsed(), error=e)
+            logger.error(f"Tool '{self.agent_action.tool}' failed: {e}")
+            return _get_fallback_step(self.agent_action, "it failed")
+        _record_outcome(self.agent_action, self._get_elapsed())
+        return step
+
+
+class _ToolCallWindow:
+    """
+    Starts the tool calls of one agent step in order, at most max_in_flight at a time;
+    each finished call starts the next waiting one.
+    """
+
+    def __init__(self, max_in_flight: int = TOOL_CALL_MAX_PER_TURN):
+        self.max_in_flight = max_in_flight
+        self._waiting = deque()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def add(self, call: _PendingToolCall):
+        call.window = self
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._waiting.append(call)
+                return
+            self._in_flight += 1
+        call.start(self._on_done)
+
+    def withdraw(self, call: _PendingToolCall) -> bool:
+        """
+        Removes a call that has not started yet. Returns False if it already started.
+        """
+        with self._lock:
+            if call in self._waiting:
+                self._waiting.remove(call)
+                return True
+            return False
+
+    def _on_done(self, _future: Future):
+        with self._lock:
+            if not self._waiting:
+                self._in_flight -= 1
+                return
+            call = self._waiting.popleft()
+        call.start(self._on_done)
+
+
+"""Step 4: Define the ParallelToolAgentExecutor class"""
+class ParallelToolAgentExecutor(AgentExecutor):
+    """
+    An AgentExecutor that runs the tool calls of one agent step concurrently, each within
+    its latency budget and behind its circuit breaker. Async runs already gather tool calls.
+    """
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        if agent_action.tool not in name_to_tool_map:
+            # Unknown tools get the InvalidTool observation right away
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        if not get_circuit_breaker(agent_action.tool).allow_request():
+            _record_tool_call(agent_action.tool, 0.0, "rejected")
+            return _get_fallback_step(agent_action, "it is failing repeatedly")
+
+        # Called once per action of the step; the step's window starts the calls before any result is awaited
+        context = contextvars.copy_context()
+        return _PendingToolCall(
+            agent_action,
+            partial(context.run, super()._perform_agent_action, name_to_tool_map, color_mapping, agent_action, run_manager),
+        )
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        steps = []
+        window = _ToolCallWindow()
+        for output in super()._iter_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+        ):
+            if isinstance(output, _PendingToolCall):
+                window.add(output)
+                steps.append(output)
+            elif isinstance(output, AgentStep):
+                steps.append(output)
+            else:
+                yield output
+
+        if steps:
+            _record_step(len(steps))
+        # Observations go back to the model in the order it requested the tools
+        for step in steps:
+            yield step.result() if isinstance(step, _PendingToolCall) else step
+
+    async def _aiter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        # The gathered calls of this step copy the context, so they share its slots; the
+        # variable is set again by the next step and never reset
+        _aturn_slots.set(asyncio.Semaphore(TOOL_CALL_MAX_PER_TURN))
+        steps = 0
+        async for output in super()._aiter_next_step(
+            name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager
+        ):
+            steps += isinstance(output, AgentStep)
+            yield output
+        if steps:
+            _record_step(steps)
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        if agent_action.tool not in name_to_tool_map:
+            return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        if not get_circuit_breaker(agent_action.tool).allow_request():
+            _record_tool_call(agent_action.tool, 0.0, "rejected")
+            return _get_fallback_step(agent_action, "it is failing repeatedly")
+
+        # Takes a slot of the step and one of the tool, waiting at most the call's own budget
+        queue_deadline = time.monotonic() + get_tool_timeout(agent_action.tool)
+        acquired = []
+        try:
+            for slots in (_aturn_slots.get(), _get_tool_slots(agent_action.tool)):
+                if slots is not None:
+                    await asyncio.wait_for(slots.acquire(), timeout=max(queue_deadline - time.monotonic(), 0))
+                    acquired.append(slots)
+        except asyncio.TimeoutError:
+            for slots in acquired:
+                slots.release()
+            return _get_queue_timeout_step(agent_action)
+        try:
+            return await self._arun_with_budget(name_to_tool_map, color_mapping, agent_action, run_manager)
+        finally:
+            for slots in acquired:
+                slots.release()
+
+    async def _arun_with_budget(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        started = time.monotonic()
+        try:
+            step = await asyncio.wait_for(
+                super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager),
+                timeout=get_tool_timeout(agent_action.tool),
+            )
+        except asyncio.TimeoutError:
+            _record_outcome(agent_action, time.monotonic() - started, timed_out=True)
+            logger.warning(f"Tool '{agent_action.tool}' exceeded its {get_tool_timeout(agent_action.tool)}s budget.")
+            return _get_fallback_step(agent_action, "it timed out")
+        except Exception as e:
+            _record_outcome(agent_action, time.monotonic() - started, error=e)
+            logger.error(f"Tool '{agent_action.tool}' failed: {e}")
+            return _get_fallback_step(agent_action, "it failed")
+        _record_outcome(agent_action, time.monotonic() - started)
+        return step
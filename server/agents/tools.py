@@ -1,12 +1,18 @@
 """This module contains the tools used by the agents to interact with the user and the environment."""
 
 """Step 1: Import necessary modules"""
+import googlemaps
+from pydantic import Field
 from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper, TAVILY_API_URL
 from services.db.user import get_user_profile_by_user_id
 from services.db.user_journey import get_user_journey_by_user_id
 from langchain.tools import Tool
-from utils.agents import fetch_meme,get_job_listings,get_bing_search_results,get_gutendex_domain_textbooks, get_public_domain_textbooks, generate_suggestions, generate_document
-from langchain_google_community import GooglePlacesTool
+from utils.agents import fetch_meme,afetch_meme,get_job_listings,get_bing_search_results,get_gutendex_domain_textbooks, get_public_domain_textbooks, generate_suggestions, generate_document
+from langchain_google_community import GooglePlacesTool, GooglePlacesAPIWrapper
+from services.http_client import http_post, ahttp_post, get_session
+from services.tool_cache import cached_tool, get_tool_cache
+from utils.consts import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, GOOGLE_MAPS_RETRY_TIMEOUT
 from .tool_schemas import (
     GenerateDocumentInput,
     UserProfileRetrievalInput,
@@ -20,15 +26,95 @@ from .tool_schemas import (
 
 
 
-"""Step 2: Define the toolbox"""
+"""Step 2: Define the cached community tools"""
+class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """
+    The Tavily API wrapper, sending its requests through the shared HTTP client with its timeouts.
+    """
+
+    def _get_params(self, query, max_results, search_depth, include_domains, exclude_domains,
+                    include_answer, include_raw_content, include_images) -> dict:
+        return {
+            "api_key": self.tavily_api_key.get_secret_value(),
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        }
+
+    def raw_results(self, query: str, max_results=5, search_depth="advanced", include_domains=None,
+                    exclude_domains=None, include_answer=False, include_raw_content=False, include_images=False) -> dict:
+        response = http_post(
+            f"{TAVILY_API_URL}/search",
+            json=self._get_params(query, max_results, search_depth, include_domains, exclude_domains,
+                                  include_answer, include_raw_content, include_images),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def raw_results_async(self, query: str, max_results=5, search_depth="advanced", include_domains=None,
+                                exclude_domains=None, include_answer=False, include_raw_content=False,
+                                include_images=False) -> dict:
+        response = await ahttp_post(
+            f"{TAVILY_API_URL}/search",
+            json=self._get_params(query, max_results, search_depth, include_domains, exclude_domains,
+                                  include_answer, include_raw_content, include_images),
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class CachedTavilySearchResults(TavilySearchResults):
+    """
+    Tavily search with its results cached per query in the "web_search_tavily" tool cache.
+    """
+
+    api_wrapper: TavilySearchAPIWrapper = Field(default_factory=PooledTavilySearchAPIWrapper)
+
+    def _run(self, query: str, run_manager=None):
+        return get_tool_cache("web_search_tavily").get_or_compute(
+            {"query": query}, lambda: TavilySearchResults._run(self, query)
+        )
+
+    async def _arun(self, query: str, run_manager=None):
+        return await get_tool_cache("web_search_tavily").aget_or_compute(
+            {"query": query},
+            lambda: TavilySearchResults._arun(self, query),
+            lambda: TavilySearchResults._run(self, query),
+        )
+
+
+def create_google_places_tool() -> GooglePlacesTool:
+    """
+    Returns the Google Places tool with a googlemaps client on the pooled session of the Maps host,
+    with explicit connect/read timeouts and a bounded retry window.
+    """
+    api_wrapper = GooglePlacesAPIWrapper()
+    # The wrapper always builds its own client, so it is replaced once the wrapper is validated
+    api_wrapper.google_map_client = googlemaps.Client(
+        key=api_wrapper.gplaces_api_key,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        retry_timeout=GOOGLE_MAPS_RETRY_TIMEOUT,
+        requests_session=get_session("https://maps.googleapis.com"),
+    )
+    return GooglePlacesTool(api_wrapper=api_wrapper)
+
+
+"""Step 3: Define the toolbox"""
 toolbox = {
     "community": {
-        "web_search_tavily": TavilySearchResults(),
-        "location_search_gplaces": GooglePlacesTool(),
+        "web_search_tavily": CachedTavilySearchResults(),
+        "location_search_gplaces": create_google_places_tool(),
     },
     "custom": {
         "fetch_meme": {
             "func": fetch_meme,
+            "coroutine": afetch_meme,
             "description": "Fetches a popular meme related to a given topic using Giphy API.",
             "structured": True,
             "args_schema": FetchMemeInput,
@@ -40,7 +126,7 @@ toolbox = {
             "args_schema": AgentFactsInput,
         },
         "web_search_bing": {
-            "func": get_bing_search_results,
+            "func": cached_tool("web_search_bing")(get_bing_search_results),
             "description": "Uses Bng Search to fetch search results for a given query.",
             "retriever": False,
             "structured": True,
@@ -61,13 +147,13 @@ toolbox = {
         },
         
         "textbook_search": {
-            "func": get_public_domain_textbooks,
+            "func": cached_tool("textbook_search")(get_public_domain_textbooks),
              "description": "Searches for textbooks in public domain or open-access libraries based on the user's query. Provides direct PDF links if available.",
             "structured": True,
             "args_schema": TextbookSearchInput
         },
          "gutendex_textbook_search": {
-            "func": get_gutendex_domain_textbooks,
+            "func": cached_tool("gutendex_textbook_search")(get_gutendex_domain_textbooks),
             "description": "Searches OpenStax for open-access textbooks based on the user's query. Provides direct PDF download links.",
             "structured": True,
             "args_schema": TextbookSearchInput
@@ -79,7 +165,7 @@ toolbox = {
             "args_schema": GenerateDocumentInput
         },
          "job_search": {
-            "func": get_job_listings,
+            "func": cached_tool("job_search")(get_job_listings),
             "description": "Fetches current job listings that match the user's skills and optional location.",
             "structured": True,
             "args_schema": JobSearchInput,
@@ -115,4 +201,12 @@ toolbox = {
           #  "retriever": False,
            # "structured": True,
             #"args_schema": WebSearchYouTubeInput
-       # },
\ No newline at end of file
+       # },
+
+
+"""Step 4: Define the toolbox helpers"""
+def get_retriever_collection_names() -> list[str]:
+    """
+    Returns the source collections of the retriever tools, whose vector stores are built at startup.
+    """
+    return [tool_name for tool_name, tool_dict in toolbox["custom"].items() if tool_dict.get("retriever", False)]
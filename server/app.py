@@ -6,23 +6,63 @@ This module is the entry point of the application. It initializes the Flask app,
 from dotenv import load_dotenv
 from utils.extensions import oauth, mail
 import os
+import click
+import atexit
+import threading
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from config.config import Config
 from flask_jwt_extended import JWTManager
 from routes import register_blueprints
 from services.db.agent_facts import load_agent_facts_to_db
+from agents.agent_pool import AgentPool
+from agents.finalization import finalization_queue
+from agents.tools import get_retriever_collection_names
+from services.retriever_registry import RetrieverRegistry
 from flask_apscheduler import APScheduler
+from datetime import datetime
+from services.meme_catalog import meme_catalog
+from utils.consts import MEME_CATALOG_REFRESH_MINUTES, FINALIZATION_SHUTDOWN_TIMEOUT
 from utils.delete_generated_doc import delete_old_files_job
+from utils.event_loop import run_coroutine
 import logging  
 
 """ Load environment variables """
 load_dotenv()
 
 """ Step 2: Define the run_app function """
+class HealthAIFlask(Flask):
+    """
+    Runs async views on the shared event loop instead of a new loop per request,
+    so async MongoDB and HTTP clients are shared by all in-flight requests.
+
+    Flask stays a WSGI app: the worker thread of a request still waits for its view,
+    so async views save no threads. They overlap the I/O within one request (meme and
+    TTS, mood and summary) and share the clients. Blocking calls in a view must go
+    through asyncio.to_thread, since one blocked coroutine stalls the whole loop.
+    """
+    def async_to_sync(self, func):
+        return lambda *args, **kwargs: run_coroutine(func(*args, **kwargs))
+
+
+# Sync vector stores from the command line; registered on the app by run_app()
+@click.command("build-vector-stores")
+@click.option("--rebuild", is_flag=True, help="Drop every vector and embed the source collections again.")
+def build_vector_stores(rebuild):
+    """
+    Syncs the vector stores of the retriever tools with their source collections.
+    """
+    load_agent_facts_to_db()
+    for collection_name in get_retriever_collection_names():
+        click.echo(f"{collection_name}: {RetrieverRegistry.sync_vector_store(collection_name, rebuild=rebuild)}")
+
+
 def run_app():
-    
-    app = Flask(__name__)
+    """
+    Builds the app. Nothing is started here, so importing this module (e.g. for a CLI
+    command) has no side effects; serving entry points call start_services().
+    """
+    app = HealthAIFlask(__name__)
 
     app.config.from_object(Config)
     app.config['JWT_SECRET_KEY'] = os.getenv("JWT_SECRET_KEY")
@@ -59,6 +99,9 @@ def run_app():
     # Register routes
     register_blueprints(app)
 
+    # Register CLI commands
+    app.cli.add_command(build_vector_stores)
+
     # Base endpoint
     @app.get("/")
     def root():
@@ -66,32 +109,91 @@ def run_app():
         Health probe endpoint.
         """    
         return {"status": "ready"}
-    
-    
-    # Initialize APScheduler
-    scheduler = APScheduler()
-    scheduler.init_app(app)
-
-    # Schedule the delete_old_files_job function
-    scheduler.add_job(
-        id='Delete Old Files',
-        func=delete_old_files_job,
-        trigger='cron',
-        hour=0, minute=0  # Run daily at midnight
-    )
 
-    scheduler.start()
+    # Servers started without start_services() (e.g. `flask run`) start them on the first request
+    @app.before_request
+    def ensure_services_started():
+        start_services(app)
 
     return app, jwt, mail
 
 
+_services_started = False
+_services_lock = threading.Lock()
+
+
+def start_services(app):
+    """
+    Starts what only a serving process needs, once per process: the scheduled jobs,
+    the DB pre-load, the retriever and agent warm-up, and the finalization workers.
+    """
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        # Marked first, so a failed warm-up is not retried on every request
+        _services_started = True
+
+        # Initialize APScheduler
+        scheduler = APScheduler()
+        scheduler.init_app(app)
+
+        # Schedule the delete_old_files_job function
+        scheduler.add_job(
+            id='Delete Old Files',
+            func=delete_old_files_job,
+            trigger='cron',
+            hour=0, minute=0  # Run daily at midnight
+        )
+
+        # Keep the meme catalog fresh in the background; the first run seeds it right after startup
+        scheduler.add_job(
+            id='Refresh Meme Catalog',
+            func=meme_catalog.refresh,
+            trigger='interval',
+            minutes=MEME_CATALOG_REFRESH_MINUTES,
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True,
+        )
+
+        scheduler.start()
+
+        # DB pre-load, then resolve the retrievers and build the agent prototypes before the first request
+        try:
+            load_agent_facts_to_db()
+        except Exception as e:
+            logging.error(f"Failed to load the agent facts: {e}", exc_info=True)
+        RetrieverRegistry.warm_up(
+            get_retriever_collection_names(),
+            sync=os.getenv("VECTOR_STORE_SYNC_ON_STARTUP", "true").lower() == "true",
+        )
+        if os.getenv("AGENT_POOL_WARMUP", "true").lower() == "true":
+            AgentPool.warm_up()
+
+        # Chat finalization runs on a local worker pool fed by the finalization_jobs collection;
+        # at exit the workers hand their unfinished jobs back to the queue
+        if os.getenv("FINALIZATION_WORKERS_ENABLED", "true").lower() == "true":
+            finalization_queue.start()
+            atexit.register(finalization_queue.stop, FINALIZATION_SHUTDOWN_TIMEOUT)
+
+
+def serve_app():
+    """
+    Serving entry point, e.g. `gunicorn "app:serve_app()"`: returns the app with its services started.
+    """
+    start_services(app)
+    return app
+
+
 """ Step 3: Run the app """
 app, jwt, mail = run_app()
 
 """ Step 4: Start the server """
 if __name__ == '__main__':
+    start_services(app)
     HOST = os.getenv("FLASK_RUN_HOST") or "0.0.0.0"
     PORT = os.getenv("FLASK_RUN_PORT") or 8000
-    # DB pre-load
-    load_agent_facts_to_db()
     app.run(debug=True, host=HOST, port=PORT)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Offline benchmarks of the server's components."""
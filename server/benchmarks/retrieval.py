@@ -0,0 +1,191 @@
+"""
+This module benchmarks the latency and recall@k of the vector store retrievers, fully offline.
+
+The facts of AGENT_FACTS are indexed with deterministic hashing embeddings into an in-memory
+MongoDB, optionally padded with synthetic distractor facts, and each fact's sample_query is
+used as a labeled query whose relevant document is that fact.
+
+Usage:
+    python -m benchmarks.retrieval --k 1 3 5 --dimensions 256 1536 --distractors 0 1000
+    python -m benchmarks.retrieval --dimensions 1536 --distractors 5000 --quantization none float16 int8
+"""
+
+"""Step 1: Import necessary modules"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+import bson
+import mongomock
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.ingestion import IngestionPipeline
+from services.vector_index import InMemoryVectorIndex, InMemoryRetriever
+from utils.consts import AGENT_FACTS
+
+logger = logging.getLogger(__name__)
+
+# The fields of a vector store document that hold its embedding, in either layout
+VECTOR_FIELDS = ("vectorContent", "vectorQuantized", "vectorScale", "vectorMode", "vectorFull")
+
+DISTRACTOR_WORDS = [
+    "study", "lesson", "student", "teacher", "math", "science", "history", "reading", "exam", "homework",
+    "health", "sleep", "diet", "exercise", "stress", "focus", "memory", "schedule", "library", "course",
+]
+
+
+"""Step 2: Define the stand-in embeddings"""
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings from hashed words and character trigrams, for offline runs.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _get_features(self, text: str) -> list[str]:
+        words = re.findall(r"\w+", text.lower())
+        trigrams = [word[i:i + 3] for word in words for i in range(max(len(word) - 2, 1))]
+        return words + trigrams
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._get_features(text):
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+"""Step 3: Define the benchmark"""
+def get_labeled_queries() -> list[tuple[str, str]]:
+    """
+    Returns (query, relevant fact) pairs from AGENT_FACTS.
+    """
+    return [(fact["sample_query"], fact["fact"]) for fact in AGENT_FACTS]
+
+
+def get_corpus(distractors: int, seed: int = 0) -> list[tuple]:
+    """
+    Returns the AGENT_FACTS facts plus synthetic distractors as ingestion tuples.
+    """
+    rng = random.Random(seed)
+    texts = [fact["fact"] for fact in AGENT_FACTS]
+    texts += [
+        " ".join(rng.choice(DISTRACTOR_WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        for _ in range(distractors)
+    ]
+    return [(index, text, {}, str(index)) for index, text in enumerate(texts)]
+
+
+def percentile_ms(samples: list[float], percentile: float) -> float:
+    return round(float(np.percentile(samples, percentile)) * 1000, 3)
+
+
+def get_vector_bytes(document: dict) -> int:
+    """
+    Returns the BSON bytes a document spends on its vector fields.
+    """
+    without_vectors = {name: value for name, value in document.items() if name not in VECTOR_FIELDS}
+    return len(bson.encode(document)) - len(bson.encode(without_vectors))
+
+
+def build_index(dimensions: int, distractors: int, quantization: str) -> tuple:
+    """
+    Indexes the corpus into an in-memory MongoDB collection and returns
+    (index, embeddings, storage bytes, vector field bytes).
+    """
+    collection = mongomock.MongoClient()["benchmark"][f"agent_facts_{dimensions}_{distractors}_{quantization}"]
+    embeddings = HashingEmbeddings(dimensions)
+    IngestionPipeline(collection, embeddings, concurrency=1, quantization=quantization).run(get_corpus(distractors))
+    documents = list(collection.find({}))
+    storage_bytes = sum(len(bson.encode(document)) for document in documents)
+    vector_bytes = sum(get_vector_bytes(document) for document in documents)
+    index = InMemoryVectorIndex(collection, quantization=quantization)
+    index.load()
+    return index, embeddings, storage_bytes, vector_bytes
+
+
+def run_config(dimensions: int, distractors: int, quantization: str, ks: list[int], repeat: int) -> dict:
+    """
+    Measures the end-to-end retriever latency (query embedding plus search) and recall@k of one setting,
+    with the size of the stored vectors and of the index in memory.
+    """
+    index, embeddings, storage_bytes, vector_bytes = build_index(dimensions, distractors, quantization)
+    queries = get_labeled_queries()
+    max_k = max(ks)
+    retriever = InMemoryRetriever(index=index, embeddings=embeddings, k=max_k)
+
+    latencies = []
+    hits = {k: 0 for k in ks}
+    for _ in range(repeat):
+        for query, relevant in queries:
+            started = time.perf_counter()
+            documents = retriever.invoke(query)
+            latencies.append(time.perf_counter() - started)
+            for k in ks:
+                hits[k] += any(document.page_content == relevant for document in documents[:k])
+
+    lookups = repeat * len(queries)
+    index_stats = index.get_stats()
+    return {
+        "dimensions": dimensions,
+        "documents": len(index),
+        "quantization": quantization,
+        "storage_kb": round(storage_bytes / 1024, 1),
+        "bytes_per_doc": round(storage_bytes / len(index)),
+        # The stored vector fields, against a plain packed float32 vector of the same size
+        "vector_bytes_per_doc": round(vector_bytes / len(index)),
+        "float32_bytes_per_doc": 4 * dimensions,
+        "memory_kb": round(index_stats["memory_bytes"] / 1024, 1),
+        "disk_kb": round(index_stats["disk_bytes"] / 1024, 1),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        **{f"recall@{k}": round(hits[k] / lookups, 3) for k in ks},
+    }
+
+
+def print_table(rows: list[dict]):
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    widths = {column: max(len(column), *(len(str(row.get(column, ""))) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row.get(column, "")).ljust(widths[column]) for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency and recall@k benchmark of the retrievers.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Cut-offs of recall@k.")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 1536], help="Embedding sizes to compare.")
+    parser.add_argument("--distractors", type=int, nargs="+", default=[0, 1000], help="Synthetic facts added to the index.")
+    parser.add_argument(
+        "--quantization", nargs="+", default=["none"], choices=["none", "float16", "int8"],
+        help="Vector storage modes to compare.",
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the labeled queries per setting.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    rows = [
+        run_config(dimensions, distractors, quantization, args.k, args.repeat)
+        for dimensions in args.dimensions
+        for distractors in args.distractors
+        for quantization in args.quantization
+    ]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -81,6 +81,17 @@ class User(BaseModel):
             return cls(**user_data)
         return None
     
+    # Define an async class method to find a user by ID
+    @classmethod
+    async def afind_by_id(cls, user_id):
+        db_client = MongoDBClient.get_async_client()
+        db = db_client[MongoDBClient.get_db_name()]
+        user_data = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user_data:
+            user_data['id'] = str(user_data['_id'])
+            return cls(**user_data)
+        return None
+    
     # Define a class method to find a user by email
     @classmethod
     def find_by_email(cls, email):
@@ -1,16 +1,29 @@
 """This module defines the routes for the AI Mentor."""
 
 """Step 1: Import necessary modules"""
+import asyncio
 import logging
-from flask import jsonify, Blueprint, request, send_file, send_from_directory
+from flask import jsonify, Blueprint, request, send_file, send_from_directory, Response, stream_with_context
 import json
 from services.speech_service import speech_to_text
-from agents.Health_AI_Agent import HealthAIAgent
+from agents.agent_pool import AgentPool
+from agents.finalization import finalization_queue, enqueue_finalization, get_finalization_status
+from services.db.chat_summary import get_past_summaries_cache_stats
+from services.llm_cache import get_llm_cache_stats
+from services.embedding_cache import get_embedding_cache_stats
+from services.retriever_registry import RetrieverRegistry
+from services.http_client import get_http_client_stats
+from services.tool_cache import get_tool_cache_stats
+from services.meme_catalog import meme_catalog
+from agents.tool_executor import get_tool_call_stats
+from services.circuit_breaker import get_circuit_breaker_stats
+from services.sentiment import sentiment_service
 from services.azure_mongodb import MongoDBClient
 import io
 from services.text_to_speech_service import text_to_speech
 import filetype
 from services.azure_form_recognizer import ALLOWED_MIME_TYPES
+from utils.consts import AGENT_ROLE_MAX_LENGTH
 import os
 
 """Step 2: Create a Blueprint object"""
@@ -24,33 +37,86 @@ ai_routes = Blueprint("ai", __name__)
 
 """Step 3: Define the routes"""
 
+def _read_uploaded_file():
+    """
+    Reads and validates the optional uploaded file of a chat request.
+    Returns (file_content, file_mime_type, error_response).
+    """
+    # Check for file in the request
+    uploaded_file = request.files.get('file')
+
+    # Handle the uploaded file
+    file_content = None
+    file_mime_type = None
+    if uploaded_file:
+        # Read the file content
+        file_content = uploaded_file.read()
+
+        # Detect the file type using 'filetype'
+        kind = filetype.guess(file_content)
+        if kind is None:
+            return None, None, (jsonify({'error': 'Cannot guess the file type'}), 400)
+
+        file_mime_type = kind.mime
+
+        logger.debug(f"Uploaded file type: {file_mime_type}")
+        if file_mime_type not in ALLOWED_MIME_TYPES:
+            return None, None, (jsonify({'error': f'Unsupported file type: {file_mime_type}'}), 400)
+
+        # Implement file size check
+        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+        if len(file_content) > MAX_FILE_SIZE:
+            return None, None, (jsonify({'error': 'File size exceeds the maximum limit of 10 MB'}), 400)
+
+    return file_content, file_mime_type, None
+
+
+def _get_chat_role(user_id, chat_id):
+    """
+    Retrieves the desired_role of a chat from the database.
+    """
+    db_client = MongoDBClient.get_client()
+    db_name = MongoDBClient.get_db_name()
+    db = db_client[db_name]
+    chat_summary_collection = db["chat_summaries"]
+    chat_summary = chat_summary_collection.find_one({"user_id": user_id, "chat_id": int(chat_id)})
+    desired_role = (chat_summary or {}).get("desired_role", "educational mentor")
+    logger.debug(f"Desired role: {desired_role}")
+    return desired_role
+
+
+async def _aget_chat_role(user_id, chat_id):
+    """
+    Async version of _get_chat_role.
+    """
+    db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+    chat_summary = await db["chat_summaries"].find_one({"user_id": user_id, "chat_id": int(chat_id)})
+    return (chat_summary or {}).get("desired_role", "educational mentor")
+
+
+def _format_sse(event, data):
+    """
+    Formats one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 # Define the route for the initial greeting with role input
 @ai_routes.post("/ai_mentor/welcome/<user_id>")
-def get_mental_health_agent_welcome(user_id):
+async def get_mental_health_agent_welcome(user_id):
     body = request.get_json()
     if not body:
         return jsonify({"error": "No data provided"}), 400
     
     desired_role = body.get("role", "MemeMingle")  # Default to 'educational mentor' if not specified
+    if not isinstance(desired_role, str) or not desired_role.strip() or len(desired_role) > AGENT_ROLE_MAX_LENGTH:
+        return jsonify({"error": f"Role must be a non-empty string of at most {AGENT_ROLE_MAX_LENGTH} characters"}), 400
+    desired_role = desired_role.strip()
 
-    agent = HealthAIAgent(
-        tool_names=[
-            "gutendex_textbook_search",
-            "generate_suggestions",
-            "web_search_tavily",
-            "location_search_gplaces",
-            "textbook_search",
-            "user_profile_retrieval",
-            "agent_facts",
-            "generate_document",
-            "job_search",
-            "web_search_bing",
-            "fetch_meme",
-        ],
-        desired_role=desired_role  # Pass the desired role to the agent
-    )
+    # The pool may build a prototype under a lock; keep that off the shared event loop
+    agent = await asyncio.to_thread(AgentPool.get_agent, desired_role=desired_role)  # Pass the desired role to the agent
 
-    response = agent.get_initial_greeting(user_id=user_id)
+    response = await agent.aget_initial_greeting(user_id=user_id)
 
     if response is None:
         logger.error(f"No greeting found for user {user_id}")
@@ -62,7 +128,7 @@ def get_mental_health_agent_welcome(user_id):
 
 # Define the route for the main conversation
 @ai_routes.post("/ai_mentor/<user_id>/<chat_id>")
-def run_mental_health_agent(user_id, chat_id):
+async def run_mental_health_agent(user_id, chat_id):
     body = request.form.to_dict()
     if not body:
         return jsonify({"error": "No data provided"}), 400
@@ -70,61 +136,15 @@ def run_mental_health_agent(user_id, chat_id):
     prompt = body.get("prompt")
     turn_id = int(body.get("turn_id", 0))
 
-    # Check for file in the request
-    uploaded_file = request.files.get('file')
-
-    # Handle the uploaded file
-    file_content = None
-    file_mime_type = None
-    if uploaded_file:
-        # Read the file content
-        file_content = uploaded_file.read()
-
-        # Detect the file type using 'filetype'
-        kind = filetype.guess(file_content)
-        if kind is None:
-            return jsonify({'error': 'Cannot guess the file type'}), 400
-
-        file_extension = kind.extension
-        file_mime_type = kind.mime
+    file_content, file_mime_type, error_response = _read_uploaded_file()
+    if error_response:
+        return error_response
 
-        print(f"allowed mime types: {ALLOWED_MIME_TYPES}")
-        if file_mime_type not in ALLOWED_MIME_TYPES:
-            return jsonify({'error': f'Unsupported file type: {file_mime_type}'}), 400
-
-        # Implement file size check
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-        if len(file_content) > MAX_FILE_SIZE:
-            return jsonify({'error': 'File size exceeds the maximum limit of 10 MB'}), 400
-
-    # Retrieve desired_role from the database
-    db_client = MongoDBClient.get_client()
-    db_name = MongoDBClient.get_db_name()
-    db = db_client[db_name]
-    chat_summary_collection = db["chat_summaries"]
-    chat_summary = chat_summary_collection.find_one({"user_id": user_id, "chat_id": int(chat_id)})
-    desired_role = chat_summary.get("desired_role", "educational mentor")
-    print(f"Desired role: {desired_role}")
-    agent = HealthAIAgent(
-        tool_names=[
-            "gutendex_textbook_search",
-            "generate_suggestions",
-            "web_search_tavily",
-            "location_search_gplaces",
-            "textbook_search",
-            "user_profile_retrieval",
-            "agent_facts",
-            "generate_document",
-            "job_search",
-            "web_search_bing",
-            "fetch_meme",
-        ],
-        desired_role=desired_role  
-    )
+    agent = await asyncio.to_thread(AgentPool.get_agent, desired_role=await _aget_chat_role(user_id, chat_id))
 
     try:
             
-        response = agent.run(
+        response = await agent.arun(
                                 file_content=file_content,
                                 file_mime_type=file_mime_type,
                                 message=prompt,
@@ -144,23 +164,102 @@ def run_mental_health_agent(user_id, chat_id):
 
 
 
+# Define the route for the main conversation, streamed as Server-Sent Events
+@ai_routes.post("/ai_mentor/<user_id>/<chat_id>/stream")
+def stream_mental_health_agent(user_id, chat_id):
+    body = request.form.to_dict()
+    if not body:
+        return jsonify({"error": "No data provided"}), 400
+
+    prompt = body.get("prompt")
+    turn_id = int(body.get("turn_id", 0))
+
+    file_content, file_mime_type, error_response = _read_uploaded_file()
+    if error_response:
+        return error_response
+
+    agent = AgentPool.get_agent(desired_role=_get_chat_role(user_id, chat_id))
+
+    def generate():
+        events = agent.stream(
+            file_content=file_content,
+            file_mime_type=file_mime_type,
+            message=prompt,
+            with_history=True,
+            user_id=user_id,
+            chat_id=int(chat_id),
+            turn_id=turn_id + 1,
+        )
+        try:
+            for event, data in events:
+                yield _format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Unexpected error while streaming: {str(e)}")
+            yield _format_sse("error", {"error": str(e)})
+        finally:
+            # A disconnected client closes this generator; closing the agent stream cancels the run
+            events.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
 # Define the route for finalizing the conversation
 @ai_routes.patch("/ai_mentor/finalize/<user_id>/<chat_id>")
 def set_mental_health_end_state(user_id, chat_id):
     try:
-        logger.info(f"Finalizing chat {chat_id} for user {user_id}")
-        agent = HealthAIAgent(tool_names=["gutendex_textbook_search","generate_suggestions","web_search_youtube","web_search_tavily","textbook_search","location_search_gplaces", "web_search_google", "user_profile_retrieval", "agent_facts"])
+        chat_id = int(chat_id)
+    except ValueError:
+        return jsonify({"error": "Invalid chat ID"}), 400
 
-        agent.perform_final_processes(user_id, chat_id)
+    try:
+        logger.info(f"Queuing finalization of chat {chat_id} for user {user_id}")
+        job = enqueue_finalization(user_id, chat_id)
 
-        # Potentially update the database or perform other cleanup operations
-        # For now, let's assume it's a simple response:
-        return jsonify({"message": "Chat session finalized successfully"}), 200
+        # Mood detection and summarization run on the finalization workers
+        return jsonify({"message": "Chat session finalization queued", "job": job}), 202
 
     except Exception as e:
         logger.error(f"Error during finalizing chat: {e}", exc_info=True)
         return jsonify({"error": "Failed to finalize chat"}), 500
-    
+
+
+# Define the route for checking the finalization of a conversation
+@ai_routes.get("/ai_mentor/finalize/<user_id>/<chat_id>")
+def get_mental_health_end_state(user_id, chat_id):
+    try:
+        chat_id = int(chat_id)
+    except ValueError:
+        return jsonify({"error": "Invalid chat ID"}), 400
+
+    job = get_finalization_status(user_id, chat_id)
+    if job is None:
+        return jsonify({"error": "Finalization not found"}), 404
+    return jsonify({"job": job}), 200
+
+
+# Define the route for inspecting the agent caches
+@ai_routes.get("/ai_mentor/metrics")
+def get_ai_metrics():
+    return jsonify({
+        "agent_pool": AgentPool.get_stats(),
+        "retrievers": RetrieverRegistry.get_stats(),
+        "past_summaries_cache": get_past_summaries_cache_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "finalization_queue": finalization_queue.get_stats(),
+        "http": get_http_client_stats(),
+        "tool_cache": get_tool_cache_stats(),
+        "meme_catalog": meme_catalog.get_stats(),
+        "tool_calls": get_tool_call_stats(),
+        "circuit_breakers": get_circuit_breaker_stats(),
+        "sentiment": sentiment_service.get_stats(),
+    }), 200
+
 
 # Define the route for handling voice input
 @ai_routes.post("/ai_mentor/voice-to-text")
@@ -2,6 +2,7 @@
 
 """Step 1: Import the required libraries"""
 from services.azure_mongodb import MongoDBClient
+from services.db.user import invalidate_preferred_language
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from flask import current_app
@@ -79,6 +80,7 @@ def update_profile_fields():
         # Update other fields
         if update_fields:
             db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": update_fields})
+            invalidate_preferred_language(user_id)
             return jsonify({
                 "message": "User has been updated successfully.",
                 "profile_picture": update_fields.get('profile_picture', user.get('profile_picture'))
@@ -4,7 +4,7 @@
 import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI, AzureOpenAIEmbeddings
-from utils.consts import CONTEXT_LENGTH_LIMIT
+from utils.consts import CONTEXT_LENGTH_LIMIT, EMBEDDING_BATCH_SIZE
 
 """Step 2: Define the Azure OpenAI services"""
 def get_azure_openai_variables():
@@ -22,17 +22,17 @@ def get_deepseek_variables():
     DEEPSEEK_BASE_URL = "https://aimlapi.com/app/"  # or correct base
     return DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL
 
-def get_deepseek_llm():
+def get_deepseek_llm(streaming: bool = False):
     DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL = get_deepseek_variables()
 
-    # Make sure streaming=False here
+    # streaming=False by default; only the SSE endpoint asks for a streaming client
     llm = ChatOpenAI(
         temperature=0.3,
         openai_api_key=DEEPSEEK_API_KEY,
         base_url="https://api.aimlapi.com/v1",  # Replace with the correct base
         model_name="deepseek/deepseek-r1",
         max_tokens=(CONTEXT_LENGTH_LIMIT // 2),
-        streaming=False,   # <--- ensure no streaming
+        streaming=streaming,
         max_retries=3
     )
     return llm
@@ -46,6 +46,7 @@ def get_azure_openai_embeddings():
         deployment=AOAI_EMBEDDINGS,
         model="text-embedding-3-small",
         openai_api_type="azure",
-        chunk_size=10
+        # One request per ingestion batch instead of one per 10 texts
+        chunk_size=EMBEDDING_BATCH_SIZE
     )
     return embedding_model
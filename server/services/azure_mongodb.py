@@ -5,6 +5,7 @@ Classes:
 Methods:
     get_mongodb_variables(): Retrieves MongoDB connection string from environment variables.
     get_client(): Returns a MongoDB client instance, using a mock client if in a test environment.
+    get_async_client(): Returns an asyncio MongoDB client instance for the async request path, using an async view of the mock client if in a test environment.
     get_mongodb_loader(collection_name, db_filter): Returns a MongodbLoader instance for loading documents from a specified collection with given filter criteria.
     get_db_name(): Returns the database name based on the current environment.
     clear_collections(db, collection_names): Clears the specified collections in the given database.
@@ -19,7 +20,7 @@ import random
 import logging
 import requests
 import pymongo
-from pymongo import UpdateOne
+from pymongo import UpdateOne, AsyncMongoClient
 import mongomock
 from langchain_community.document_loaders.mongodb import MongodbLoader
 from utils.consts import APP_NAME
@@ -30,9 +31,84 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 load_dotenv()
 
-""" Step 3: Define the MongoDBClient class and its methods """
+""" Step 3: Define the async view of the mock client used in tests """
+class _AsyncMockCursor:
+    """
+    An awaitable view of a mongomock cursor, with the AsyncCursor methods the app uses.
+    """
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, length=None):
+        documents = list(self._cursor)
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncMockCollection:
+    """
+    An awaitable view of a mongomock collection: its methods become coroutines, find returns an async cursor.
+    """
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        return _AsyncMockCursor(self._collection.find(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            return attribute(*args, **kwargs)
+        return call
+
+
+class _AsyncMockDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return _AsyncMockCollection(self._database[name])
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class AsyncMockClient:
+    """
+    An asyncio view of the mock client returned by get_client, so the async paths read and
+    write the same in-memory data as the sync ones in tests.
+    """
+    def __getitem__(self, name):
+        return _AsyncMockDatabase(MongoDBClient.get_client()[name])
+
+
+""" Step 4: Define the MongoDBClient class and its methods """
 class MongoDBClient:
     _client = None
+    _async_client = None
     _db_name = None
 
     @staticmethod
@@ -55,6 +131,18 @@ class MongoDBClient:
 
         return cls._client
 
+    @classmethod
+    def get_async_client(cls):
+        # Bound to the shared event loop (utils.event_loop), which runs every async view
+        if cls._async_client is None:
+            if os.environ.get("FLASK_ENV") == "test":
+                cls._async_client = AsyncMockClient()
+            else:
+                CONNECTION_STRING = MongoDBClient.get_mongodb_variables()
+                cls._async_client = AsyncMongoClient(CONNECTION_STRING)
+
+        return cls._async_client
+
     @staticmethod
     def get_mongodb_loader(collection_name, db_filter):
         CONNECTION_STRING = MongoDBClient.get_mongodb_variables()
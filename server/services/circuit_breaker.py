@@ -0,0 +1,131 @@
+"""
+This module contains the circuit breakers of the agent tools.
+
+A breaker opens after consecutive failed or slow calls of its tool. While it is open, calls
+are rejected at once; after a cool-down a single trial call decides whether it closes again.
+"""
+
+"""Step 1: Import necessary modules"""
+import time
+import logging
+import threading
+
+from utils.consts import TOOL_BREAKER_FAILURE_THRESHOLD, TOOL_BREAKER_RESET_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+"""Step 2: Define the CircuitBreaker class"""
+class CircuitBreaker:
+    """
+    A consecutive-failure circuit breaker with closed, open and half-open states.
+
+    Args:
+        name (str): The name of the protected call, e.g. a tool name.
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_timeout (float): Seconds the breaker stays open before allowing a trial call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = TOOL_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = TOOL_BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {"successes": 0, "failures": {}, "rejected": 0, "opened": 0}
+
+    def allow_request(self) -> bool:
+        """
+        Returns whether a call may go through, moving an open breaker to half-open once its cool-down has passed.
+        """
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                self._trial_in_flight = False
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def release_request(self):
+        """
+        Gives back a call allowed by allow_request that never ran, so a half-open breaker can allow another trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._stats["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state != "closed":
+                logger.info(f"Circuit breaker of '{self.name}' closed.")
+            self._state = "closed"
+            self._trial_in_flight = False
+
+    def record_failure(self, reason: str):
+        """
+        Records a failed call; reason is e.g. "error", "timeout" or "slow".
+        """
+        with self._lock:
+            self._stats["failures"][reason] = self._stats["failures"].get(reason, 0) + 1
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or (
+                self._state == "closed" and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._stats["opened"] += 1
+                logger.warning(
+                    f"Circuit breaker of '{self.name}' opened after {self._consecutive_failures} failed calls ({reason})."
+                )
+
+    def get_stats(self) -> dict:
+        """
+        Returns the state of the breaker along with its success, failure and rejection counts.
+        """
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "successes": self._stats["successes"],
+                "failures": dict(self._stats["failures"]),
+                "rejected": self._stats["rejected"],
+                "opened": self._stats["opened"],
+            }
+
+
+"""Step 3: Define the registry of breakers"""
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Returns the process-wide circuit breaker with the given name, creating it on first use.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_circuit_breaker_stats() -> dict:
+    """
+    Returns the stats of every circuit breaker, by name.
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_stats() for name, breaker in breakers.items()}
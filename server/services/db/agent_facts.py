@@ -1,20 +1,40 @@
 """This module is responsible for loading agent facts to the database."""
 """STEP 1: Import required libraries"""
+import logging
+from pymongo import UpdateOne
 from services.azure_mongodb import MongoDBClient
 from models.agent_fact import AgentFact
 from utils.consts import AGENT_FACTS
 
+logger = logging.getLogger(__name__)
+
 """STEP 2: Define the load_agent_facts_to_db function"""
 def load_agent_facts_to_db():
+    """
+    Syncs AGENT_FACTS into the agent_facts collection, keyed by sample_query.
+    Facts seeded from AGENT_FACTS that were removed from it are deleted; facts
+    added to the collection by other means are left alone.
+    """
     db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
     collection = db["agent_facts"]
 
-    if collection.count_documents({}) == 0:
-        print("There are no documents in Agent Facts. writing documents...")
-        validated_models: list[AgentFact] = [
-            AgentFact.model_validate(fact_dict) for fact_dict in AGENT_FACTS]
-        facts_to_load = [AgentFact.model_dump(
-            fact_model) for fact_model in validated_models]
-        collection.insert_many(facts_to_load)
-    else:
-        print("Agent facts are already populated. Skipping step.")
\ No newline at end of file
+    validated_models: list[AgentFact] = [
+        AgentFact.model_validate(fact_dict) for fact_dict in AGENT_FACTS]
+    operations = [
+        UpdateOne(
+            {"sample_query": fact_model.sample_query},
+            {"$set": {**AgentFact.model_dump(fact_model), "seeded": True}},
+            upsert=True,
+        )
+        for fact_model in validated_models
+    ]
+    result = collection.bulk_write(operations) if operations else None
+
+    removed = collection.delete_many({
+        "seeded": True,
+        "sample_query": {"$nin": [fact_model.sample_query for fact_model in validated_models]},
+    })
+    logger.info(
+        f"Agent facts synced: {result.upserted_count if result else 0} added, "
+        f"{result.modified_count if result else 0} updated, {removed.deleted_count} removed."
+    )
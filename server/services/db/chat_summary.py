@@ -0,0 +1,363 @@
+"""This module contains functions for reading past chat summaries from the chat_summaries collection."""
+"""Step 1: Import necessary modules"""
+import re
+import logging
+import threading
+import numpy as np
+from cachetools import TTLCache
+
+from services.azure_mongodb import MongoDBClient
+from services.embedding_cache import get_cached_embeddings
+from utils.tokens import count_tokens, truncate_to_tokens
+from utils.consts import (
+    PAST_SUMMARIES_TOKEN_BUDGET,
+    PAST_SUMMARIES_MAX_CHATS,
+    PAST_SUMMARIES_CACHE_TTL,
+    PAST_SUMMARIES_CACHE_SIZE,
+    PAST_SUMMARIES_VERSIONS_COLLECTION,
+    PAST_SUMMARIES_TOP_K,
+    PAST_SUMMARIES_INDEX_MAX_CHATS,
+    PAST_SUMMARIES_MIN_QUERY_WORDS,
+    PAST_SUMMARIES_SKIP_QUERIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Summaries are written by job-queue workers in other processes, so every cached entry keeps
+# the user's summaries version it was loaded at and is only served while that version is current.
+
+# user_id -> (version, [(chat_id, summary_text, tokens)]) of the most recent summarized chats
+_recent_summaries_cache = TTLCache(maxsize=PAST_SUMMARIES_CACHE_SIZE, ttl=PAST_SUMMARIES_CACHE_TTL)
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0}
+
+# user_id -> (version, (unit-length summary vectors, [(chat_id, summary_text, tokens)])) of the user's summarized chats
+_summary_index_cache = TTLCache(maxsize=PAST_SUMMARIES_CACHE_SIZE, ttl=PAST_SUMMARIES_CACHE_TTL)
+_index_stats = {"searches": 0, "index_loads": 0, "fallbacks": 0, "skipped_queries": 0, "indexed": 0}
+
+
+"""Step 2: Define the functions"""
+def _get_recent_summaries_query(user_id: str) -> tuple:
+    return (
+        {"user_id": user_id, "summary_text": {"$nin": ["", None]}},
+        {"chat_id": 1, "summary_text": 1},
+    )
+
+
+def _to_entries(documents: list) -> list:
+    return [
+        (document.get("chat_id"), document["summary_text"], count_tokens(document["summary_text"]))
+        for document in documents
+    ]
+
+
+def _get_version_collection():
+    return MongoDBClient.get_client()[MongoDBClient.get_db_name()][PAST_SUMMARIES_VERSIONS_COLLECTION]
+
+
+def _get_async_version_collection():
+    return MongoDBClient.get_async_client()[MongoDBClient.get_db_name()][PAST_SUMMARIES_VERSIONS_COLLECTION]
+
+
+def _get_summaries_version(user_id: str) -> int:
+    """
+    Returns the user's summaries version, bumped by invalidate_past_summaries in any process.
+    """
+    marker = _get_version_collection().find_one({"_id": user_id}, {"version": 1})
+    return (marker or {}).get("version", 0)
+
+
+async def _aget_summaries_version(user_id: str) -> int:
+    marker = await _get_async_version_collection().find_one({"_id": user_id}, {"version": 1})
+    return (marker or {}).get("version", 0)
+
+
+def _get_current(cache: TTLCache, user_id: str, version: int):
+    """
+    Returns the cached value of a user if it was loaded at the current version, else None.
+    """
+    cached = cache.get(user_id)
+    if cached is None:
+        return None
+    if cached[0] != version:
+        _cache_stats["stale"] += 1
+        return None
+    return cached[1]
+
+
+def _get_cached_entries(user_id: str, version: int):
+    with _cache_lock:
+        entries = _get_current(_recent_summaries_cache, user_id, version)
+        _cache_stats["hits" if entries is not None else "misses"] += 1
+        return entries
+
+
+def _set_cached_entries(user_id: str, version: int, entries: list):
+    with _cache_lock:
+        _recent_summaries_cache[user_id] = (version, entries)
+
+
+def _build_digest(entries: list, exclude_chat_id=None, token_budget: int = PAST_SUMMARIES_TOKEN_BUDGET) -> str:
+    """
+    Packs the most recent summaries into the token budget, newest first.
+    """
+    parts = []
+    remaining = token_budget
+    for chat_id, summary_text, tokens in entries:
+        if exclude_chat_id is not None and chat_id == int(exclude_chat_id):
+            continue
+        if tokens > remaining:
+            # Keep the head of the summary that no longer fits, then stop
+            if remaining > 0:
+                parts.append(truncate_to_tokens(summary_text, remaining))
+            break
+        parts.append(summary_text)
+        remaining -= tokens
+    return "\n".join(parts)
+
+
+def get_past_summaries_digest(user_id: str, exclude_chat_id=None) -> str:
+    """
+    Returns the user's past chat summaries for the prompt, bounded by PAST_SUMMARIES_TOKEN_BUDGET.
+
+    Args:
+        user_id (str): The user's identifier.
+        exclude_chat_id (int, optional): The chat in progress, whose summary is left out.
+
+    Returns:
+        str: The newest summaries that fit in the budget, newest first.
+    """
+    return _build_digest(_get_recent_entries(user_id, _get_summaries_version(user_id)), exclude_chat_id)
+
+
+def _get_recent_entries(user_id: str, version: int) -> list:
+    entries = _get_cached_entries(user_id, version)
+    if entries is None:
+        db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+        query, projection = _get_recent_summaries_query(user_id)
+        documents = db["chat_summaries"].find(query, projection).sort("chat_id", -1).limit(PAST_SUMMARIES_MAX_CHATS)
+        entries = _to_entries(list(documents))
+        _set_cached_entries(user_id, version, entries)
+    return entries
+
+
+async def aget_past_summaries_digest(user_id: str, exclude_chat_id=None) -> str:
+    """
+    Async version of get_past_summaries_digest.
+    """
+    return _build_digest(await _aget_recent_entries(user_id, await _aget_summaries_version(user_id)), exclude_chat_id)
+
+
+async def _aget_recent_entries(user_id: str, version: int) -> list:
+    entries = _get_cached_entries(user_id, version)
+    if entries is None:
+        db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+        query, projection = _get_recent_summaries_query(user_id)
+        cursor = db["chat_summaries"].find(query, projection).sort("chat_id", -1).limit(PAST_SUMMARIES_MAX_CHATS)
+        entries = _to_entries(await cursor.to_list(length=None))
+        _set_cached_entries(user_id, version, entries)
+    return entries
+
+
+def get_chat_summary_text(user_id: str, chat_id) -> str:
+    """
+    Returns the rolling summary of one chat, or an empty string.
+    """
+    db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+    chat_summary = db["chat_summaries"].find_one({"user_id": user_id, "chat_id": int(chat_id)}, {"summary_text": 1})
+    return (chat_summary or {}).get("summary_text") or ""
+
+
+async def aget_chat_summary_text(user_id: str, chat_id) -> str:
+    """
+    Async version of get_chat_summary_text.
+    """
+    db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+    chat_summary = await db["chat_summaries"].find_one({"user_id": user_id, "chat_id": int(chat_id)}, {"summary_text": 1})
+    return (chat_summary or {}).get("summary_text") or ""
+
+
+def _drop_cached_summaries(user_id: str):
+    with _cache_lock:
+        _recent_summaries_cache.pop(user_id, None)
+        _summary_index_cache.pop(user_id, None)
+        _cache_stats["invalidations"] += 1
+
+
+def invalidate_past_summaries(user_id: str):
+    """
+    Drops the cached summaries and summary index of a user, e.g. after a chat summary was written.
+    Bumps the user's summaries version too, so the caches of the other processes stop serving them.
+    """
+    _drop_cached_summaries(user_id)
+    _get_version_collection().update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def ainvalidate_past_summaries(user_id: str):
+    """
+    Async version of invalidate_past_summaries.
+    """
+    _drop_cached_summaries(user_id)
+    await _get_async_version_collection().update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+
+"""Step 3: Define the semantic retrieval over the user's past summaries"""
+def _to_unit_vector(embedding: list) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _is_searchable(query: str) -> bool:
+    """
+    Whether a message is worth an embedding call: greetings and short replies carry no
+    topic to search for, so they get the recent summaries instead.
+    """
+    words = re.sub(r"[^\w\s]", " ", (query or "").lower()).split()
+    searchable = len(words) >= PAST_SUMMARIES_MIN_QUERY_WORDS and " ".join(words) not in PAST_SUMMARIES_SKIP_QUERIES
+    if query and not searchable:
+        with _cache_lock:
+            _index_stats["skipped_queries"] += 1
+    return searchable
+
+
+def _get_summary_index_query(user_id: str) -> tuple:
+    return (
+        {"user_id": user_id, "summary_vector": {"$exists": True}, "summary_text": {"$nin": ["", None]}},
+        {"chat_id": 1, "summary_text": 1, "summary_vector": 1},
+    )
+
+
+def _to_summary_index(documents: list) -> tuple:
+    if not documents:
+        return np.zeros((0, 0), dtype=np.float32), []
+    matrix = np.vstack([_to_unit_vector(document["summary_vector"]) for document in documents])
+    return matrix, _to_entries(documents)
+
+
+def _get_cached_summary_index(user_id: str, version: int):
+    with _cache_lock:
+        _index_stats["searches"] += 1
+        return _get_current(_summary_index_cache, user_id, version)
+
+
+def _set_cached_summary_index(user_id: str, version: int, index: tuple):
+    with _cache_lock:
+        _summary_index_cache[user_id] = (version, index)
+        _index_stats["index_loads"] += 1
+
+
+def _rank_summaries(index: tuple, query_vector: list, exclude_chat_id=None, k: int = PAST_SUMMARIES_TOP_K) -> list:
+    """
+    Returns the entries of the k summaries most similar to the query, most similar first.
+    """
+    matrix, entries = index
+    scores = matrix @ _to_unit_vector(query_vector)
+    ranked = [entries[i] for i in np.argsort(-scores)]
+    if exclude_chat_id is not None:
+        ranked = [entry for entry in ranked if entry[0] != int(exclude_chat_id)]
+    return ranked[:k]
+
+
+def search_past_summaries(user_id: str, query: str, exclude_chat_id=None) -> str:
+    """
+    Returns the user's past chat summaries most relevant to a message, bounded by
+    PAST_SUMMARIES_TOKEN_BUDGET. Falls back to the most recent summaries, without an
+    embedding call, when the message is empty, short or a greeting, or when none of the
+    user's summaries is indexed yet.
+
+    Args:
+        user_id (str): The user's identifier.
+        query (str): The user's current message.
+        exclude_chat_id (int, optional): The chat in progress, whose summary is left out.
+
+    Returns:
+        str: The top PAST_SUMMARIES_TOP_K summaries that fit in the budget, most relevant first.
+    """
+    index = None
+    version = _get_summaries_version(user_id)
+    if _is_searchable(query):
+        index = _get_cached_summary_index(user_id, version)
+        if index is None:
+            db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+            search_query, projection = _get_summary_index_query(user_id)
+            documents = db["chat_summaries"].find(search_query, projection).sort("chat_id", -1).limit(PAST_SUMMARIES_INDEX_MAX_CHATS)
+            index = _to_summary_index(list(documents))
+            _set_cached_summary_index(user_id, version, index)
+
+    if not index or not index[1]:
+        with _cache_lock:
+            _index_stats["fallbacks"] += 1
+        return _build_digest(_get_recent_entries(user_id, version), exclude_chat_id)
+
+    query_vector = get_cached_embeddings().embed_query(query)
+    return _build_digest(_rank_summaries(index, query_vector, exclude_chat_id))
+
+
+async def asearch_past_summaries(user_id: str, query: str, exclude_chat_id=None) -> str:
+    """
+    Async version of search_past_summaries.
+    """
+    index = None
+    version = await _aget_summaries_version(user_id)
+    if _is_searchable(query):
+        index = _get_cached_summary_index(user_id, version)
+        if index is None:
+            db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+            search_query, projection = _get_summary_index_query(user_id)
+            cursor = db["chat_summaries"].find(search_query, projection).sort("chat_id", -1).limit(PAST_SUMMARIES_INDEX_MAX_CHATS)
+            index = _to_summary_index(await cursor.to_list(length=None))
+            _set_cached_summary_index(user_id, version, index)
+
+    if not index or not index[1]:
+        with _cache_lock:
+            _index_stats["fallbacks"] += 1
+        return _build_digest(await _aget_recent_entries(user_id, version), exclude_chat_id)
+
+    query_vector = await get_cached_embeddings().aembed_query(query)
+    return _build_digest(_rank_summaries(index, query_vector, exclude_chat_id))
+
+
+def index_chat_summary(user_id: str, chat_id, summary_text: str):
+    """
+    Embeds a chat summary and stores its vector next to it, so later chats can retrieve it.
+    The caller invalidates the user's past summaries once the summary is written.
+    """
+    if not summary_text:
+        return
+    db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+    vector = get_cached_embeddings().embed_query(summary_text)
+    db["chat_summaries"].update_one(
+        {"user_id": user_id, "chat_id": int(chat_id)},
+        {"$set": {"summary_vector": vector}}
+    )
+    with _cache_lock:
+        _index_stats["indexed"] += 1
+
+
+async def aindex_chat_summary(user_id: str, chat_id, summary_text: str):
+    """
+    Async version of index_chat_summary.
+    """
+    if not summary_text:
+        return
+    db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+    vector = await get_cached_embeddings().aembed_query(summary_text)
+    await db["chat_summaries"].update_one(
+        {"user_id": user_id, "chat_id": int(chat_id)},
+        {"$set": {"summary_vector": vector}}
+    )
+    with _cache_lock:
+        _index_stats["indexed"] += 1
+
+
+def get_past_summaries_cache_stats() -> dict:
+    """
+    Returns the size and hit/miss counts of the past summaries cache and of the summary index.
+    """
+    with _cache_lock:
+        return {
+            "size": len(_recent_summaries_cache),
+            **_cache_stats,
+            "index": {"size": len(_summary_index_cache), **_index_stats},
+        }
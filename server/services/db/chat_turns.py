@@ -0,0 +1,143 @@
+"""This module contains the chat history stored in the chat_turns collection of the MongoDB database."""
+"""Step 1: Import necessary modules"""
+import json
+import logging
+from typing import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage, message_to_dict, messages_from_dict
+
+from services.azure_mongodb import MongoDBClient
+from services.db.chat_summary import get_chat_summary_text, aget_chat_summary_text
+from utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+CHAT_TURNS_COLLECTION = "chat_turns"
+SESSION_ID_KEY = "SessionId"
+HISTORY_KEY = "History"
+
+
+"""Step 2: Define the ChatTurnHistory class"""
+class ChatTurnHistory(BaseChatMessageHistory):
+    """
+    Chat message history of one session, with sync and native async access.
+
+    Documents use the same layout as langchain_mongodb's MongoDBChatMessageHistory,
+    but the shared MongoDBClient connections are reused instead of opening a new
+    client for every session.
+
+    With max_messages set, reading the history only fetches the last messages of the
+    session (sorted and limited by the server), further trimmed to token_budget. With
+    include_summary, the turns left out are replaced by the chat's rolling summary.
+    """
+    _index_created = False
+
+    def __init__(self, session_id: str, max_messages: int = None, token_budget: int = None, include_summary: bool = False):
+        self.session_id = session_id
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.include_summary = include_summary
+        self.collection = MongoDBClient.get_client()[MongoDBClient.get_db_name()][CHAT_TURNS_COLLECTION]
+        if not ChatTurnHistory._index_created:
+            self.collection.create_index(SESSION_ID_KEY)
+            ChatTurnHistory._index_created = True
+
+    @staticmethod
+    def _get_async_collection():
+        return MongoDBClient.get_async_client()[MongoDBClient.get_db_name()][CHAT_TURNS_COLLECTION]
+
+    def _to_document(self, message: BaseMessage) -> dict:
+        return {
+            SESSION_ID_KEY: self.session_id,
+            HISTORY_KEY: json.dumps(message_to_dict(message)),
+        }
+
+    def _split_session_id(self) -> tuple:
+        # Session ids are "<user_id>-<chat_id>"
+        user_id, _, chat_id = self.session_id.rpartition("-")
+        return user_id, int(chat_id) if chat_id.isdigit() else None
+
+    def _window(self, newest_first: list) -> tuple[list[BaseMessage], bool]:
+        """
+        Turns the newest max_messages + 1 documents into the message window.
+        Returns the window, oldest first, and whether older messages were left out.
+        """
+        truncated = len(newest_first) > self.max_messages
+        documents = newest_first[:self.max_messages]
+
+        if self.token_budget is not None:
+            used = 0
+            for index, document in enumerate(documents):
+                used += count_tokens(json.loads(document[HISTORY_KEY])["data"].get("content") or "")
+                if used > self.token_budget:
+                    documents = documents[:index]
+                    truncated = True
+                    break
+
+        messages = messages_from_dict([json.loads(document[HISTORY_KEY]) for document in reversed(documents)])
+
+        # Start the window on a human message so no answer is left without its question
+        while messages and messages[0].type != "human":
+            messages.pop(0)
+            truncated = True
+        return messages, truncated
+
+    def _with_summary(self, messages: list[BaseMessage], summary: str) -> list[BaseMessage]:
+        if not summary:
+            return messages
+        return [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] + messages
+
+    def _find_recent(self, collection):
+        return collection.find({SESSION_ID_KEY: self.session_id}).sort("_id", -1).limit(self.max_messages + 1)
+
+    @property
+    def messages(self) -> list[BaseMessage]:
+        if self.max_messages is None:
+            cursor = self.collection.find({SESSION_ID_KEY: self.session_id})
+            return messages_from_dict([json.loads(document[HISTORY_KEY]) for document in cursor])
+
+        messages, truncated = self._window(list(self._find_recent(self.collection)))
+        user_id, chat_id = self._split_session_id()
+        if truncated and self.include_summary and chat_id is not None:
+            messages = self._with_summary(messages, get_chat_summary_text(user_id, chat_id))
+        logger.debug(f"Loaded {len(messages)} history messages for session {self.session_id}")
+        return messages
+
+    def get_messages_after(self, offset: int) -> list[BaseMessage]:
+        """
+        Returns the messages of the session after the first `offset` ones.
+        """
+        cursor = self.collection.find({SESSION_ID_KEY: self.session_id}).sort("_id", 1).skip(offset)
+        return messages_from_dict([json.loads(document[HISTORY_KEY]) for document in cursor])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            self.collection.insert_many([self._to_document(message) for message in messages])
+
+    def clear(self) -> None:
+        self.collection.delete_many({SESSION_ID_KEY: self.session_id})
+
+    async def aget_messages(self) -> list[BaseMessage]:
+        if self.max_messages is None:
+            cursor = self._get_async_collection().find({SESSION_ID_KEY: self.session_id})
+            return messages_from_dict([json.loads(document[HISTORY_KEY]) async for document in cursor])
+
+        cursor = self._find_recent(self._get_async_collection())
+        messages, truncated = self._window(await cursor.to_list(length=None))
+        user_id, chat_id = self._split_session_id()
+        if truncated and self.include_summary and chat_id is not None:
+            messages = self._with_summary(messages, await aget_chat_summary_text(user_id, chat_id))
+        logger.debug(f"Loaded {len(messages)} history messages for session {self.session_id}")
+        return messages
+
+    async def aget_messages_after(self, offset: int) -> list[BaseMessage]:
+        cursor = self._get_async_collection().find({SESSION_ID_KEY: self.session_id}).sort("_id", 1).skip(offset)
+        return messages_from_dict([json.loads(document[HISTORY_KEY]) async for document in cursor])
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if messages:
+            await self._get_async_collection().insert_many([self._to_document(message) for message in messages])
+
+    async def aclear(self) -> None:
+        await self._get_async_collection().delete_many({SESSION_ID_KEY: self.session_id})
@@ -3,15 +3,22 @@
 from services.azure_mongodb import MongoDBClient
 import logging
 import json
+import threading
+from cachetools import TTLCache
 from pymongo.collection import ReturnDocument
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+from utils.consts import PREFERRED_LANGUAGE_CACHE_TTL, PREFERRED_LANGUAGE_CACHE_SIZE
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 db = MongoDBClient.get_client()[MongoDBClient.get_db_name()]
 
+# user_id -> preferred language code, read on every chat turn to pick the prompt prefix
+_preferred_language_cache = TTLCache(maxsize=PREFERRED_LANGUAGE_CACHE_SIZE, ttl=PREFERRED_LANGUAGE_CACHE_TTL)
+_preferred_language_lock = threading.Lock()
+
 """Step 2: Define the functions"""
 def save_user(db, user_data):
     try:
@@ -39,6 +46,75 @@ def get_user_profile_by_user_id(user_id: str) -> str:
         return ""
 
     doc = db["users"].find_one({"_id": user_objectid}, {"password": 0, "email": 0})
+    if doc is None:
+        logger.warning(f"User {user_id} not found.")
+        return ""
     if "contentVector" in doc:
         del doc["contentVector"]
-    return json.dumps(doc, default=str)
\ No newline at end of file
+    return json.dumps(doc, default=str)
+
+async def aget_user_profile_by_user_id(user_id: str) -> str:
+    """
+    Async version of get_user_profile_by_user_id.
+    """
+    try:
+        user_objectid = ObjectId(user_id)
+    except InvalidId as e:
+        logger.error(f"Invalid user ID: {str(e)}")
+        return ""
+
+    async_db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+    doc = await async_db["users"].find_one({"_id": user_objectid}, {"password": 0, "email": 0})
+    if doc is None:
+        logger.warning(f"User {user_id} not found.")
+        return ""
+    if "contentVector" in doc:
+        del doc["contentVector"]
+    return json.dumps(doc, default=str)
+
+def _to_language_query(user_id: str):
+    try:
+        return {"_id": ObjectId(user_id)}
+    except InvalidId as e:
+        logger.error(f"Invalid user ID: {str(e)}")
+        return None
+
+def get_preferred_language(user_id: str) -> str:
+    """
+    Returns the user's preferred language code, defaulting to 'en'. Results are cached per user.
+    """
+    with _preferred_language_lock:
+        language = _preferred_language_cache.get(user_id)
+    if language is not None:
+        return language
+
+    query = _to_language_query(user_id)
+    doc = db["users"].find_one(query, {"preferredLanguage": 1}) if query else None
+    language = (doc or {}).get("preferredLanguage") or "en"
+    with _preferred_language_lock:
+        _preferred_language_cache[user_id] = language
+    return language
+
+async def aget_preferred_language(user_id: str) -> str:
+    """
+    Async version of get_preferred_language.
+    """
+    with _preferred_language_lock:
+        language = _preferred_language_cache.get(user_id)
+    if language is not None:
+        return language
+
+    query = _to_language_query(user_id)
+    async_db = MongoDBClient.get_async_client()[MongoDBClient.get_db_name()]
+    doc = await async_db["users"].find_one(query, {"preferredLanguage": 1}) if query else None
+    language = (doc or {}).get("preferredLanguage") or "en"
+    with _preferred_language_lock:
+        _preferred_language_cache[user_id] = language
+    return language
+
+def invalidate_preferred_language(user_id: str):
+    """
+    Drops the cached preferred language of a user, e.g. after a profile update.
+    """
+    with _preferred_language_lock:
+        _preferred_language_cache.pop(user_id, None)
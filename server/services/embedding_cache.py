@@ -0,0 +1,239 @@
+"""
+This module contains an embedding cache in front of the Azure OpenAI embeddings model.
+
+Vectors are keyed by a hash of the model and the text. Lookups go to an in-memory LRU tier
+first, then to a MongoDB tier shared by every process; only texts missing from both are
+sent to the embeddings API.
+
+The cached texts include user messages, so the MongoDB tier does not keep them for good:
+a TTL index removes each vector EMBEDDING_CACHE_TTL seconds after it was stored.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from cachetools import LRUCache
+from pymongo.errors import BulkWriteError
+from langchain_core.embeddings import Embeddings
+
+from services.azure_mongodb import MongoDBClient
+from services.ai import get_azure_openai_embeddings
+from utils.consts import EMBEDDING_CACHE_COLLECTION, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+_cached_embeddings = None
+_cached_embeddings_lock = threading.Lock()
+
+
+"""Step 2: Define the CachedEmbeddings class"""
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with an in-memory LRU tier and an optional MongoDB tier.
+
+    Args:
+        embeddings (Embeddings): The embeddings model to call on a miss.
+        model_name (str): Part of the cache key, so vectors of different models never mix.
+        maxsize (int): The number of vectors kept in memory.
+        persist (bool): Whether vectors are also stored in and read from MongoDB.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, maxsize: int = EMBEDDING_CACHE_SIZE, persist: bool = True):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.persist = persist
+        # Vectors are kept as float32 arrays, half the size of Python float lists
+        self._memory = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+
+    def _get_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode("utf-8")).hexdigest()
+
+    def _get_collection(self):
+        return MongoDBClient.get_client()[MongoDBClient.get_db_name()][EMBEDDING_CACHE_COLLECTION]
+
+    def _get_async_collection(self):
+        return MongoDBClient.get_async_client()[MongoDBClient.get_db_name()][EMBEDDING_CACHE_COLLECTION]
+
+    def create_indexes(self):
+        """
+        Creates the TTL index that expires stored vectors and the index on the model,
+        which lets the vectors of a retired model be dropped.
+        """
+        if not self.persist:
+            return
+        try:
+            collection = self._get_collection()
+            collection.create_index("created_at", expireAfterSeconds=EMBEDDING_CACHE_TTL)
+            collection.create_index("model")
+        except Exception as e:
+            logger.warning(f"Could not create the indexes of the embedding cache: {e}")
+
+    def _count(self, outcome: str, amount: int):
+        if amount:
+            with self._lock:
+                self._stats[outcome] += amount
+
+    def _remember(self, key: str, vector: list[float]):
+        with self._lock:
+            self._memory[key] = np.asarray(vector, dtype=np.float32)
+
+    def _lookup_memory(self, keys: list[str]) -> dict:
+        found = {}
+        with self._lock:
+            for key in set(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    found[key] = vector.tolist()
+        return found
+
+    def _to_documents(self, vectors: dict) -> list[dict]:
+        now = datetime.now(timezone.utc)
+        return [
+            {"_id": key, "model": self.model_name, "vector": vector, "created_at": now}
+            for key, vector in vectors.items()
+        ]
+
+    def _lookup(self, keys: list[str]) -> dict:
+        found = self._lookup_memory(keys)
+        self._count("memory_hits", sum(1 for key in keys if key in found))
+
+        missing = list({key for key in keys if key not in found})
+        if missing and self.persist:
+            try:
+                for document in self._get_collection().find({"_id": {"$in": missing}}, {"vector": 1}):
+                    found[document["_id"]] = document["vector"]
+                    self._remember(document["_id"], document["vector"])
+                self._count("store_hits", sum(1 for key in keys if key in missing and key in found))
+            except Exception as e:
+                logger.warning(f"Could not read the embedding cache: {e}")
+        return found
+
+    async def _alookup(self, keys: list[str]) -> dict:
+        found = self._lookup_memory(keys)
+        self._count("memory_hits", sum(1 for key in keys if key in found))
+
+        missing = list({key for key in keys if key not in found})
+        if missing and self.persist:
+            try:
+                cursor = self._get_async_collection().find({"_id": {"$in": missing}}, {"vector": 1})
+                async for document in cursor:
+                    found[document["_id"]] = document["vector"]
+                    self._remember(document["_id"], document["vector"])
+                self._count("store_hits", sum(1 for key in keys if key in missing and key in found))
+            except Exception as e:
+                logger.warning(f"Could not read the embedding cache: {e}")
+        return found
+
+    def _store(self, vectors: dict):
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        if vectors and self.persist:
+            try:
+                self._get_collection().insert_many(self._to_documents(vectors), ordered=False)
+            except BulkWriteError:
+                pass  # Another process stored some of the same vectors first
+            except Exception as e:
+                logger.warning(f"Could not write the embedding cache: {e}")
+
+    async def _astore(self, vectors: dict):
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        if vectors and self.persist:
+            try:
+                await self._get_async_collection().insert_many(self._to_documents(vectors), ordered=False)
+            except BulkWriteError:
+                pass
+            except Exception as e:
+                logger.warning(f"Could not write the embedding cache: {e}")
+
+    def _get_missing_texts(self, texts: list[str], keys: list[str], found: dict) -> dict:
+        # key -> text of each distinct text that still has to be embedded
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found:
+                missing.setdefault(key, text)
+        self._count("misses", len(missing))
+        return missing
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._get_key(text) for text in texts]
+        found = self._lookup(keys)
+
+        missing = self._get_missing_texts(texts, keys, found)
+        if missing:
+            vectors = dict(zip(missing.keys(), self.embeddings.embed_documents(list(missing.values()))))
+            self._store(vectors)
+            found.update(vectors)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._get_key(text)
+        found = self._lookup([key])
+        if key not in found:
+            self._count("misses", 1)
+            found[key] = self.embeddings.embed_query(text)
+            self._store({key: found[key]})
+        return found[key]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._get_key(text) for text in texts]
+        found = await self._alookup(keys)
+
+        missing = self._get_missing_texts(texts, keys, found)
+        if missing:
+            vectors = dict(zip(missing.keys(), await self.embeddings.aembed_documents(list(missing.values()))))
+            await self._astore(vectors)
+            found.update(vectors)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._get_key(text)
+        found = await self._alookup([key])
+        if key not in found:
+            self._count("misses", 1)
+            found[key] = await self.embeddings.aembed_query(text)
+            await self._astore({key: found[key]})
+        return found[key]
+
+    def get_stats(self) -> dict:
+        """
+        Returns the in-memory size, hit/miss counts and hit rate of the cache.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["store_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+"""Step 3: Define the shared instance"""
+def get_cached_embeddings() -> CachedEmbeddings:
+    """
+    Returns the process-wide cached Azure OpenAI embeddings model, creating the indexes of
+    its MongoDB tier on first use. The MongoDB tier can be turned off with EMBEDDING_CACHE_PERSIST=false.
+    """
+    global _cached_embeddings
+    with _cached_embeddings_lock:
+        if _cached_embeddings is None:
+            embeddings = get_azure_openai_embeddings()
+            _cached_embeddings = CachedEmbeddings(
+                embeddings,
+                model_name=embeddings.deployment or embeddings.model,
+                persist=os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true",
+            )
+            _cached_embeddings.create_indexes()
+        return _cached_embeddings
+
+
+def get_embedding_cache_stats() -> dict:
+    """
+    Returns the stats of the shared embedding cache, or an empty dict if it is not in use yet.
+    """
+    return _cached_embeddings.get_stats() if _cached_embeddings is not None else {}
@@ -0,0 +1,214 @@
+"""
+This module contains the shared HTTP client of the agent tools.
+
+Requests to each host go through one keep-alive session with a bounded connection pool,
+default connect/read timeouts and retries of idempotent requests. The latency, status and
+retry counts of every call are recorded per host.
+"""
+
+"""Step 1: Import necessary modules"""
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.consts import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_RETRY_STATUSES,
+)
+
+logger = logging.getLogger(__name__)
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_host_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+# Shared async HTTP client, created on the shared event loop on first use
+_async_http_client = None
+
+
+"""Step 2: Define the per-host metrics"""
+def _get_host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _record(host: str, seconds: float, status: int = None, retries: int = 0):
+    with _stats_lock:
+        stats = _host_stats.setdefault(
+            host, {"requests": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0, "statuses": {}}
+        )
+        stats["requests"] += 1
+        stats["retries"] += retries
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if status is None or status >= 400:
+            stats["errors"] += 1
+        status_class = f"{status // 100}xx" if status else "failed"
+        stats["statuses"][status_class] = stats["statuses"].get(status_class, 0) + 1
+
+
+def get_http_client_stats() -> dict:
+    """
+    Returns the request, error and retry counts and the average and maximum latency per host.
+    """
+    with _stats_lock:
+        stats = {}
+        for host, host_stats in _host_stats.items():
+            stats[host] = {
+                "requests": host_stats["requests"],
+                "errors": host_stats["errors"],
+                "retries": host_stats["retries"],
+                "avg_ms": round(host_stats["total_seconds"] / host_stats["requests"] * 1000, 1),
+                "max_ms": round(host_stats["max_seconds"] * 1000, 1),
+                "statuses": dict(host_stats["statuses"]),
+            }
+        return stats
+
+
+"""Step 3: Define the sync client"""
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Returns the keep-alive session of a URL's host, creating it on first use.
+    """
+    host = _get_host(url)
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _create_session()
+    return session
+
+
+def http_get(url: str, params: dict = None, timeout: tuple = None, **kwargs) -> requests.Response:
+    """
+    Sends a GET request through the pooled session of the URL's host.
+
+    Args:
+        url (str): The URL to request.
+        params (dict): The query parameters.
+        timeout (tuple): (connect, read) timeouts in seconds; defaults to HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT.
+
+    Returns:
+        requests.Response: The response. Retryable statuses are retried before it is returned.
+    """
+    host = _get_host(url)
+    started = time.perf_counter()
+    try:
+        response = get_session(url).get(
+            url, params=params, timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), **kwargs
+        )
+    except requests.RequestException:
+        _record(host, time.perf_counter() - started)
+        raise
+    retries = getattr(response.raw, "retries", None)
+    _record(host, time.perf_counter() - started, response.status_code, len(retries.history) if retries else 0)
+    return response
+
+
+def http_post(url: str, json: dict = None, timeout: tuple = None, **kwargs) -> requests.Response:
+    """
+    Sends a POST request through the pooled session of the URL's host. POST requests are not retried.
+
+    Args:
+        url (str): The URL to request.
+        json (dict): The JSON body.
+        timeout (tuple): (connect, read) timeouts in seconds; defaults to HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT.
+
+    Returns:
+        requests.Response: The response.
+    """
+    host = _get_host(url)
+    started = time.perf_counter()
+    try:
+        response = get_session(url).post(
+            url, json=json, timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), **kwargs
+        )
+    except requests.RequestException:
+        _record(host, time.perf_counter() - started)
+        raise
+    _record(host, time.perf_counter() - started, response.status_code)
+    return response
+
+
+"""Step 4: Define the async client"""
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client, with the same pool size and timeouts as the sync sessions.
+    """
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            # httpx retries connection failures only; statuses are retried in ahttp_get
+            transport=httpx.AsyncHTTPTransport(
+                retries=HTTP_MAX_RETRIES,
+                limits=httpx.Limits(max_keepalive_connections=HTTP_POOL_MAXSIZE),
+            ),
+        )
+    return _async_http_client
+
+
+async def ahttp_get(url: str, params: dict = None, **kwargs) -> httpx.Response:
+    """
+    Async version of http_get.
+    """
+    host = _get_host(url)
+    started = time.perf_counter()
+    retries = 0
+    while True:
+        try:
+            response = await get_async_http_client().get(url, params=params, **kwargs)
+        except httpx.HTTPError:
+            _record(host, time.perf_counter() - started, retries=retries)
+            raise
+        if response.status_code not in HTTP_RETRY_STATUSES or retries == HTTP_MAX_RETRIES:
+            break
+        retry_after = response.headers.get("retry-after", "")
+        delay = min(float(retry_after), HTTP_READ_TIMEOUT) if retry_after.isdigit() else HTTP_BACKOFF_FACTOR * 2 ** retries
+        retries += 1
+        await asyncio.sleep(delay)
+    _record(host, time.perf_counter() - started, response.status_code, retries)
+    return response
+
+
+async def ahttp_post(url: str, json: dict = None, **kwargs) -> httpx.Response:
+    """
+    Async version of http_post.
+    """
+    host = _get_host(url)
+    started = time.perf_counter()
+    try:
+        response = await get_async_http_client().post(url, json=json, **kwargs)
+    except httpx.HTTPError:
+        _record(host, time.perf_counter() - started)
+        raise
+    _record(host, time.perf_counter() - started, response.status_code)
+    return response
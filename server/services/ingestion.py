@@ -0,0 +1,173 @@
+"""
+This module contains the embedding ingestion pipeline of the vector stores.
+
+Source documents are streamed in, split into chunks and grouped into batches. Batches are
+embedded concurrently, with backoff when the embeddings API rate-limits us, and their
+vectors are bulk-inserted into the vector store collection.
+"""
+
+"""Step 1: Import necessary modules"""
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, Iterator
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pymongo.collection import Collection
+
+from services.quantization import encode_vector
+from utils.consts import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_BACKOFF_BASE,
+    EMBEDDING_BACKOFF_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying; anything else fails the batch right away
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+"""Step 2: Define the IngestionPipeline class"""
+class IngestionPipeline:
+    """
+    Embeds source documents into a vector store collection.
+
+    Args:
+        vector_store_collection (Collection): The collection the vectors are inserted into.
+        embeddings (Embeddings): The embeddings model.
+        batch_size (int): Chunks per embeddings request.
+        concurrency (int): Embedding batches in flight.
+        quantization (str): How vectors are stored: "none" (float arrays), "float16" or "int8".
+    """
+
+    def __init__(
+        self,
+        vector_store_collection: Collection,
+        embeddings: Embeddings,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        quantization: str = "none",
+    ):
+        self.vector_store_collection = vector_store_collection
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.quantization = quantization
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=20,
+            length_function=len,
+            is_separator_regex=False,
+        )
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _split(self, documents: Iterable[tuple]) -> Iterator[dict]:
+        """
+        Splits (source_id, text, metadata, content_hash) tuples into vector store chunks.
+        """
+        for source_id, text, metadata, content_hash in documents:
+            self._count("documents")
+            for chunk in self.text_splitter.split_text(text):
+                yield {
+                    "textContent": chunk,
+                    "metadata": metadata,
+                    "source_id": source_id,
+                    "content_hash": content_hash,
+                }
+
+    def _batched(self, chunks: Iterator[dict]) -> Iterator[list[dict]]:
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _get_retry_delay(error: Exception, attempt: int) -> float:
+        # Honour the server's Retry-After on rate limits, otherwise back off exponentially with jitter
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), EMBEDDING_BACKOFF_MAX)
+            except ValueError:
+                pass
+        delay = min(EMBEDDING_BACKOFF_BASE * 2 ** attempt, EMBEDDING_BACKOFF_MAX)
+        return random.uniform(delay / 2, delay)
+
+    def _embed_with_backoff(self, texts: list[str]) -> list[list[float]]:
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = self._get_retry_delay(e, attempt)
+                self._count("retries")
+                logger.warning(f"Embedding batch failed ({type(e).__name__}); retrying in {delay:.1f}s.")
+                time.sleep(delay)
+
+    def _process_batch(self, batch: list[dict]) -> int:
+        vectors = self._embed_with_backoff([chunk["textContent"] for chunk in batch])
+        self.vector_store_collection.insert_many(
+            [{**chunk, **encode_vector(vector, self.quantization)} for chunk, vector in zip(batch, vectors)],
+            ordered=False,
+        )
+        self._count("chunks", len(batch))
+        self._count("batches")
+        return len(batch)
+
+    def run(self, documents: Iterable[tuple]) -> dict:
+        """
+        Embeds and inserts a stream of source documents.
+
+        Args:
+            documents (Iterable[tuple]): (source_id, text, metadata, content_hash) tuples.
+
+        Returns:
+            dict: Counts of documents, chunks, batches and retries, with the elapsed
+            seconds and the throughput in documents and chunks per second.
+        """
+        self._stats = {"documents": 0, "chunks": 0, "batches": 0, "retries": 0}
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ingestion") as pool:
+            pending = set()
+            try:
+                for batch in self._batched(self._split(documents)):
+                    # Bound the batches in memory while the source is still being read
+                    if len(pending) >= self.concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(pool.submit(self._process_batch, batch))
+
+                for future in wait(pending).done:
+                    future.result()
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["seconds"] = round(elapsed, 3)
+        stats["documents_per_second"] = round(stats["documents"] / elapsed, 2) if elapsed else 0.0
+        stats["chunks_per_second"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+        logger.info(f"Ingested into '{self.vector_store_collection.name}': {stats}")
+        return stats
@@ -0,0 +1,252 @@
+"""
+This module contains a MongoDB-backed job queue processed by a local pool of worker threads.
+
+Jobs are documents whose _id is the job key, so enqueuing the same key twice while it is
+queued or running is a no-op. Workers claim jobs atomically, which lets several processes
+share one queue; failed jobs are retried with exponential backoff.
+"""
+
+"""Step 1: Import necessary modules"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.azure_mongodb import MongoDBClient
+from utils.consts import (
+    JOB_MAX_ATTEMPTS,
+    JOB_BACKOFF_BASE,
+    JOB_BACKOFF_MAX,
+    JOB_POLL_INTERVAL,
+    JOB_LOCK_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+"""Step 2: Define the JobQueue class"""
+class JobQueue:
+    """
+    A durable queue of jobs stored in a MongoDB collection.
+
+    Args:
+        collection_name (str): The collection holding the jobs.
+        handler (callable): Called with the job's payload dict; raising marks the attempt as failed.
+        workers (int): The number of worker threads started by start().
+        max_attempts (int): Attempts before a job is marked as failed for good.
+    """
+
+    def __init__(self, collection_name: str, handler, workers: int = 1, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.collection_name = collection_name
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._threads = []
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "processed": 0, "retried": 0, "failed": 0}
+        self._index_created = False
+
+    def _get_collection(self):
+        collection = MongoDBClient.get_client()[MongoDBClient.get_db_name()][self.collection_name]
+        if not self._index_created:
+            collection.create_index([("status", 1), ("next_run_at", 1)])
+            self._index_created = True
+        return collection
+
+    def _count(self, outcome: str):
+        with self._stats_lock:
+            self._stats[outcome] += 1
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _get_backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(JOB_BACKOFF_BASE * 2 ** max(attempts - 1, 0), JOB_BACKOFF_MAX))
+
+    def enqueue(self, job_id: str, payload: dict) -> dict:
+        """
+        Queues a job unless a job with the same id is already queued or running.
+
+        Args:
+            job_id (str): The idempotency key of the job.
+            payload (dict): The arguments passed to the handler.
+
+        Returns:
+            dict: The job document.
+        """
+        collection = self._get_collection()
+        now = self._now()
+        try:
+            # Matches a finished job with this id (which is queued again) or inserts a new one;
+            # a queued or running job does not match, so the upsert hits the duplicate _id
+            job = collection.find_one_and_update(
+                {"_id": job_id, "status": {"$in": [DONE, FAILED]}},
+                {
+                    "$set": {
+                        "payload": payload,
+                        "status": QUEUED,
+                        "attempts": 0,
+                        "next_run_at": now,
+                        "updated_at": now,
+                        "last_error": None,
+                    },
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            self._count("enqueued")
+            self._wake_event.set()
+            logger.info(f"Queued job {job_id} in {self.collection_name}.")
+            return job
+        except DuplicateKeyError:
+            logger.info(f"Job {job_id} is already pending in {self.collection_name}.")
+            return collection.find_one({"_id": job_id})
+
+    def get_job(self, job_id: str) -> dict:
+        """
+        Returns the job document, or None if the job does not exist.
+        """
+        return self._get_collection().find_one({"_id": job_id})
+
+    def _claim(self, worker_name: str) -> dict:
+        """
+        Atomically marks the next due job as running and returns it.
+        Running jobs whose lock has expired (their worker died) are claimed again.
+        """
+        now = self._now()
+        return self._get_collection().find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED, "next_run_at": {"$lte": now}},
+                    {"status": RUNNING, "locked_at": {"$lte": now - timedelta(seconds=JOB_LOCK_TIMEOUT)}},
+                ]
+            },
+            {
+                "$set": {"status": RUNNING, "locked_by": worker_name, "locked_at": now, "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _complete(self, job: dict):
+        now = self._now()
+        self._get_collection().update_one(
+            {"_id": job["_id"], "locked_at": job["locked_at"]},
+            {"$set": {"status": DONE, "finished_at": now, "updated_at": now, "last_error": None}},
+        )
+        self._count("processed")
+
+    def _fail(self, job: dict, error: Exception):
+        now = self._now()
+        if job["attempts"] < self.max_attempts:
+            update = {"status": QUEUED, "next_run_at": now + self._get_backoff(job["attempts"])}
+            self._count("retried")
+        else:
+            update = {"status": FAILED, "finished_at": now}
+            self._count("failed")
+        update.update({"updated_at": now, "last_error": str(error)})
+        self._get_collection().update_one({"_id": job["_id"], "locked_at": job["locked_at"]}, {"$set": update})
+
+    def process_next(self, worker_name: str = "inline") -> bool:
+        """
+        Claims and runs the next due job.
+
+        Returns:
+            bool: Whether a job was found.
+        """
+        job = self._claim(worker_name)
+        if job is None:
+            return False
+
+        logger.info(f"{worker_name} running job {job['_id']} (attempt {job['attempts']}).")
+        try:
+            self.handler(job.get("payload") or {})
+            self._complete(job)
+        except Exception as e:
+            logger.error(f"Job {job['_id']} failed on attempt {job['attempts']}: {e}", exc_info=True)
+            self._fail(job, e)
+        return True
+
+    def _work(self, worker_name: str):
+        while not self._stop_event.is_set():
+            try:
+                if self.process_next(worker_name):
+                    continue
+            except Exception as e:
+                logger.error(f"{worker_name} could not poll {self.collection_name}: {e}", exc_info=True)
+            # Sleep until the poll interval elapses or a job is enqueued in this process
+            self._wake_event.wait(JOB_POLL_INTERVAL)
+            self._wake_event.clear()
+
+    def start(self):
+        """
+        Starts the worker threads, once per process.
+        """
+        if self._threads:
+            return
+        self._stop_event.clear()
+        for index in range(self.workers):
+            worker_name = f"{self.collection_name}-worker-{os.getpid()}-{index}"
+            thread = threading.Thread(target=self._work, args=(worker_name,), name=worker_name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} workers for {self.collection_name}.")
+
+    def stop(self, timeout: float = None):
+        """
+        Stops the worker threads after their current job. Jobs still running after the
+        timeout are queued again right away instead of waiting for JOB_LOCK_TIMEOUT.
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        running = [thread.name for thread in self._threads if thread.is_alive()]
+        self._threads = []
+        if running:
+            self._release(running)
+
+    def _release(self, worker_names: list[str]):
+        """
+        Queues the running jobs of the given workers again, without counting their attempt.
+        A worker that finishes later no longer holds the lock, so its result is ignored.
+        """
+        now = self._now()
+        try:
+            result = self._get_collection().update_many(
+                {"status": RUNNING, "locked_by": {"$in": worker_names}},
+                {
+                    "$set": {"status": QUEUED, "next_run_at": now, "updated_at": now, "locked_at": None},
+                    "$inc": {"attempts": -1},
+                },
+            )
+            if result.modified_count:
+                logger.info(f"Released {result.modified_count} unfinished jobs of {self.collection_name}.")
+        except Exception as e:
+            logger.warning(f"Could not release the jobs of {self.collection_name}: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        Returns the number of jobs per status along with this process' counters.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["workers"] = len(self._threads)
+        try:
+            counts = self._get_collection().aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+            stats["jobs"] = {entry["_id"]: entry["count"] for entry in counts}
+        except Exception as e:
+            logger.warning(f"Could not count the jobs of {self.collection_name}: {e}")
+        return stats
@@ -0,0 +1,235 @@
+"""
+This module contains a cache for the auxiliary LLM calls of the agent (meme topic, mood).
+
+Answers are keyed by the normalized input text. Optionally, a miss on the exact key falls
+back to an embedding-similarity lookup over the cached entries, so near-identical inputs
+(greetings, short replies) share an answer. The embeddings of the entries are kept in one
+preallocated matrix, so a lookup is a single matrix-vector product.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import re
+import logging
+import threading
+import numpy as np
+from cachetools import TTLCache
+
+from utils.consts import LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_SIMILARITY_THRESHOLD, LLM_CACHE_INITIAL_ROWS
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+"""Step 2: Define the helpers"""
+def normalize_text(text: str, max_tokens: int = None) -> str:
+    """
+    Normalizes a text for use as a cache key: lowercase, no punctuation, single spaces.
+    With max_tokens, only the first max_tokens words are kept.
+    """
+    words = re.sub(r"[^\w\s]", " ", (text or "").lower()).split()
+    return " ".join(words[:max_tokens] if max_tokens else words)
+
+
+def is_semantic_lookup_enabled() -> bool:
+    # Each similarity lookup costs one embedding call, so it is opt-in
+    return os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+
+
+"""Step 3: Define the LLMCallCache class"""
+class LLMCallCache:
+    """
+    A TTL + LRU cache of LLM answers keyed by normalized input, with an optional
+    embedding-similarity lookup and hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = LLM_CACHE_SIZE,
+        ttl: int = LLM_CACHE_TTL,
+        embeddings=None,
+        similarity_threshold: float = LLM_CACHE_SIMILARITY_THRESHOLD,
+    ):
+        self.name = name
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        # normalized key -> (answer, row of its embedding in _vectors or None)
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Unit-length embeddings by row; rows of evicted or expired entries are reused
+        self._vectors = None
+        self._row_keys = []
+        self._free_rows = []
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def _get_exact(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _is_live_row(self, row: int) -> bool:
+        # A row is stale once its entry was evicted, expired or stored again without it
+        entry = self._entries.get(self._row_keys[row])
+        return entry is not None and entry[1] == row
+
+    def _get_similar(self, vector: np.ndarray):
+        with self._lock:
+            if self._vectors is None or not self._row_keys:
+                return None
+            scores = self._vectors[:len(self._row_keys)] @ vector
+            rows = np.flatnonzero(scores >= self.similarity_threshold)
+            for row in rows[np.argsort(-scores[rows])]:
+                if self._is_live_row(row):
+                    return self._entries[self._row_keys[row]][0]
+        return None
+
+    def _get_free_row(self, vector: np.ndarray) -> int:
+        """
+        Returns a row for a new embedding, reusing stale rows before growing the matrix
+        (doubling it, up to one row per entry). Called with the lock held.
+        """
+        if self._vectors is None:
+            self._vectors = np.zeros((min(LLM_CACHE_INITIAL_ROWS, self._entries.maxsize), len(vector)), dtype=np.float32)
+        if not self._free_rows and len(self._row_keys) == len(self._vectors):
+            self._free_rows = [row for row in range(len(self._row_keys)) if not self._is_live_row(row)]
+        if self._free_rows:
+            return self._free_rows.pop()
+        if len(self._row_keys) == len(self._vectors):
+            grown = np.zeros((min(2 * len(self._vectors), self._entries.maxsize), self._vectors.shape[1]), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+        self._row_keys.append(None)
+        return len(self._row_keys) - 1
+
+    @staticmethod
+    def _to_unit_vector(embedding: list) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _use_embeddings(self) -> bool:
+        return self.embeddings is not None and is_semantic_lookup_enabled()
+
+    def _store(self, key: str, answer: str, vector):
+        with self._lock:
+            entry = self._entries.get(key)
+            row = entry[1] if entry is not None else None
+            if vector is None or (self._vectors is not None and len(vector) != self._vectors.shape[1]):
+                self._entries[key] = (answer, row)
+                return
+            # The entry is stored first, so an entry it evicts frees its row
+            self._entries[key] = (answer, None)
+            if row is None:
+                row = self._get_free_row(vector)
+            self._vectors[row] = vector
+            self._row_keys[row] = key
+            self._entries[key] = (answer, row)
+
+    def get_or_compute(self, text: str, compute):
+        """
+        Returns the cached answer for a text, or computes, caches and returns it.
+
+        Args:
+            text (str): The input the answer depends on.
+            compute (callable): Produces the answer on a miss.
+
+        Returns:
+            The cached or computed answer.
+        """
+        key = normalize_text(text)
+        answer = self._get_exact(key)
+        if answer is not None:
+            self._count("hits")
+            return answer
+
+        vector = None
+        if self._use_embeddings():
+            try:
+                vector = self._to_unit_vector(self.embeddings.embed_query(key))
+                answer = self._get_similar(vector)
+            except Exception as e:
+                logger.warning(f"Semantic lookup of the '{self.name}' cache failed: {e}")
+            if answer is not None:
+                self._count("semantic_hits")
+                self._store(key, answer, vector)
+                return answer
+
+        self._count("misses")
+        answer = compute()
+        if answer is not None:
+            self._store(key, answer, vector)
+        return answer
+
+    async def aget_or_compute(self, text: str, compute):
+        """
+        Async version of get_or_compute; compute is a coroutine function.
+        """
+        key = normalize_text(text)
+        answer = self._get_exact(key)
+        if answer is not None:
+            self._count("hits")
+            return answer
+
+        vector = None
+        if self._use_embeddings():
+            try:
+                vector = self._to_unit_vector(await self.embeddings.aembed_query(key))
+                answer = self._get_similar(vector)
+            except Exception as e:
+                logger.warning(f"Semantic lookup of the '{self.name}' cache failed: {e}")
+            if answer is not None:
+                self._count("semantic_hits")
+                self._store(key, answer, vector)
+                return answer
+
+        self._count("misses")
+        answer = await compute()
+        if answer is not None:
+            self._store(key, answer, vector)
+        return answer
+
+    def get_stats(self) -> dict:
+        """
+        Returns the size, hit/miss counts and hit rate of the cache.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+"""Step 4: Define the registry of caches"""
+def get_llm_cache(name: str, embeddings=None) -> LLMCallCache:
+    """
+    Returns the process-wide cache with the given name, creating it on first use.
+
+    Args:
+        name (str): The name of the auxiliary call, e.g. "meme_topic".
+        embeddings: Optional embeddings model used for the similarity lookup.
+
+    Returns:
+        LLMCallCache: The shared cache.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = LLMCallCache(name, embeddings=embeddings)
+        return cache
+
+
+def get_llm_cache_stats() -> dict:
+    """
+    Returns the stats of every auxiliary LLM cache, by name.
+    """
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.get_stats() for name, cache in caches.items()}
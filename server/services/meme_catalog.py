@@ -0,0 +1,327 @@
+"""
+This module contains the meme catalog of the agent responses.
+
+Several GIF URLs are kept per meme topic in a MongoDB collection shared by every process,
+and served in rotation from an in-memory tier that reloads each topic from MongoDB every
+few minutes. A scheduled job refreshes the topics in use in the background; it runs in
+every process, but one process per refresh interval does the work, a capped number of the
+least recently refreshed topics at a time. Only a topic seen for the first time costs a
+Giphy call on the response path.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import time
+import uuid
+import random
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from cachetools import LRUCache
+from pymongo.errors import DuplicateKeyError
+
+from services.azure_mongodb import MongoDBClient
+from utils.agents import search_memes, asearch_memes
+from utils.consts import (
+    MEME_CATALOG_COLLECTION,
+    MEME_CATALOG_LOCKS_COLLECTION,
+    MEME_CATALOG_SEED_TOPICS,
+    MEME_CATALOG_URLS_PER_TOPIC,
+    MEME_CATALOG_MAX_TOPICS,
+    MEME_CATALOG_TOPIC_TTL,
+    MEME_CATALOG_MAX_OFFSET,
+    MEME_CATALOG_LOCAL_TTL,
+    MEME_CATALOG_REFRESH_MAX_TOPICS,
+    MEME_CATALOG_REFRESH_LEASE,
+)
+
+logger = logging.getLogger(__name__)
+
+NO_MEMES_FOUND = "No memes found for the given topic."
+
+# Seed topics are stored with this refresh time until they are fetched, so the next refresh fetches them first
+_NEVER = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return getattr(getattr(error, "response", None), "status_code", None) == 429
+
+
+"""Step 2: Define the MemeCatalog class"""
+class MemeCatalog:
+    """
+    A catalog of meme URLs by topic, stored in MongoDB and refreshed by a scheduled job.
+
+    Args:
+        urls_per_topic (int): The number of GIF URLs kept and rotated per topic.
+        max_topics (int): The number of topics kept; the least recently used are dropped first.
+    """
+
+    def __init__(self, urls_per_topic: int = MEME_CATALOG_URLS_PER_TOPIC, max_topics: int = MEME_CATALOG_MAX_TOPICS):
+        self.urls_per_topic = urls_per_topic
+        self.max_topics = max_topics
+        # topic -> {"urls": [...], "next": rotation index, "loaded_at": monotonic seconds}
+        self._topics = LRUCache(maxsize=max_topics)
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "store_hits": 0, "live_fetches": 0, "refreshes": 0, "refresh_errors": 0,
+            "refresh_skipped": 0, "rate_limited": 0,
+        }
+        self._indexes_created = False
+
+    @staticmethod
+    def _normalize_topic(topic: str) -> str:
+        return " ".join((topic or "funny").lower().split())
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _get_db(self):
+        return MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+    def _get_collection(self):
+        collection = self._get_db()[MEME_CATALOG_COLLECTION]
+        if not self._indexes_created:
+            collection.create_index("refreshed_at")
+            collection.create_index("last_used")
+            self._indexes_created = True
+        return collection
+
+    def _get_async_collection(self):
+        return MongoDBClient.get_async_client()[MongoDBClient.get_db_name()][MEME_CATALOG_COLLECTION]
+
+    def _count(self, outcome: str, amount: int = 1):
+        with self._lock:
+            self._stats[outcome] += amount
+
+    def _remember(self, topic: str, urls: list[str]):
+        with self._lock:
+            self._topics[topic] = {"urls": urls, "next": 0, "loaded_at": time.monotonic()}
+
+    def _next_url(self, topic: str):
+        """
+        Returns the next URL of a topic loaded within MEME_CATALOG_LOCAL_TTL in rotation,
+        NO_MEMES_FOUND if it has none, or None if it has to be loaded.
+        """
+        with self._lock:
+            entry = self._topics.get(topic)
+            if entry is None or time.monotonic() - entry["loaded_at"] > MEME_CATALOG_LOCAL_TTL:
+                return None
+            self._stats["hits"] += 1
+            if not entry["urls"]:
+                return NO_MEMES_FOUND
+            url = entry["urls"][entry["next"] % len(entry["urls"])]
+            entry["next"] += 1
+            return url
+
+    def _get_fetched_update(self, urls: list[str]) -> dict:
+        now = self._now()
+        return {"$set": {"urls": urls, "refreshed_at": now, "last_used": now}}
+
+    def _load(self, topic: str) -> bool:
+        """
+        Loads a fetched topic from the shared catalog into memory, marking it as used. Returns whether it was found.
+        """
+        try:
+            document = self._get_collection().find_one_and_update(
+                {"_id": topic, "refreshed_at": {"$gt": _NEVER}}, {"$set": {"last_used": self._now()}}
+            )
+        except Exception as e:
+            logger.warning(f"Could not read the meme catalog: {e}")
+            return False
+        if document is None:
+            return False
+        self._remember(topic, document.get("urls") or [])
+        self._count("store_hits")
+        return True
+
+    async def _aload(self, topic: str) -> bool:
+        """
+        Async version of _load.
+        """
+        try:
+            document = await self._get_async_collection().find_one_and_update(
+                {"_id": topic, "refreshed_at": {"$gt": _NEVER}}, {"$set": {"last_used": self._now()}}
+            )
+        except Exception as e:
+            logger.warning(f"Could not read the meme catalog: {e}")
+            return False
+        if document is None:
+            return False
+        self._remember(topic, document.get("urls") or [])
+        self._count("store_hits")
+        return True
+
+    def _store(self, topic: str, urls: list[str]):
+        self._remember(topic, urls)
+        try:
+            self._get_collection().update_one({"_id": topic}, self._get_fetched_update(urls), upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not write the meme catalog: {e}")
+
+    async def _astore(self, topic: str, urls: list[str]):
+        self._remember(topic, urls)
+        try:
+            await self._get_async_collection().update_one(
+                {"_id": topic}, self._get_fetched_update(urls), upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not write the meme catalog: {e}")
+
+    def get_meme_url(self, topic: str) -> str:
+        """
+        Returns a meme URL for a topic, fetching the topic from Giphy only if it is not in the catalog yet.
+
+        Args:
+            topic (str): The meme topic.
+
+        Returns:
+            str: The URL of a meme GIF, or a message if none is available.
+        """
+        if not os.getenv("GIPHY_API_KEY"):
+            return "Giphy API key is not configured."
+        topic = self._normalize_topic(topic)
+        url = self._next_url(topic)
+        if url is not None:
+            return url
+        if self._load(topic):
+            return self._next_url(topic)
+
+        self._count("live_fetches")
+        try:
+            self._store(topic, search_memes(topic, limit=self.urls_per_topic))
+        except Exception as e:
+            logger.error(f"Error fetching memes for '{topic}': {e}")
+            return "Failed to fetch meme."
+        return self._next_url(topic)
+
+    async def aget_meme_url(self, topic: str) -> str:
+        """
+        Async version of get_meme_url.
+        """
+        if not os.getenv("GIPHY_API_KEY"):
+            return "Giphy API key is not configured."
+        topic = self._normalize_topic(topic)
+        url = self._next_url(topic)
+        if url is not None:
+            return url
+        if await self._aload(topic):
+            return self._next_url(topic)
+
+        self._count("live_fetches")
+        try:
+            await self._astore(topic, await asearch_memes(topic, limit=self.urls_per_topic))
+        except Exception as e:
+            logger.error(f"Error fetching memes for '{topic}': {e}")
+            return "Failed to fetch meme."
+        return self._next_url(topic)
+
+    def _acquire_refresh_lease(self) -> bool:
+        """
+        Takes the refresh lease for MEME_CATALOG_REFRESH_LEASE seconds. The lease is not
+        released, so the jobs of the other processes in the same interval skip their refresh.
+        """
+        now = self._now()
+        try:
+            # An unexpired lease does not match, so the upsert hits the duplicate _id
+            self._get_db()[MEME_CATALOG_LOCKS_COLLECTION].find_one_and_update(
+                {"_id": "refresh", "expires_at": {"$lte": now}},
+                {"$set": {
+                    "owner": uuid.uuid4().hex,
+                    "pid": os.getpid(),
+                    "locked_at": now,
+                    "expires_at": now + timedelta(seconds=MEME_CATALOG_REFRESH_LEASE),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def _prune(self) -> int:
+        """
+        Drops the topics unused within MEME_CATALOG_TOPIC_TTL and the least recently used
+        beyond max_topics, and adds the seed topics that are missing. Returns the number dropped.
+        """
+        collection = self._get_collection()
+        now = self._now()
+        dropped = collection.delete_many({
+            "_id": {"$nin": MEME_CATALOG_SEED_TOPICS},
+            "last_used": {"$lt": now - timedelta(seconds=MEME_CATALOG_TOPIC_TTL)},
+        }).deleted_count
+
+        for topic in MEME_CATALOG_SEED_TOPICS:
+            collection.update_one(
+                {"_id": topic},
+                {"$setOnInsert": {"urls": [], "refreshed_at": _NEVER, "last_used": now}},
+                upsert=True,
+            )
+
+        # Counted after the seeds are added, so they cannot push the catalog past max_topics
+        excess = collection.count_documents({}) - self.max_topics
+        if excess > 0:
+            cursor = collection.find({"_id": {"$nin": MEME_CATALOG_SEED_TOPICS}}, {"_id": 1}).sort("last_used", 1).limit(excess)
+            dropped += collection.delete_many({"_id": {"$in": [document["_id"] for document in cursor]}}).deleted_count
+        return dropped
+
+    def refresh(self):
+        """
+        Fetches a new page of GIFs for the MEME_CATALOG_REFRESH_MAX_TOPICS least recently
+        refreshed topics, after dropping the unused ones. Run by the scheduler in every
+        process; only the process holding the refresh lease does the work. Stops early
+        when Giphy answers 429.
+        """
+        if not os.getenv("GIPHY_API_KEY"):
+            return
+        try:
+            if not self._acquire_refresh_lease():
+                self._count("refresh_skipped")
+                return
+            dropped = self._prune()
+            cursor = self._get_collection().find({}, {"_id": 1}).sort("refreshed_at", 1).limit(MEME_CATALOG_REFRESH_MAX_TOPICS)
+            topics = [document["_id"] for document in cursor]
+        except Exception as e:
+            logger.warning(f"Could not prepare the meme catalog refresh: {e}")
+            return
+
+        refreshed = 0
+        for topic in topics:
+            try:
+                urls = search_memes(topic, limit=self.urls_per_topic, offset=random.randint(0, MEME_CATALOG_MAX_OFFSET))
+                if not urls:
+                    # Past the last page of a rare topic; start over from its first results
+                    urls = search_memes(topic, limit=self.urls_per_topic)
+            except Exception as e:
+                if _is_rate_limited(e):
+                    self._count("rate_limited")
+                    logger.warning(f"Giphy rate limit reached; stopped the meme refresh after {refreshed} topics.")
+                    break
+                self._count("refresh_errors")
+                logger.warning(f"Could not refresh the memes of '{topic}': {e}")
+                continue
+            self._remember(topic, urls)
+            try:
+                self._get_collection().update_one(
+                    {"_id": topic}, {"$set": {"urls": urls, "refreshed_at": self._now()}}
+                )
+            except Exception as e:
+                logger.warning(f"Could not write the meme catalog: {e}")
+            refreshed += 1
+        self._count("refreshes", refreshed)
+        logger.info(f"Refreshed {refreshed} meme topics; dropped {dropped} unused ones.")
+
+    def get_stats(self) -> dict:
+        """
+        Returns the number of topics and URLs in memory along with the counters of this process.
+        """
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "urls": sum(len(entry["urls"]) for entry in self._topics.values()),
+                **self._stats,
+            }
+
+
+"""Step 3: Define the shared catalog"""
+meme_catalog = MemeCatalog()
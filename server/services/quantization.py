@@ -0,0 +1,102 @@
+"""
+This module contains the quantization of embedding vectors.
+
+Unit-length vectors are held in memory as float16 (2 bytes per dimension) or as int8 with one
+scale per vector (1 byte per dimension) instead of float32 (4 bytes). Quantized scores only
+pick candidates; the final ranking is computed on full-precision vectors.
+
+In MongoDB a quantized document keeps its codes next to a packed float32 copy, the only
+full-precision source the indexes rescore from. That is 5 (int8) or 6 (float16) bytes per
+dimension: larger than a packed float32 vector, though smaller than the BSON double array of
+the "none" layout (8 bytes plus a key per element). See benchmarks/retrieval.py for the bytes
+per document of each mode.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+from typing import Optional
+import numpy as np
+from bson.binary import Binary
+
+from utils.consts import VECTOR_QUANTIZATION
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+
+
+"""Step 2: Define the quantization helpers"""
+def get_quantization_mode() -> str:
+    """
+    Returns the configured quantization mode, falling back to "none" on unknown values.
+    """
+    mode = os.getenv("VECTOR_QUANTIZATION", VECTOR_QUANTIZATION).lower()
+    return mode if mode in QUANTIZATION_MODES else "none"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def quantize(matrix: np.ndarray, mode: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Quantizes the rows of a float32 matrix.
+
+    Args:
+        matrix (np.ndarray): Vectors of shape (n, dim).
+        mode (str): "float16" or "int8".
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The codes of shape (n, dim) and one float32 scale per row;
+        a row is approximated by codes * scale.
+    """
+    if mode == "float16":
+        return matrix.astype(np.float16), np.ones(len(matrix), dtype=np.float32)
+    if mode == "int8":
+        # Symmetric per-row scale, so the largest component of each vector maps to +-127
+        scales = np.abs(matrix).max(axis=1) / 127
+        scales = np.where(scales == 0, 1, scales).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization mode '{mode}'.")
+
+
+def encode_vector(vector: list[float], mode: str) -> dict:
+    """
+    Returns the vector store fields of an embedding.
+
+    With mode "none" the vector is stored as-is in `vectorContent`, the layout Cosmos DB
+    vector search expects. Otherwise the unit-length vector is stored as packed quantized
+    codes with their scale, next to a packed float32 copy used only for rescoring, so the
+    stored vector is larger than a packed float32 one.
+    """
+    if mode == "none":
+        return {"vectorContent": vector}
+    full = normalize_rows(np.asarray([vector], dtype=np.float32))
+    codes, scales = quantize(full, mode)
+    return {
+        "vectorQuantized": Binary(codes[0].tobytes()),
+        "vectorScale": float(scales[0]),
+        "vectorMode": mode,
+        "vectorFull": Binary(full[0].tobytes()),
+    }
+
+
+def decode_vector(document: dict, embedding_key: str = "vectorContent") -> Optional[np.ndarray]:
+    """
+    Returns the full-precision vector of a vector store document in either layout, or None.
+    """
+    if document.get("vectorFull") is not None:
+        return np.frombuffer(document["vectorFull"], dtype=np.float32)
+    if document.get(embedding_key):
+        return np.asarray(document[embedding_key], dtype=np.float32)
+    return None
+
+
+def decode_codes(document: dict, mode: str) -> Optional[tuple[np.ndarray, float]]:
+    """
+    Returns the stored quantized codes and scale of a document if they were stored in the given mode.
+    """
+    if document.get("vectorMode") != mode or document.get("vectorQuantized") is None:
+        return None
+    dtype = np.int8 if mode == "int8" else np.float16
+    return np.frombuffer(document["vectorQuantized"], dtype=dtype), document.get("vectorScale", 1.0)
@@ -0,0 +1,348 @@
+"""
+This module contains the RetrieverRegistry class, a process-wide registry of vector store retrievers.
+
+Each `<collection>_vector_store` is resolved once per process. Stores are synced with their
+source collection at startup (warm_up) or through the `flask build-vector-stores` command,
+never inside a user request.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+from langchain_community.vectorstores.azure_cosmos_db import (
+    AzureCosmosDBVectorSearch,
+    CosmosDBSimilarityType,
+    CosmosDBVectorSearchType,
+)
+
+from services.azure_mongodb import MongoDBClient
+from services.embedding_cache import get_cached_embeddings
+from services.vector_index import InMemoryVectorIndex, InMemoryRetriever
+from services.ingestion import IngestionPipeline
+from services.quantization import get_quantization_mode
+from utils.consts import (
+    VECTOR_SEARCH_BACKEND,
+    IN_MEMORY_INDEX_MAX_DOCS,
+    VECTOR_STORE_SOURCES,
+    INGESTION_READ_BATCH_SIZE,
+    VECTOR_STORE_LOCKS_COLLECTION,
+    VECTOR_STORE_SYNC_LOCK_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+"""Step 2: Define the RetrieverRegistry class"""
+class RetrieverRegistry:
+    """
+    A per-process registry of retrievers keyed by source collection and top_k.
+    """
+    _retrievers: dict[tuple, object] = {}
+    _lock = threading.Lock()
+    _stats = {"hits": 0, "resolved": 0, "synced": 0, "sync_skipped": 0, "missing": 0}
+
+    @staticmethod
+    def get_vector_store_name(collection_name: str) -> str:
+        return f"{collection_name}_vector_store"
+
+    @staticmethod
+    def _get_db():
+        return MongoDBClient.get_client()[MongoDBClient.get_db_name()]
+
+    @staticmethod
+    def _get_backend() -> str:
+        return os.getenv("VECTOR_SEARCH_BACKEND", VECTOR_SEARCH_BACKEND).lower()
+
+    @classmethod
+    def _get_storage_mode(cls) -> str:
+        """
+        How new vectors are stored. Cosmos DB vector search needs float arrays, so vectors
+        are only stored quantized when the in-memory backend is forced.
+        """
+        return get_quantization_mode() if cls._get_backend() == "memory" else "none"
+
+    @classmethod
+    def _use_in_memory_index(cls, vector_store_collection) -> bool:
+        """
+        Whether a vector store collection is searched in memory instead of in Cosmos DB.
+        """
+        backend = cls._get_backend()
+        if vector_store_collection.find_one({"vectorQuantized": {"$exists": True}}, {"_id": 1}):
+            return True  # Quantized vectors cannot be searched by Cosmos DB
+        if backend == "auto":
+            return vector_store_collection.count_documents({}) <= IN_MEMORY_INDEX_MAX_DOCS
+        return backend == "memory"
+
+    @classmethod
+    def _create_retriever(cls, collection_name: str, top_k: int):
+        """
+        Returns a retriever over an existing vector store.
+        """
+        db_name = MongoDBClient.get_db_name()
+        vector_store_name = cls.get_vector_store_name(collection_name)
+        vector_store_collection = cls._get_db()[vector_store_name]
+        embeddings_model = get_cached_embeddings()
+
+        if cls._use_in_memory_index(vector_store_collection):
+            index = InMemoryVectorIndex(vector_store_collection)
+            index.load()
+            logger.info(f"Searching '{vector_store_name}' in memory ({len(index)} vectors).")
+            return InMemoryRetriever(index=index, embeddings=embeddings_model, k=top_k)
+
+        vector_store = AzureCosmosDBVectorSearch.from_connection_string(
+            connection_string=MongoDBClient.get_mongodb_variables(),
+            namespace=f"{db_name}.{vector_store_name}",
+            embedding=embeddings_model,
+            index_name="VectorSearchIndex",
+            embedding_key="vectorContent",
+            text_key="textContent",
+        )
+        return vector_store.as_retriever(search_kwargs={"k": top_k})
+
+    @classmethod
+    def _get_content_hash(cls, text: str, metadata: dict) -> str:
+        content = {"text": text, "metadata": metadata}
+        storage_mode = cls._get_storage_mode()
+        if storage_mode != "none":
+            # A change of storage layout re-embeds (from the embedding cache) every document
+            content["storage"] = storage_mode
+        content = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _get_source(collection_name: str) -> dict:
+        return VECTOR_STORE_SOURCES.get(collection_name, {"text_key": "text", "metadata_keys": []})
+
+    @classmethod
+    def _to_source_document(cls, doc: dict, source: dict):
+        """
+        Returns the (source_id, text, metadata, content_hash) of a source document, or None if it has no text.
+        """
+        text = doc.get(source["text_key"]) or ""
+        if not text.strip():
+            return None
+        metadata = {key: doc.get(key, "") for key in source["metadata_keys"]}
+        return doc["_id"], text, metadata, cls._get_content_hash(text, metadata)
+
+    @classmethod
+    def _load_source_hashes(cls, collection_name: str) -> dict:
+        """
+        Reads a source collection and returns source _id -> content hash. Texts are not kept.
+        """
+        source = cls._get_source(collection_name)
+        projection = {source["text_key"]: 1, **{key: 1 for key in source["metadata_keys"]}}
+
+        hashes = {}
+        cursor = cls._get_db()[collection_name].find({}, projection, batch_size=INGESTION_READ_BATCH_SIZE)
+        for doc in cursor:
+            document = cls._to_source_document(doc, source)
+            if document is not None:
+                hashes[document[0]] = document[3]
+        logger.info(f"Hashed {len(hashes)} documents with content from collection '{collection_name}'.")
+        return hashes
+
+    @classmethod
+    def _iter_source_documents(cls, collection_name: str, source_ids: list):
+        """
+        Streams the given source documents from MongoDB, INGESTION_READ_BATCH_SIZE at a time.
+        """
+        source = cls._get_source(collection_name)
+        projection = {source["text_key"]: 1, **{key: 1 for key in source["metadata_keys"]}}
+        collection = cls._get_db()[collection_name]
+        for start in range(0, len(source_ids), INGESTION_READ_BATCH_SIZE):
+            batch_ids = source_ids[start:start + INGESTION_READ_BATCH_SIZE]
+            for doc in collection.find({"_id": {"$in": batch_ids}}, projection):
+                document = cls._to_source_document(doc, source)
+                if document is not None:
+                    yield document
+
+    @classmethod
+    def _create_vector_index(cls, vector_store_collection):
+        vector_store = AzureCosmosDBVectorSearch(
+            collection=vector_store_collection,
+            embedding=get_cached_embeddings(),
+            index_name="vectorSearchIndex",
+        )
+        try:
+            vector_store.create_index(
+                1, 1536, CosmosDBSimilarityType.COS, CosmosDBVectorSearchType.VECTOR_IVF, 16, 64
+            )
+            logger.info("Vector store index created successfully.")
+        except Exception as e:
+            # Only the Cosmos DB backend needs the index; the in-memory one works without it
+            logger.warning(f"Could not create the vector index of '{vector_store_collection.name}': {e}")
+
+    @classmethod
+    def _acquire_sync_lock(cls, vector_store_name: str):
+        """
+        Takes the cross-process lock of a vector store. Returns its owner token, or None
+        if another process holds it. A lock older than VECTOR_STORE_SYNC_LOCK_TIMEOUT
+        (its process died) is taken over.
+        """
+        now = datetime.now(timezone.utc)
+        owner = uuid.uuid4().hex
+        try:
+            # An unexpired lock does not match, so the upsert hits the duplicate _id
+            cls._get_db()[VECTOR_STORE_LOCKS_COLLECTION].find_one_and_update(
+                {"_id": vector_store_name, "expires_at": {"$lte": now}},
+                {"$set": {
+                    "owner": owner,
+                    "pid": os.getpid(),
+                    "locked_at": now,
+                    "expires_at": now + timedelta(seconds=VECTOR_STORE_SYNC_LOCK_TIMEOUT),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return None
+        return owner
+
+    @classmethod
+    def _release_sync_lock(cls, vector_store_name: str, owner: str):
+        cls._get_db()[VECTOR_STORE_LOCKS_COLLECTION].delete_one({"_id": vector_store_name, "owner": owner})
+
+    @classmethod
+    def sync_vector_store(cls, collection_name: str, rebuild: bool = False) -> dict:
+        """
+        Brings a vector store in line with its source collection. Only new or changed
+        documents are embedded, and vectors of changed or deleted documents are removed,
+        so the cost follows the size of the change rather than the size of the collection.
+        One process syncs a store at a time; the others skip it.
+
+        Args:
+            collection_name (str): The source collection, e.g. "agent_facts".
+            rebuild (bool): Whether to drop every vector and embed the whole collection.
+
+        Returns:
+            dict: The number of embedded (new or changed) and unchanged documents and of deleted
+            vectors, with the throughput report of the ingestion pipeline; or {"skipped": reason}.
+        """
+        vector_store_name = cls.get_vector_store_name(collection_name)
+        owner = cls._acquire_sync_lock(vector_store_name)
+        if owner is None:
+            logger.info(f"Vector store '{vector_store_name}' is being synced by another process; skipped.")
+            with cls._lock:
+                cls._stats["sync_skipped"] += 1
+            return {"skipped": "another process is syncing this vector store"}
+        try:
+            return cls._sync_vector_store(collection_name, rebuild)
+        finally:
+            cls._release_sync_lock(vector_store_name, owner)
+
+    @classmethod
+    def _sync_vector_store(cls, collection_name: str, rebuild: bool) -> dict:
+        """
+        Runs the sync of sync_vector_store; callers must hold the lock of the vector store.
+        """
+        vector_store_name = cls.get_vector_store_name(collection_name)
+        vector_store_collection = cls._get_db()[vector_store_name]
+        if rebuild:
+            vector_store_collection.delete_many({})
+        was_empty = vector_store_collection.find_one({}, {"_id": 1}) is None
+
+        # Vectors without a source or hash predate the incremental sync; their documents are embedded again
+        legacy = vector_store_collection.delete_many(
+            {"$or": [{"source_id": {"$exists": False}}, {"content_hash": {"$exists": False}}]}
+        ).deleted_count
+
+        source_hashes = cls._load_source_hashes(collection_name)
+
+        # source _id -> content hash of the stored vectors
+        indexed = {}
+        for vector in vector_store_collection.find({}, {"source_id": 1, "content_hash": 1}):
+            indexed[vector["source_id"]] = vector["content_hash"]
+
+        stale = [
+            source_id for source_id, content_hash in indexed.items()
+            if source_hashes.get(source_id) != content_hash
+        ]
+        changed = [
+            source_id for source_id, content_hash in source_hashes.items()
+            if indexed.get(source_id) != content_hash
+        ]
+
+        deleted = vector_store_collection.delete_many({"source_id": {"$in": stale}}).deleted_count if stale else 0
+        ingestion = {}
+        if changed:
+            pipeline = IngestionPipeline(
+                vector_store_collection, get_cached_embeddings(), quantization=cls._get_storage_mode()
+            )
+            try:
+                ingestion = pipeline.run(cls._iter_source_documents(collection_name, changed))
+            except Exception:
+                # Drop partially embedded documents so the next sync embeds them again
+                vector_store_collection.delete_many({"source_id": {"$in": changed}})
+                raise
+
+        if was_empty and ingestion.get("chunks") and cls._get_storage_mode() == "none":
+            cls._create_vector_index(vector_store_collection)
+
+        stats = {
+            "embedded_documents": len(changed),
+            "deleted_vectors": deleted + legacy,
+            "unchanged": len(source_hashes) - len(changed),
+            "ingestion": ingestion,
+        }
+        logger.info(f"Synced vector store '{vector_store_name}': {stats}")
+        with cls._lock:
+            cls._stats["synced"] += 1
+        return stats
+
+    @classmethod
+    def get_retriever(cls, collection_name: str, top_k: int = 3):
+        """
+        Returns the retriever of a collection, resolving it on first use.
+        Returns None if the vector store has not been built yet; syncing is left to
+        warm_up and the build command so that no request pays for it.
+        """
+        key = (collection_name, top_k)
+        with cls._lock:
+            retriever = cls._retrievers.get(key)
+            if retriever is not None:
+                cls._stats["hits"] += 1
+                return retriever
+
+            vector_store_name = cls.get_vector_store_name(collection_name)
+            if not cls._get_db()[vector_store_name].find_one({}, {"_id": 1}):
+                cls._stats["missing"] += 1
+                logger.error(f"Vector store '{vector_store_name}' has not been built; run `flask build-vector-stores`.")
+                return None
+
+            retriever = cls._retrievers[key] = cls._create_retriever(collection_name, top_k)
+            cls._stats["resolved"] += 1
+            return retriever
+
+    @classmethod
+    def warm_up(cls, collection_names: list[str], sync: bool = True):
+        """
+        Syncs the vector stores with their source collections and resolves their
+        retrievers ahead of the first request.
+        """
+        for collection_name in collection_names:
+            try:
+                if sync:
+                    cls.sync_vector_store(collection_name)
+                cls.get_retriever(collection_name)
+                logger.info(f"Warmed retriever for '{collection_name}'.")
+            except Exception as e:
+                logger.error(f"Failed to warm retriever for '{collection_name}': {e}", exc_info=True)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """
+        Returns the number of registered retrievers along with the registry counters
+        and the size of each in-memory index.
+        """
+        with cls._lock:
+            indexes = {
+                f"{collection_name}@{top_k}": retriever.index.get_stats()
+                for (collection_name, top_k), retriever in cls._retrievers.items()
+                if isinstance(retriever, InMemoryRetriever)
+            }
+            return {"size": len(cls._retrievers), **cls._stats, "indexes": indexes}
@@ -0,0 +1,174 @@
+"""
+This module contains the micro-batched sentiment analysis of the agent tools.
+
+Concurrent requests, across users, are gathered for a few milliseconds and sent to Azure
+Text Analytics as one batched call, and each result is fanned back out to its caller.
+Sentiments are cached by text hash, and identical texts in flight share one document.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import time
+import queue
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from cachetools import TTLCache
+from azure.core.credentials import AzureKeyCredential
+from azure.ai.textanalytics import TextAnalyticsClient
+
+from utils.consts import (
+    SENTIMENT_BATCH_MAX_SIZE,
+    SENTIMENT_BATCH_MAX_WAIT,
+    SENTIMENT_MAX_CONCURRENT_BATCHES,
+    SENTIMENT_CACHE_SIZE,
+    SENTIMENT_CACHE_TTL,
+    SENTIMENT_REQUEST_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Initialize Azure Text Analytics Client
+text_analytics_key = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
+text_analytics_endpoint = os.getenv("AZURE_TEXT_ANALYTICS_ENDPOINT")
+text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint, credential=AzureKeyCredential(text_analytics_key))
+
+
+"""Step 2: Define the SentimentBatcher class"""
+class SentimentBatcher:
+    """
+    Gathers sentiment requests into batched Text Analytics calls, with a TTL cache by text hash.
+
+    Args:
+        client (TextAnalyticsClient): The Text Analytics client.
+        max_batch_size (int): Documents per call.
+        max_wait (float): Seconds a batch waits for more requests after its first one.
+        max_concurrent_batches (int): Calls in flight.
+    """
+
+    def __init__(
+        self,
+        client: TextAnalyticsClient,
+        max_batch_size: int = SENTIMENT_BATCH_MAX_SIZE,
+        max_wait: float = SENTIMENT_BATCH_MAX_WAIT,
+        max_concurrent_batches: int = SENTIMENT_MAX_CONCURRENT_BATCHES,
+    ):
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._batch_pool = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="sentiment")
+        self._cache = TTLCache(maxsize=SENTIMENT_CACHE_SIZE, ttl=SENTIMENT_CACHE_TTL)
+        # text hash -> Future of a request that is queued or in flight
+        self._pending = {}
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "documents": 0, "errors": 0}
+
+    @staticmethod
+    def _get_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _ensure_worker(self):
+        # Called with the lock held
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="sentiment-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Returns a Future of the sentiment ("positive", "neutral", "negative" or "mixed") of a text.
+        """
+        key = self._get_key(text)
+        with self._lock:
+            self._stats["requests"] += 1
+            sentiment = self._cache.get(key)
+            if sentiment is not None:
+                self._stats["cache_hits"] += 1
+                future = Future()
+                future.set_result(sentiment)
+                return future
+            future = self._pending.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+            future = self._pending[key] = Future()
+            self._ensure_worker()
+        self._queue.put((key, text))
+        return future
+
+    def analyze(self, text: str) -> str:
+        """
+        Returns the sentiment of a text, waiting at most SENTIMENT_REQUEST_TIMEOUT seconds.
+        """
+        return self.submit(text).result(timeout=SENTIMENT_REQUEST_TIMEOUT)
+
+    async def aanalyze(self, text: str) -> str:
+        """
+        Async version of analyze.
+        """
+        return await asyncio.wait_for(asyncio.wrap_future(self.submit(text)), timeout=SENTIMENT_REQUEST_TIMEOUT)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._batch_pool.submit(self._analyze_batch, batch)
+
+    def _resolve(self, key: str, sentiment: str = None, error: Exception = None):
+        with self._lock:
+            future = self._pending.pop(key, None)
+            if error is None:
+                self._cache[key] = sentiment
+            else:
+                self._stats["errors"] += 1
+        if future is None:
+            return
+        if error is None:
+            future.set_result(sentiment)
+        else:
+            future.set_exception(error)
+
+    def _analyze_batch(self, batch: list[tuple[str, str]]):
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["documents"] += len(batch)
+        try:
+            documents = [{"id": str(index), "text": text} for index, (_, text) in enumerate(batch)]
+            results = self.client.analyze_sentiment(documents=documents)
+        except Exception as e:
+            logger.error(f"Sentiment batch of {len(batch)} documents failed: {e}")
+            for key, _ in batch:
+                self._resolve(key, error=e)
+            return
+
+        for (key, _), result in zip(batch, results):
+            if result.is_error:
+                self._resolve(key, error=RuntimeError(f"Sentiment analysis failed: {result.error.message}"))
+            else:
+                self._resolve(key, sentiment=result.sentiment)
+
+    def get_stats(self) -> dict:
+        """
+        Returns the request, cache hit, batch and document counts, the average batch size
+        and the number of requests waiting for a batch.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["avg_batch_size"] = round(stats["documents"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+
+"""Step 3: Define the shared service"""
+sentiment_service = SentimentBatcher(text_analytics_client)
@@ -0,0 +1,225 @@
+"""
+This module contains a response cache for the external lookup tools of the agents.
+
+Results are keyed by tool name and normalized arguments. A fresh result is served from
+memory; once its TTL has passed it is still served for a stale window while one background
+refresh fetches a new result, so a slow upstream API only delays the refresh.
+"""
+
+"""Step 1: Import necessary modules"""
+import json
+import time
+import inspect
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
+
+from utils.consts import TOOL_CACHE_TTLS, TOOL_CACHE_SIZE, TOOL_CACHE_REFRESH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_caches_lock = threading.Lock()
+_refresh_pool = ThreadPoolExecutor(max_workers=TOOL_CACHE_REFRESH_WORKERS, thread_name_prefix="tool-cache-refresh")
+
+# Tools report failures as text; such results must not be cached
+FAILURE_PREFIXES = ("Sorry", "Failed", "Job search API credentials")
+
+
+class PartialResult(str):
+    """
+    A tool result built while some of its lookups failed: it is returned to the agent,
+    but not cached, so the next call retries the failed lookups.
+    """
+
+
+"""Step 2: Define the helpers"""
+def normalize_arguments(arguments: dict) -> str:
+    """
+    Returns a cache key for tool arguments: strings are lowercased and whitespace-collapsed.
+    """
+    normalized = {
+        name: " ".join(value.lower().split()) if isinstance(value, str) else value
+        for name, value in arguments.items()
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+def is_cacheable(result) -> bool:
+    if result is None or isinstance(result, PartialResult):
+        return False
+    if isinstance(result, tuple):
+        # (content, artifact) tools return an empty artifact on failure
+        return bool(result[-1])
+    if isinstance(result, str):
+        return not result.startswith(FAILURE_PREFIXES)
+    return True
+
+
+"""Step 3: Define the ToolCache class"""
+class ToolCache:
+    """
+    An LRU cache of tool results with a TTL and a stale-while-revalidate window.
+
+    Args:
+        name (str): The tool name.
+        ttl (float): Seconds a result is served as fresh.
+        stale_ttl (float): Further seconds a result is served while it is refreshed in the background.
+        maxsize (int): The number of results kept.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, maxsize: int = TOOL_CACHE_SIZE):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # key -> (result, stored_at)
+        self._entries = LRUCache(maxsize=maxsize)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def _store(self, key: str, result):
+        if is_cacheable(result):
+            with self._lock:
+                self._entries[key] = (result, time.monotonic())
+
+    def _lookup(self, key: str):
+        """
+        Returns (result, is_stale) of a servable entry, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[1]
+            if age < self.ttl:
+                return entry[0], False
+            if age < self.ttl + self.stale_ttl:
+                return entry[0], True
+            del self._entries[key]
+            return None
+
+    def _refresh(self, key: str, compute):
+        try:
+            self._store(key, compute())
+            self._count("refreshes")
+        except Exception as e:
+            self._count("refresh_errors")
+            logger.warning(f"Background refresh of the '{self.name}' tool cache failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key: str, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        _refresh_pool.submit(self._refresh, key, compute)
+
+    def _get_cached(self, key: str, compute):
+        found = self._lookup(key)
+        if found is None:
+            self._count("misses")
+            return None
+        result, is_stale = found
+        if is_stale:
+            self._count("stale_hits")
+            self._schedule_refresh(key, compute)
+        else:
+            self._count("hits")
+        return found
+
+    def get_or_compute(self, arguments: dict, compute):
+        """
+        Returns the cached result for the arguments, or computes, caches and returns it.
+
+        Args:
+            arguments (dict): The tool arguments the result depends on.
+            compute (callable): Produces the result on a miss or a refresh.
+
+        Returns:
+            The cached or computed result.
+        """
+        key = normalize_arguments(arguments)
+        found = self._get_cached(key, compute)
+        if found is not None:
+            return found[0]
+        result = compute()
+        self._store(key, result)
+        return result
+
+    async def aget_or_compute(self, arguments: dict, acompute, compute):
+        """
+        Async version of get_or_compute; acompute is a coroutine function used on a miss,
+        and compute its sync counterpart used by the background refresh.
+        """
+        key = normalize_arguments(arguments)
+        found = self._get_cached(key, compute)
+        if found is not None:
+            return found[0]
+        result = await acompute()
+        self._store(key, result)
+        return result
+
+    def get_stats(self) -> dict:
+        """
+        Returns the size, hit/miss and refresh counts and hit rate of the cache.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+"""Step 4: Define the registry of caches and the decorator"""
+def get_tool_cache(name: str) -> ToolCache:
+    """
+    Returns the process-wide cache of a tool, configured from TOOL_CACHE_TTLS.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            ttl, stale_ttl = TOOL_CACHE_TTLS.get(name, (0, 0))
+            cache = _caches[name] = ToolCache(name, ttl=ttl, stale_ttl=stale_ttl)
+        return cache
+
+
+def cached_tool(name: str):
+    """
+    Decorates a tool function so its results are cached by normalized arguments.
+
+    Args:
+        name (str): The tool name in the toolbox, which selects its TTLs in TOOL_CACHE_TTLS.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return get_tool_cache(name).get_or_compute(
+                dict(bound.arguments), lambda: func(*args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def get_tool_cache_stats() -> dict:
+    """
+    Returns the stats of every tool cache, by tool name.
+    """
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.get_stats() for name, cache in caches.items()}
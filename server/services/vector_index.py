@@ -0,0 +1,316 @@
+"""
+This module contains an in-process vector index for small vector store collections.
+
+The stored vectors are loaded once into a contiguous NumPy matrix, so a search costs one
+query embedding plus a matrix-vector product instead of a vector search round trip.
+The index reloads itself when the collection changes.
+
+With quantization, only float16 or int8 codes are held in memory. They preselect
+k * rescore_factor candidates, which are then ranked on full-precision vectors read from a
+memory-mapped file on local disk. The file is written block by block and unlinked once
+mapped, so it disappears with the process.
+"""
+
+"""Step 1: Import necessary modules"""
+import os
+import logging
+import tempfile
+import threading
+import time
+import weakref
+import numpy as np
+from pydantic import ConfigDict
+from pymongo.collection import Collection
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from services.quantization import get_quantization_mode, normalize_rows, quantize, decode_vector, decode_codes
+from utils.consts import IN_MEMORY_INDEX_REFRESH_INTERVAL, VECTOR_RESCORE_FACTOR, VECTOR_INDEX_SCAN_BLOCK
+
+logger = logging.getLogger(__name__)
+
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def _is_process_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # Windows keeps the files of running processes open, so removing them fails harmlessly
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+"""Step 2: Define the InMemoryVectorIndex class"""
+class InMemoryVectorIndex:
+    """
+    A cosine-similarity index over the documents of a vector store collection.
+
+    Args:
+        collection (Collection): The vector store collection (text, vector and metadata per document).
+        text_key (str): The field holding the document text.
+        embedding_key (str): The field holding the document vector.
+        refresh_interval (float): Minimum seconds between two checks for collection changes.
+        quantization (str): "none", "float16" or "int8"; defaults to the VECTOR_QUANTIZATION setting.
+        rescore_factor (int): Quantized candidates per requested result that are rescored exactly.
+        storage_dir (str): Directory of the full-precision vector files; defaults to VECTOR_INDEX_DIR or the temp dir.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        text_key: str = "textContent",
+        embedding_key: str = "vectorContent",
+        refresh_interval: float = IN_MEMORY_INDEX_REFRESH_INTERVAL,
+        quantization: str = None,
+        rescore_factor: int = VECTOR_RESCORE_FACTOR,
+        storage_dir: str = None,
+    ):
+        self.collection = collection
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+        self.refresh_interval = refresh_interval
+        self.quantization = quantization or get_quantization_mode()
+        self.rescore_factor = rescore_factor
+        self.storage_dir = storage_dir or os.getenv("VECTOR_INDEX_DIR") or tempfile.gettempdir()
+        self._lock = threading.Lock()
+        # (vectors or codes of shape (n, dim), scales, full-precision memmap, texts, metadatas),
+        # swapped as a whole on reload
+        self._data = (np.zeros((0, 0), dtype=np.float32), None, None, [], [])
+        self._fingerprint = None
+        self._checked_at = 0.0
+
+    def _get_fingerprint(self) -> tuple:
+        # Inserts and deletes change the count or the newest _id
+        newest = self.collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return self.collection.count_documents({}), newest["_id"] if newest else None
+
+    def _get_projection(self) -> dict:
+        fields = [self.text_key, self.embedding_key, "metadata", "vectorFull", "vectorQuantized", "vectorScale", "vectorMode"]
+        return {field: 1 for field in fields}
+
+    def _get_file_prefix(self) -> str:
+        return f"{self.collection.name}_"
+
+    def _remove_stale_files(self):
+        """
+        Removes the full-precision vector files of this collection left in storage_dir by
+        processes that died while writing them.
+        """
+        prefix = self._get_file_prefix()
+        try:
+            names = os.listdir(self.storage_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.startswith(prefix) or not name.endswith(".f32"):
+                continue
+            pid = name[len(prefix):].split("_", 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _is_process_alive(int(pid)):
+                continue
+            if _remove_file(os.path.join(self.storage_dir, name)):
+                logger.info(f"Removed the stale vector file '{name}'.")
+
+    def _map_full_vectors(self, path: str, rows: int, dimensions: int) -> np.memmap:
+        """
+        Maps a file of unit-length float32 vectors read-only and unlinks it.
+        """
+        full = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dimensions))
+        if not _remove_file(path):
+            # Windows cannot remove a mapped file; it goes with the map (searches may still hold the previous one)
+            weakref.finalize(full, _remove_file, path)
+        return full
+
+    def _load_full_precision(self, cursor) -> tuple:
+        vectors, texts, metadatas = [], [], []
+        for document in cursor:
+            vector = decode_vector(document, self.embedding_key)
+            if vector is None or not vector.size:
+                continue
+            vectors.append(normalize_rows(vector))
+            texts.append(document.get(self.text_key, ""))
+            metadatas.append(document.get("metadata") or {})
+        if not vectors:
+            return None
+        return np.ascontiguousarray(vectors, dtype=np.float32), None, None, texts, metadatas
+
+    def _load_quantized(self, cursor) -> tuple:
+        """
+        Streams the vectors into the full-precision file VECTOR_INDEX_SCAN_BLOCK rows at a time,
+        so a load never holds more than one block of float32 vectors in memory.
+        """
+        fd, path = tempfile.mkstemp(prefix=f"{self._get_file_prefix()}{os.getpid()}_", suffix=".f32", dir=self.storage_dir)
+        code_blocks, scale_blocks, texts, metadatas = [], [], [], []
+        block, block_codes = [], []
+        dimensions = None
+
+        def flush(file):
+            vectors = np.vstack(block).astype(np.float32)
+            file.write(vectors.tobytes())
+            # Vectors stored quantized in the collection are used as-is; the others are quantized here
+            missing = [row for row, stored in enumerate(block_codes) if stored is None]
+            if missing:
+                codes, scales = quantize(vectors[missing], self.quantization)
+                for row, code, scale in zip(missing, codes, scales):
+                    block_codes[row] = (code, scale)
+            code_blocks.append(np.vstack([code for code, _ in block_codes]))
+            scale_blocks.append(np.asarray([scale for _, scale in block_codes], dtype=np.float32))
+            block.clear()
+            block_codes.clear()
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for document in cursor:
+                    vector = decode_vector(document, self.embedding_key)
+                    if vector is None or not vector.size:
+                        continue
+                    if dimensions is None:
+                        dimensions = vector.size
+                    elif vector.size != dimensions:
+                        logger.warning(f"Skipped a vector of {vector.size} dimensions in '{self.collection.name}'.")
+                        continue
+                    block.append(normalize_rows(vector))
+                    block_codes.append(decode_codes(document, self.quantization))
+                    texts.append(document.get(self.text_key, ""))
+                    metadatas.append(document.get("metadata") or {})
+                    if len(block) >= VECTOR_INDEX_SCAN_BLOCK:
+                        flush(file)
+                if block:
+                    flush(file)
+        except Exception:
+            _remove_file(path)
+            raise
+
+        if not texts:
+            _remove_file(path)
+            return None
+        full = self._map_full_vectors(path, len(texts), dimensions)
+        return np.concatenate(code_blocks), np.concatenate(scale_blocks), full, texts, metadatas
+
+    def load(self):
+        """
+        Loads every vector of the collection into the index.
+        """
+        fingerprint = self._get_fingerprint()
+        cursor = self.collection.find({}, self._get_projection())
+        if self.quantization == "none":
+            data = self._load_full_precision(cursor)
+        else:
+            self._remove_stale_files()
+            data = self._load_quantized(cursor)
+
+        self._data = data or (np.zeros((0, 0), dtype=np.float32), None, None, [], [])
+        self._fingerprint = fingerprint
+        logger.info(f"Loaded {len(self._data[3])} vectors of '{self.collection.name}' into memory ({self.quantization}).")
+
+    def refresh_if_changed(self):
+        """
+        Reloads the index if the collection changed, checking at most once per refresh_interval.
+        """
+        now = time.monotonic()
+        if self._fingerprint is not None and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._fingerprint is not None and now - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = now
+            if self._fingerprint is None or self._get_fingerprint() != self._fingerprint:
+                self.load()
+
+    def _get_approximate_scores(self, codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Widen one block at a time, so a search never holds a float32 copy of the whole matrix
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), VECTOR_INDEX_SCAN_BLOCK):
+            block = codes[start:start + VECTOR_INDEX_SCAN_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores * scales
+
+    @staticmethod
+    def _get_top(scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query_vector: list[float], k: int = 3) -> list[tuple[Document, float]]:
+        """
+        Returns the k documents most similar to a query vector, with their cosine similarity.
+
+        Args:
+            query_vector (list[float]): The embedded query.
+            k (int): The number of documents to return.
+
+        Returns:
+            list[tuple[Document, float]]: The documents and scores, best first.
+        """
+        self.refresh_if_changed()
+        matrix, scales, full, texts, metadatas = self._data
+        if not texts:
+            return []
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        if full is None:
+            scores = matrix @ query
+            top = self._get_top(scores, k)
+            scores = scores[top]
+        else:
+            candidates = self._get_top(self._get_approximate_scores(matrix, scales, query), k * self.rescore_factor)
+            # Rank the candidates on their full-precision vectors, read from disk in file order
+            candidates = np.sort(candidates)
+            exact = full[candidates] @ query
+            order = self._get_top(exact, k)
+            top, scores = candidates[order], exact[order]
+
+        return [
+            (Document(page_content=texts[i], metadata=dict(metadatas[i])), float(score))
+            for i, score in zip(top, scores)
+        ]
+
+    def get_stats(self) -> dict:
+        """
+        Returns the size of the index in memory and of its full-precision vectors on disk.
+        """
+        matrix, scales, full, texts, _ = self._data
+        memory_bytes = matrix.nbytes + (scales.nbytes if scales is not None else 0)
+        return {
+            "vectors": len(texts),
+            "quantization": self.quantization,
+            "memory_bytes": memory_bytes,
+            "disk_bytes": full.nbytes if full is not None else 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data[3])
+
+
+"""Step 3: Define the retriever on top of the index"""
+class InMemoryRetriever(BaseRetriever):
+    """
+    A retriever that embeds the query and searches an InMemoryVectorIndex.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: InMemoryVectorIndex
+    embeddings: Embeddings
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        query_vector = self.embeddings.embed_query(query)
+        return [document for document, _ in self.index.search(query_vector, self.k)]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        query_vector = await self.embeddings.aembed_query(query)
+        return [document for document, _ in self.index.search(query_vector, self.k)]
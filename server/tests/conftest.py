@@ -0,0 +1,32 @@
+"""Shared fixtures of the server tests: imports from the server directory and an in-memory MongoDB."""
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# MongoDBClient returns mongomock under FLASK_ENV=test; the Azure clients and the tools are created at import time
+os.environ["FLASK_ENV"] = "test"
+os.environ.setdefault("AZURE_TEXT_ANALYTICS_ENDPOINT", "https://localhost")
+os.environ.setdefault("AZURE_TEXT_ANALYTICS_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+os.environ.setdefault("GPLACES_API_KEY", "AIzaTest")
+
+from services.azure_mongodb import MongoDBClient
+
+
+@pytest.fixture(autouse=True)
+def mongo_client():
+    """
+    Gives every test an empty in-memory database.
+    """
+    MongoDBClient._client = mongomock.MongoClient()
+    yield MongoDBClient._client
+    MongoDBClient._client = None
+
+
+@pytest.fixture
+def db(mongo_client):
+    return mongo_client[MongoDBClient.get_db_name()]
@@ -0,0 +1,102 @@
+"""Tests of the process-wide pool of agent prototypes."""
+import threading
+import time
+
+import pytest
+from cachetools import LRUCache
+
+from agents import agent_pool
+from agents.agent_pool import AgentPool
+
+
+class FakeAgent:
+    builds = 0
+    # Retriever tools whose collection does not exist yet
+    unavailable = set()
+
+    def __init__(self, tool_names: list[str], desired_role: str):
+        FakeAgent.builds += 1
+        self.tool_names = tool_names
+        self.desired_role = desired_role
+        self.missing_tool_names = [name for name in tool_names if name in FakeAgent.unavailable]
+
+    def _initialize_agent_executor(self):
+        time.sleep(0.05)
+
+    def spawn(self):
+        return ("view", self)
+
+
+@pytest.fixture(autouse=True)
+def pool(monkeypatch):
+    FakeAgent.builds = 0
+    FakeAgent.unavailable = set()
+    monkeypatch.setattr(agent_pool, "HealthAIAgent", FakeAgent)
+    monkeypatch.setattr(AgentPool, "_prototypes", LRUCache(maxsize=2))
+    monkeypatch.setattr(AgentPool, "_building", {})
+    AgentPool.clear()
+    yield AgentPool
+    AgentPool.clear()
+
+
+def test_prototypes_are_built_once_per_role_and_tool_set():
+    first = AgentPool.get_agent(["b", "a"], "MemeMingle")
+    second = AgentPool.get_agent(["a", "b", "a"], "MemeMingle")
+    other = AgentPool.get_agent(["a", "b"], "Therapist")
+
+    assert first[1] is second[1]
+    assert other[1] is not first[1]
+    assert first[1].tool_names == ["a", "b"]
+    assert AgentPool.get_stats() == {"size": 2, "max_size": 2, "building": 0, "hits": 1, "misses": 2}
+
+
+def test_concurrent_cold_requests_share_one_build():
+    views = []
+    threads = [threading.Thread(target=lambda: views.append(AgentPool.get_agent(["a"], "MemeMingle"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeAgent.builds == 1
+    assert len({id(view[1]) for view in views}) == 1
+
+
+def test_pool_keeps_the_most_recently_used_prototypes():
+    AgentPool.get_agent(["a"], "one")
+    AgentPool.get_agent(["a"], "two")
+    AgentPool.get_agent(["a"], "one")
+    AgentPool.get_agent(["a"], "three")
+    AgentPool.get_agent(["a"], "one")
+
+    assert FakeAgent.builds == 3
+    assert AgentPool.get_stats()["size"] == 2
+
+
+def test_failed_builds_are_not_cached(monkeypatch):
+    def fail(self):
+        raise RuntimeError("no LLM endpoint")
+
+    monkeypatch.setattr(FakeAgent, "_initialize_agent_executor", fail)
+    with pytest.raises(RuntimeError):
+        AgentPool.get_agent(["a"], "MemeMingle")
+    AgentPool.warm_up(["MemeMingle"], ["a"])
+
+    assert AgentPool.get_stats()["size"] == 0
+    assert AgentPool.get_stats()["building"] == 0
+
+
+def test_prototypes_missing_a_retriever_tool_are_not_cached():
+    FakeAgent.unavailable = {"vector_store"}
+    first = AgentPool.get_agent(["a", "vector_store"], "MemeMingle")
+    assert first[1].missing_tool_names == ["vector_store"]
+    assert AgentPool.get_stats()["size"] == 0
+
+    # The collection was created since, so the next request gets the tool and the prototype is kept
+    FakeAgent.unavailable = set()
+    second = AgentPool.get_agent(["a", "vector_store"], "MemeMingle")
+    third = AgentPool.get_agent(["a", "vector_store"], "MemeMingle")
+
+    assert second[1].missing_tool_names == []
+    assert third[1] is second[1]
+    assert FakeAgent.builds == 2
@@ -0,0 +1,93 @@
+"""Tests of the past chat summaries placed in the prompt."""
+import asyncio
+
+import pytest
+from cachetools import TTLCache
+
+from services.db import chat_summary
+from services.db.chat_summary import (
+    get_past_summaries_digest,
+    aget_past_summaries_digest,
+    search_past_summaries,
+    asearch_past_summaries,
+    invalidate_past_summaries,
+    ainvalidate_past_summaries,
+)
+
+
+class TopicEmbeddings:
+    topics = ["sleep", "exams", "friends"]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(topic in text) for topic in self.topics]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    monkeypatch.setattr(chat_summary, "_recent_summaries_cache", TTLCache(maxsize=16, ttl=600))
+    monkeypatch.setattr(chat_summary, "_summary_index_cache", TTLCache(maxsize=16, ttl=600))
+    monkeypatch.setattr(chat_summary, "_cache_stats", {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0})
+    monkeypatch.setattr(chat_summary, "get_cached_embeddings", TopicEmbeddings)
+
+
+def _write_summary(db, chat_id: int, text: str):
+    # Written the way a job-queue worker in another process does, behind this process's caches
+    db["chat_summaries"].insert_one({
+        "user_id": "u1", "chat_id": chat_id, "summary_text": text, "summary_vector": TopicEmbeddings().embed_query(text),
+    })
+
+
+def _bump_version_elsewhere(db):
+    db["past_summaries_versions"].update_one({"_id": "u1"}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def test_digest_is_served_from_the_cache_while_the_version_is_current(db):
+    _write_summary(db, 1, "talked about sleep")
+    assert get_past_summaries_digest("u1") == "talked about sleep"
+
+    _write_summary(db, 2, "talked about exams")
+    assert get_past_summaries_digest("u1") == "talked about sleep"
+    assert chat_summary.get_past_summaries_cache_stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_summary_written_by_another_process_is_seen_on_the_next_read(db, run_async):
+    def digest():
+        if run_async:
+            return asyncio.run(aget_past_summaries_digest("u1"))
+        return get_past_summaries_digest("u1")
+
+    _write_summary(db, 1, "talked about sleep")
+    digest()
+
+    _write_summary(db, 2, "talked about exams")
+    _bump_version_elsewhere(db)
+    assert digest() == "talked about exams\ntalked about sleep"
+    assert chat_summary.get_past_summaries_cache_stats()["stale"] == 1
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_summary_index_is_reloaded_after_another_process_writes(db, run_async):
+    def search(query: str) -> str:
+        if run_async:
+            return asyncio.run(asearch_past_summaries("u1", query))
+        return search_past_summaries("u1", query)
+
+    _write_summary(db, 1, "talked about sleep")
+    assert search("my exams went badly") == "talked about sleep"
+
+    _write_summary(db, 2, "talked about exams")
+    assert search("my exams went badly").startswith("talked about sleep")
+    _bump_version_elsewhere(db)
+    assert search("my exams went badly").startswith("talked about exams")
+
+
+def test_invalidation_bumps_the_version_shared_by_every_process(db):
+    invalidate_past_summaries("u1")
+    asyncio.run(ainvalidate_past_summaries("u1"))
+
+    assert db["past_summaries_versions"].find_one({"_id": "u1"})["version"] == 2
+    assert chat_summary.get_past_summaries_cache_stats()["invalidations"] == 2
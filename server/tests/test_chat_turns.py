@@ -0,0 +1,62 @@
+"""Tests of the windowed chat history."""
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from services.db.chat_turns import ChatTurnHistory
+
+
+def _add_turns(history: ChatTurnHistory, turns: int):
+    for index in range(turns):
+        history.add_messages([HumanMessage(content=f"question {index}"), AIMessage(content=f"answer {index}")])
+
+
+def test_full_history_without_window():
+    history = ChatTurnHistory("user-1")
+    _add_turns(history, 3)
+    assert len(history.messages) == 6
+
+
+def test_window_keeps_the_newest_messages_from_a_question():
+    _add_turns(ChatTurnHistory("user-1"), 4)
+    # Three messages would start on an answer, so the window starts at the next question
+    messages = ChatTurnHistory("user-1", max_messages=3).messages
+
+    assert [message.content for message in messages] == ["question 3", "answer 3"]
+
+
+def test_window_is_trimmed_to_the_token_budget():
+    history = ChatTurnHistory("user-1")
+    history.add_messages([HumanMessage(content="old " * 200), AIMessage(content="old answer")])
+    history.add_messages([HumanMessage(content="new question"), AIMessage(content="new answer")])
+
+    messages = ChatTurnHistory("user-1", max_messages=10, token_budget=50).messages
+    assert [message.content for message in messages] == ["new question", "new answer"]
+
+
+def test_sessions_do_not_mix():
+    _add_turns(ChatTurnHistory("user-1"), 2)
+    _add_turns(ChatTurnHistory("user-2"), 1)
+    assert len(ChatTurnHistory("user-2", max_messages=10).messages) == 2
+
+
+def test_window_mentions_the_summary_of_left_out_turns(monkeypatch):
+    monkeypatch.setattr("services.db.chat_turns.get_chat_summary_text", lambda user_id, chat_id: f"summary of {chat_id}")
+    _add_turns(ChatTurnHistory("user-7"), 3)
+
+    messages = ChatTurnHistory("user-7", max_messages=2, include_summary=True).messages
+    assert messages[0].type == "system"
+    assert "summary of 7" in messages[0].content
+    assert [message.content for message in messages[1:]] == ["question 2", "answer 2"]
+
+
+def test_async_access_reads_the_same_history():
+    async def run():
+        history = ChatTurnHistory("user-1-3", max_messages=3)
+        await history.aadd_messages([HumanMessage(content="question 0"), AIMessage(content="answer 0")])
+        _add_turns(history, 2)
+        return await history.aget_messages(), await history.aget_messages_after(4), history.messages
+
+    windowed, after, messages = asyncio.run(run())
+    assert [message.content for message in windowed] == [message.content for message in messages]
+    assert [message.content for message in after] == ["question 1", "answer 1"]
@@ -0,0 +1,49 @@
+"""Tests of the circuit breakers of the agent tools."""
+from services.circuit_breaker import CircuitBreaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("tool", failure_threshold=3, reset_timeout=60)
+    breaker.record_failure("error")
+    breaker.record_success()
+    breaker.record_failure("error")
+    breaker.record_failure("timeout")
+    assert breaker.allow_request()
+
+    breaker.record_failure("slow")
+    assert not breaker.allow_request()
+    stats = breaker.get_stats()
+    assert stats["state"] == "open"
+    assert stats["failures"] == {"error": 2, "timeout": 1, "slow": 1}
+    assert stats["rejected"] == 1
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("tool", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure("error")
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.get_stats()["state"] == "closed"
+    assert breaker.allow_request()
+
+
+def test_failed_trial_opens_again():
+    breaker = CircuitBreaker("tool", failure_threshold=3, reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure("error")
+    assert breaker.allow_request()
+
+    breaker.record_failure("timeout")
+    assert breaker.get_stats()["state"] == "open"
+    assert breaker.get_stats()["opened"] == 2
+
+
+def test_released_trial_can_be_taken_again():
+    breaker = CircuitBreaker("tool", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure("error")
+    assert breaker.allow_request()
+
+    breaker.release_request()
+    assert breaker.allow_request()
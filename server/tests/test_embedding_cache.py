@@ -0,0 +1,53 @@
+"""Tests of the embedding cache in front of the embeddings model."""
+from langchain_core.embeddings import Embeddings
+
+from services.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_keys_depend_on_model_and_text():
+    embeddings = CountingEmbeddings()
+    small = CachedEmbeddings(embeddings, model_name="small", persist=False)
+    large = CachedEmbeddings(embeddings, model_name="large", persist=False)
+
+    assert small._get_key("hello") == small._get_key("hello")
+    assert small._get_key("hello") != small._get_key("hello ")
+    assert small._get_key("hello") != large._get_key("hello")
+
+
+def test_identical_texts_are_embedded_once():
+    embeddings = CountingEmbeddings()
+    cache = CachedEmbeddings(embeddings, model_name="model", persist=False)
+
+    vectors = cache.embed_documents(["a", "bb", "a"])
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert embeddings.texts == ["a", "bb"]
+
+    assert cache.embed_query("bb") == [2.0, 1.0]
+    assert embeddings.texts == ["a", "bb"]
+    stats = cache.get_stats()
+    assert stats["misses"] == 2
+    assert stats["memory_hits"] == 1
+
+
+def test_vectors_are_shared_through_mongodb(db):
+    embeddings = CountingEmbeddings()
+    CachedEmbeddings(embeddings, model_name="model").embed_documents(["a", "bb"])
+
+    # A second process starts with an empty memory tier
+    other = CachedEmbeddings(embeddings, model_name="model")
+    assert other.embed_documents(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+    assert embeddings.texts == ["a", "bb", "ccc"]
+    assert other.get_stats()["store_hits"] == 1
+    assert db["embedding_cache"].count_documents({"model": "model"}) == 3
@@ -0,0 +1,97 @@
+"""Tests of the MongoDB-backed job queue."""
+from datetime import timedelta
+
+from services.job_queue import JobQueue, QUEUED, RUNNING, DONE, FAILED
+
+
+class FlakyHandler:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.payloads = []
+
+    def __call__(self, payload: dict):
+        self.payloads.append(payload)
+        if len(self.payloads) <= self.failures:
+            raise RuntimeError("temporary failure")
+
+
+def _make_due(queue: JobQueue, job_id: str):
+    queue._get_collection().update_one({"_id": job_id}, {"$set": {"next_run_at": queue._now() - timedelta(seconds=1)}})
+
+
+def test_enqueue_is_idempotent_while_pending():
+    queue = JobQueue("test_jobs", FlakyHandler(0))
+    queue.enqueue("job-1", {"value": 1})
+    queue.enqueue("job-1", {"value": 2})
+
+    assert queue._get_collection().count_documents({}) == 1
+    assert queue.get_job("job-1")["payload"] == {"value": 1}
+    assert queue.get_stats()["enqueued"] == 1
+
+
+def test_claims_and_completes_a_job():
+    handler = FlakyHandler(0)
+    queue = JobQueue("test_jobs", handler)
+    queue.enqueue("job-1", {"value": 1})
+
+    assert queue.process_next("worker")
+    assert not queue.process_next("worker")
+    job = queue.get_job("job-1")
+    assert job["status"] == DONE
+    assert job["attempts"] == 1
+    assert handler.payloads == [{"value": 1}]
+
+
+def test_failed_job_is_retried_after_backoff():
+    queue = JobQueue("test_jobs", FlakyHandler(1), max_attempts=3)
+    queue.enqueue("job-1", {})
+
+    assert queue.process_next("worker")
+    job = queue.get_job("job-1")
+    assert job["status"] == QUEUED
+    assert job["last_error"] == "temporary failure"
+    # The retry waits for its backoff
+    assert not queue.process_next("worker")
+
+    _make_due(queue, "job-1")
+    assert queue.process_next("worker")
+    job = queue.get_job("job-1")
+    assert job["status"] == DONE
+    assert job["attempts"] == 2
+    assert queue.get_stats()["retried"] == 1
+
+
+def test_job_fails_for_good_after_max_attempts():
+    queue = JobQueue("test_jobs", FlakyHandler(5), max_attempts=2)
+    queue.enqueue("job-1", {})
+
+    queue.process_next("worker")
+    _make_due(queue, "job-1")
+    queue.process_next("worker")
+
+    assert queue.get_job("job-1")["status"] == FAILED
+    assert queue.get_stats()["failed"] == 1
+
+
+def test_finished_job_can_be_enqueued_again():
+    queue = JobQueue("test_jobs", FlakyHandler(0))
+    queue.enqueue("job-1", {"value": 1})
+    queue.process_next("worker")
+
+    queue.enqueue("job-1", {"value": 2})
+    job = queue.get_job("job-1")
+    assert job["status"] == QUEUED
+    assert job["attempts"] == 0
+    assert job["payload"] == {"value": 2}
+
+
+def test_released_jobs_are_queued_without_losing_an_attempt():
+    queue = JobQueue("test_jobs", FlakyHandler(0))
+    queue.enqueue("job-1", {})
+    queue._claim("worker-0")
+    assert queue.get_job("job-1")["status"] == RUNNING
+
+    queue._release(["worker-0"])
+    job = queue.get_job("job-1")
+    assert job["status"] == QUEUED
+    assert job["attempts"] == 0
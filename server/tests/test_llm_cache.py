@@ -0,0 +1,139 @@
+"""Tests of the cache of the auxiliary LLM calls."""
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agents.Health_AI_Agent import HealthAIAgent
+from services import llm_cache
+from services.llm_cache import LLMCallCache, normalize_text
+from utils.consts import MEME_TOPIC_KEY_TOKENS
+
+
+class KeywordEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_query(self, text: str) -> list[float]:
+        self.texts.append(text)
+        return [1.0, 0.0] if "sad" in text else [0.0, 1.0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+def test_normalized_texts_share_a_key():
+    assert normalize_text("  Hello,   World!! ") == "hello world"
+    assert normalize_text("I'm fine") == normalize_text("i m FINE")
+    assert normalize_text(None) == ""
+
+
+def test_answers_are_cached_by_normalized_text():
+    cache = LLMCallCache("mood")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "happy"
+
+    assert cache.get_or_compute("I feel great!", compute) == "happy"
+    assert cache.get_or_compute("i feel great", compute) == "happy"
+    assert len(calls) == 1
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_missing_answers_are_not_cached():
+    cache = LLMCallCache("mood")
+    assert cache.get_or_compute("hello", lambda: None) is None
+    assert cache.get_or_compute("hello", lambda: "calm") == "calm"
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_similar_texts_share_an_answer(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_SEMANTIC", "true")
+    cache = LLMCallCache("mood", embeddings=KeywordEmbeddings(), similarity_threshold=0.9)
+    cache.get_or_compute("i am sad", lambda: "sad")
+
+    assert cache.get_or_compute("so sad today", lambda: "other") == "sad"
+    assert cache.get_or_compute("great day", lambda: "happy") == "happy"
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+def test_keys_can_keep_only_the_first_words():
+    assert normalize_text("One, two; three four!", max_tokens=3) == "one two three"
+    assert normalize_text("one two", max_tokens=3) == "one two"
+
+
+def test_evicted_and_expired_entries_are_not_matched(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_SEMANTIC", "true")
+    cache = LLMCallCache("mood", maxsize=1, ttl=3600, embeddings=KeywordEmbeddings(), similarity_threshold=0.9)
+    cache.get_or_compute("i am sad", lambda: "sad")
+    cache.get_or_compute("great day", lambda: "happy")
+
+    # "i am sad" was evicted; its embedding row is reused rather than matched
+    assert cache.get_or_compute("so sad today", lambda: "down") == "down"
+    assert len(cache._row_keys) == 1
+
+    cache = LLMCallCache("mood", ttl=0.01, embeddings=KeywordEmbeddings(), similarity_threshold=0.9)
+    cache.get_or_compute("i am sad", lambda: "sad")
+    time.sleep(0.02)
+    assert cache.get_or_compute("so sad today", lambda: "down") == "down"
+
+
+def test_embedding_matrix_grows_with_the_entries(monkeypatch):
+    class IndexEmbeddings:
+        def embed_query(self, text: str) -> list[float]:
+            vector = [0.0] * 256
+            vector[int(text.split()[-1])] = 1.0
+            return vector
+
+    monkeypatch.setenv("LLM_CACHE_SEMANTIC", "true")
+    cache = LLMCallCache("mood", maxsize=100, embeddings=IndexEmbeddings())
+    for index in range(100):
+        cache.get_or_compute(f"text {index}", lambda index=index: str(index))
+
+    assert cache._vectors.shape == (100, 256)
+    assert cache.get_or_compute("another text 42", lambda: "new") == "42"
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt: str):
+        self.prompts.append(prompt)
+        return AIMessage(content=" Cats ")
+
+    async def ainvoke(self, prompt: str):
+        return self.invoke(prompt)
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_caches", {})
+    agent = HealthAIAgent.__new__(HealthAIAgent)
+    agent.llm = FakeLLM()
+    agent.embedding_model = KeywordEmbeddings()
+    return agent
+
+
+def test_meme_topics_are_not_cached_without_the_semantic_lookup(agent):
+    assert agent.determine_meme_topic("Great job today!") == "cats"
+    assert agent.determine_meme_topic("Great job today!") == "cats"
+    assert len(agent.llm.prompts) == 2
+
+
+def test_meme_topics_are_cached_by_the_opening_of_the_response(agent, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_SEMANTIC", "true")
+    opening = " ".join(["word"] * MEME_TOPIC_KEY_TOKENS)
+
+    assert agent.determine_meme_topic(f"{opening} first ending") == "cats"
+    assert asyncio.run(agent.adetermine_meme_topic(f"{opening.upper()}! another ending")) == "cats"
+    assert len(agent.llm.prompts) == 1
+    assert agent.embedding_model.texts == [opening]
+    # The welcome message picks from other topics, so it has its own cache
+    agent.determine_meme_topic(f"{opening} first ending", is_initial=True)
+    assert len(agent.llm.prompts) == 2
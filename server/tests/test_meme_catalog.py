@@ -0,0 +1,127 @@
+"""Tests of the shared meme catalog."""
+import asyncio
+from datetime import timedelta
+
+import pytest
+import requests
+
+from services import meme_catalog
+from services.meme_catalog import MemeCatalog, NO_MEMES_FOUND, _NEVER
+
+
+class FakeGiphy:
+    def __init__(self):
+        self.topics = []
+        self.rate_limited = False
+
+    def __call__(self, topic: str, limit: int = 1, offset: int = 0) -> list[str]:
+        if self.rate_limited:
+            response = requests.Response()
+            response.status_code = 429
+            raise requests.HTTPError("429 Too Many Requests", response=response)
+        self.topics.append(topic)
+        if topic == "nothing":
+            return []
+        return [f"https://giphy.test/{topic.replace(' ', '-')}/{offset + index}" for index in range(limit)]
+
+
+@pytest.fixture
+def giphy(monkeypatch):
+    giphy = FakeGiphy()
+    monkeypatch.setenv("GIPHY_API_KEY", "test")
+    monkeypatch.setattr(meme_catalog, "search_memes", giphy)
+    return giphy
+
+
+def test_new_topic_is_fetched_once_and_rotated(giphy):
+    catalog = MemeCatalog(urls_per_topic=2)
+
+    urls = [catalog.get_meme_url("  Happy   Dance ") for _ in range(3)]
+    assert urls == ["https://giphy.test/happy-dance/0", "https://giphy.test/happy-dance/1", "https://giphy.test/happy-dance/0"]
+    assert giphy.topics == ["happy dance"]
+    assert catalog.get_stats()["live_fetches"] == 1
+    assert catalog.get_stats()["hits"] == 3
+
+
+def test_other_processes_load_the_topic_from_mongodb(giphy, db):
+    MemeCatalog(urls_per_topic=2).get_meme_url("cats")
+    other = MemeCatalog(urls_per_topic=2)
+
+    assert other.get_meme_url("cats") == "https://giphy.test/cats/0"
+    assert giphy.topics == ["cats"]
+    assert other.get_stats()["store_hits"] == 1
+    assert db["meme_catalog"].find_one({"_id": "cats"})["urls"] == ["https://giphy.test/cats/0", "https://giphy.test/cats/1"]
+
+
+def test_topic_without_memes_is_not_fetched_again(giphy):
+    catalog = MemeCatalog()
+    assert catalog.get_meme_url("nothing") == NO_MEMES_FOUND
+    assert catalog.get_meme_url("nothing") == NO_MEMES_FOUND
+    assert giphy.topics == ["nothing"]
+
+
+def test_missing_api_key_skips_giphy(giphy, monkeypatch):
+    monkeypatch.delenv("GIPHY_API_KEY")
+    assert MemeCatalog().get_meme_url("cats") == "Giphy API key is not configured."
+    assert giphy.topics == []
+
+
+def test_refresh_fetches_the_least_recently_refreshed_topics(giphy, db, monkeypatch):
+    monkeypatch.setattr(meme_catalog, "MEME_CATALOG_REFRESH_MAX_TOPICS", 3)
+    catalog = MemeCatalog()
+    for topic in ["cats", "dogs"]:
+        catalog.get_meme_url(topic)
+    giphy.topics.clear()
+
+    catalog.refresh()
+    # The seed topics have never been fetched, so they come first
+    assert giphy.topics == ["welcome", "hello", "introduction"]
+    assert db["meme_catalog"].count_documents({"refreshed_at": {"$gt": _NEVER}}) == 5
+    assert catalog.get_stats()["refreshes"] == 3
+
+
+def test_refresh_runs_in_one_process_per_lease(giphy):
+    MemeCatalog().refresh()
+    fetched = len(giphy.topics)
+
+    other = MemeCatalog()
+    other.refresh()
+    assert len(giphy.topics) == fetched
+    assert other.get_stats()["refresh_skipped"] == 1
+
+
+def test_refresh_stops_at_the_rate_limit(giphy):
+    giphy.rate_limited = True
+    catalog = MemeCatalog()
+    catalog.refresh()
+
+    assert catalog.get_stats()["rate_limited"] == 1
+    assert catalog.get_stats()["refresh_errors"] == 0
+
+
+def test_unused_and_excess_topics_are_dropped(giphy, db):
+    catalog = MemeCatalog(max_topics=7)
+    for topic in ["old", "a", "b", "c"]:
+        catalog.get_meme_url(topic)
+    collection = db["meme_catalog"]
+    now = catalog._now()
+    collection.update_one({"_id": "old"}, {"$set": {"last_used": now - timedelta(days=2)}})
+    collection.update_one({"_id": "a"}, {"$set": {"last_used": now - timedelta(hours=2)}})
+
+    # "old" is past the topic TTL; then "a", the least recently used, exceeds the 7 topics with the 5 seeds
+    assert catalog._prune() == 2
+    assert sorted(collection.distinct("_id")) == sorted(["b", "c", "welcome", "hello", "introduction", "greeting", "funny"])
+
+
+def test_async_lookups_share_the_catalog(giphy, monkeypatch):
+    async def asearch(topic: str, limit: int = 1) -> list[str]:
+        return giphy(topic, limit)
+
+    monkeypatch.setattr(meme_catalog, "asearch_memes", asearch)
+    MemeCatalog(urls_per_topic=2).get_meme_url("cats")
+
+    other = MemeCatalog(urls_per_topic=2)
+    assert asyncio.run(other.aget_meme_url("cats")) == "https://giphy.test/cats/0"
+    assert asyncio.run(other.aget_meme_url("dogs")) == "https://giphy.test/dogs/0"
+    assert MemeCatalog().get_meme_url("dogs") == "https://giphy.test/dogs/0"
+    assert giphy.topics == ["cats", "dogs"]
@@ -0,0 +1,79 @@
+"""Tests of the quantized vectors and their exact rescoring."""
+import os
+
+import numpy as np
+import pytest
+
+from services.quantization import quantize, encode_vector, decode_vector, decode_codes
+from services.vector_index import InMemoryVectorIndex
+
+
+@pytest.fixture
+def unit_vectors():
+    vectors = np.random.default_rng(0).normal(size=(200, 64)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("mode, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_codes_approximate_the_vectors(unit_vectors, mode, tolerance):
+    codes, scales = quantize(unit_vectors, mode)
+
+    assert codes.dtype == (np.int8 if mode == "int8" else np.float16)
+    assert np.abs(codes.astype(np.float32) * scales[:, None] - unit_vectors).max() < tolerance
+
+
+def test_vectors_round_trip_through_the_stored_layout(unit_vectors):
+    vector = (unit_vectors[0] * 3).tolist()
+    assert encode_vector(vector, "none") == {"vectorContent": vector}
+
+    fields = encode_vector(vector, "int8")
+    assert np.allclose(decode_vector(fields), unit_vectors[0], atol=1e-6)
+    codes, scale = decode_codes(fields, "int8")
+    assert np.abs(codes * scale - unit_vectors[0]).max() < 1e-2
+    assert decode_codes(fields, "float16") is None
+
+
+def _insert(collection, vectors, mode="none"):
+    collection.insert_many([
+        {"textContent": str(row), **encode_vector(vector.tolist(), mode)} for row, vector in enumerate(vectors)
+    ])
+
+
+@pytest.mark.parametrize("stored_mode", ["none", "int8"])
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_rescoring_matches_the_exact_search(db, tmp_path, unit_vectors, mode, stored_mode):
+    _insert(db["exact_vector_store"], unit_vectors)
+    _insert(db["quantized_vector_store"], unit_vectors, stored_mode)
+    exact = InMemoryVectorIndex(db["exact_vector_store"], quantization="none")
+    quantized = InMemoryVectorIndex(db["quantized_vector_store"], quantization=mode, storage_dir=str(tmp_path))
+
+    for query in unit_vectors[:20] + 0.1:
+        expected = [(document.page_content, score) for document, score in exact.search(query.tolist(), k=5)]
+        results = [(document.page_content, score) for document, score in quantized.search(query.tolist(), k=5)]
+        assert [text for text, _ in results] == [text for text, _ in expected]
+        # The returned scores are the full-precision ones, not the quantized estimates
+        assert np.allclose([score for _, score in results], [score for _, score in expected], atol=1e-6)
+
+
+def test_quantized_index_holds_codes_in_memory_and_vectors_on_disk(db, tmp_path, unit_vectors):
+    _insert(db["notes_vector_store"], unit_vectors)
+    index = InMemoryVectorIndex(db["notes_vector_store"], quantization="int8", storage_dir=str(tmp_path))
+    index.load()
+
+    stats = index.get_stats()
+    assert stats["memory_bytes"] == unit_vectors.size + 4 * len(unit_vectors)
+    assert stats["disk_bytes"] == unit_vectors.nbytes
+    # The full-precision file is unlinked as soon as it is mapped
+    assert os.listdir(tmp_path) == []
+
+
+def test_files_of_dead_processes_are_removed(db, tmp_path, unit_vectors):
+    _insert(db["notes_vector_store"], unit_vectors)
+    stale = tmp_path / "notes_vector_store_999999999_x.f32"
+    other = tmp_path / "other_vector_store_999999999_x.f32"
+    stale.write_bytes(b"0")
+    other.write_bytes(b"0")
+
+    InMemoryVectorIndex(db["notes_vector_store"], quantization="int8", storage_dir=str(tmp_path)).load()
+    assert not stale.exists()
+    assert other.exists()
@@ -0,0 +1,118 @@
+"""Tests of the retriever registry and the incremental sync of the vector stores."""
+import pytest
+
+from benchmarks.retrieval import HashingEmbeddings
+from services import retriever_registry
+from services.retriever_registry import RetrieverRegistry
+from services.vector_index import InMemoryRetriever
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dimensions=32)
+        self.texts = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(RetrieverRegistry, "_retrievers", {})
+    monkeypatch.setattr(RetrieverRegistry, "_stats", dict.fromkeys(RetrieverRegistry._stats, 0))
+    return RetrieverRegistry
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(retriever_registry, "get_cached_embeddings", lambda: embeddings)
+    monkeypatch.setattr(RetrieverRegistry, "_create_vector_index", classmethod(lambda cls, collection: None))
+    monkeypatch.setenv("VECTOR_SEARCH_BACKEND", "memory")
+    monkeypatch.setenv("VECTOR_QUANTIZATION", "none")
+    return embeddings
+
+
+@pytest.fixture
+def facts(db):
+    db["agent_facts"].insert_many([
+        {"_id": "a", "fact": "The agent was created in 2024.", "sample_query": "When were you made?"},
+        {"_id": "b", "fact": "The agent supports voice messages.", "sample_query": "Can I talk to you?"},
+        {"_id": "c", "fact": "The agent can suggest coping activities.", "sample_query": "What can you do?"},
+    ])
+    return db["agent_facts"]
+
+
+def test_missing_vector_store_is_not_resolved(embeddings, facts):
+    assert RetrieverRegistry.get_retriever("agent_facts") is None
+    assert RetrieverRegistry.get_stats()["missing"] == 1
+
+    RetrieverRegistry.sync_vector_store("agent_facts")
+    assert RetrieverRegistry.get_retriever("agent_facts") is not None
+
+
+def test_retriever_is_resolved_once(embeddings, facts):
+    RetrieverRegistry.sync_vector_store("agent_facts")
+    retriever = RetrieverRegistry.get_retriever("agent_facts", top_k=1)
+
+    assert isinstance(retriever, InMemoryRetriever)
+    assert RetrieverRegistry.get_retriever("agent_facts", top_k=1) is retriever
+    assert retriever.invoke("The agent supports voice messages.")[0].page_content == "The agent supports voice messages."
+    stats = RetrieverRegistry.get_stats()
+    assert (stats["resolved"], stats["hits"]) == (1, 1)
+    assert stats["indexes"]["agent_facts@1"]["vectors"] == 3
+
+
+def test_warm_up_syncs_and_resolves(embeddings, facts):
+    RetrieverRegistry.warm_up(["agent_facts"])
+
+    assert RetrieverRegistry.get_stats()["size"] == 1
+    assert RetrieverRegistry.get_stats()["synced"] == 1
+
+
+def test_first_sync_embeds_every_document(embeddings, facts, db):
+    stats = RetrieverRegistry.sync_vector_store("agent_facts")
+
+    assert stats["embedded_documents"] == 3
+    assert stats["deleted_vectors"] == 0
+    assert sorted(db["agent_facts_vector_store"].distinct("source_id")) == ["a", "b", "c"]
+
+
+def test_unchanged_documents_are_not_embedded_again(embeddings, facts):
+    RetrieverRegistry.sync_vector_store("agent_facts")
+    embedded = len(embeddings.texts)
+
+    stats = RetrieverRegistry.sync_vector_store("agent_facts")
+    assert stats["embedded_documents"] == 0
+    assert stats["unchanged"] == 3
+    assert len(embeddings.texts) == embedded
+
+
+def test_changed_and_deleted_documents_are_synced(embeddings, facts, db):
+    RetrieverRegistry.sync_vector_store("agent_facts")
+    facts.update_one({"_id": "a"}, {"$set": {"fact": "The agent was created in 2023."}})
+    facts.delete_one({"_id": "b"})
+    facts.insert_one({"_id": "d", "fact": "The agent can fetch memes.", "sample_query": "Show me a meme"})
+
+    stats = RetrieverRegistry.sync_vector_store("agent_facts")
+    assert stats["embedded_documents"] == 2
+    assert stats["deleted_vectors"] == 2
+    assert stats["unchanged"] == 1
+    assert sorted(db["agent_facts_vector_store"].distinct("source_id")) == ["a", "c", "d"]
+
+
+def test_vectors_without_a_source_are_replaced(embeddings, facts, db):
+    db["agent_facts_vector_store"].insert_one({"textContent": "old fact", "vectorContent": [0.0] * 32})
+
+    stats = RetrieverRegistry.sync_vector_store("agent_facts")
+    assert stats["deleted_vectors"] == 1
+    assert db["agent_facts_vector_store"].count_documents({"source_id": {"$exists": False}}) == 0
+
+
+def test_sync_is_skipped_while_another_process_holds_the_lock(embeddings, facts):
+    assert RetrieverRegistry._acquire_sync_lock("agent_facts_vector_store") is not None
+
+    stats = RetrieverRegistry.sync_vector_store("agent_facts")
+    assert "skipped" in stats
+    assert embeddings.texts == []
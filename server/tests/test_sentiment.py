@@ -0,0 +1,72 @@
+"""Tests of the micro-batched sentiment analysis."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from services.sentiment import SentimentBatcher
+
+
+class FakeTextAnalyticsClient:
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def analyze_sentiment(self, documents: list[dict]):
+        with self._lock:
+            self.batches.append([document["text"] for document in documents])
+        threading.Event().wait(self.delay)
+        return [
+            SimpleNamespace(is_error=True, error=SimpleNamespace(message="invalid document"))
+            if document["text"] == "bad"
+            else SimpleNamespace(is_error=False, sentiment="positive" if "good" in document["text"] else "negative")
+            for document in documents
+        ]
+
+
+def test_concurrent_requests_share_a_batch():
+    client = FakeTextAnalyticsClient()
+    batcher = SentimentBatcher(client, max_batch_size=10, max_wait=0.2)
+    texts = [f"good {index}" for index in range(4)] + ["awful day"]
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(batcher.analyze, texts))
+
+    assert results == ["positive"] * 4 + ["negative"]
+    assert len(client.batches) == 1
+    assert sorted(client.batches[0]) == sorted(texts)
+    assert batcher.get_stats()["avg_batch_size"] == 5
+
+
+def test_batches_are_split_at_max_size():
+    client = FakeTextAnalyticsClient()
+    batcher = SentimentBatcher(client, max_batch_size=2, max_wait=0.2)
+    futures = [batcher.submit(f"good {index}") for index in range(5)]
+
+    assert [future.result(timeout=5) for future in futures] == ["positive"] * 5
+    assert all(len(batch) <= 2 for batch in client.batches)
+    assert sum(len(batch) for batch in client.batches) == 5
+
+
+def test_identical_texts_are_coalesced_and_cached():
+    client = FakeTextAnalyticsClient(delay=0.1)
+    batcher = SentimentBatcher(client, max_wait=0.05)
+    first, second = batcher.submit("good"), batcher.submit("good")
+
+    assert first is second
+    assert first.result(timeout=5) == "positive"
+    assert batcher.analyze("good") == "positive"
+    assert client.batches == [["good"]]
+    stats = batcher.get_stats()
+    assert (stats["coalesced"], stats["cache_hits"]) == (1, 1)
+
+
+def test_document_errors_reach_only_their_caller():
+    client = FakeTextAnalyticsClient()
+    batcher = SentimentBatcher(client, max_wait=0.1)
+    bad, good = batcher.submit("bad"), batcher.submit("good")
+
+    assert good.result(timeout=5) == "positive"
+    assert isinstance(bad.exception(timeout=5), RuntimeError)
+    # Errors are not cached
+    assert batcher.submit("bad") is not bad
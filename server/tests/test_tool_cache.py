@@ -0,0 +1,69 @@
+"""Tests of the response cache of the external lookup tools."""
+import time
+
+import requests
+
+from services.tool_cache import ToolCache, PartialResult, normalize_arguments
+from utils import agents
+
+
+def test_arguments_are_normalized_into_one_key():
+    assert normalize_arguments({"query": "  Anxiety  Tips", "limit": 3}) == normalize_arguments({"limit": 3, "query": "anxiety tips"})
+    assert normalize_arguments({"query": "a"}) != normalize_arguments({"query": "a", "limit": 3})
+
+
+def test_failures_are_not_cached():
+    cache = ToolCache("search", ttl=60)
+    assert cache.get_or_compute({"query": "x"}, lambda: "Failed to search.") == "Failed to search."
+    assert cache.get_or_compute({"query": "x"}, lambda: "results") == "results"
+    assert cache.get_or_compute({"query": "x"}, lambda: "other") == "results"
+
+
+def test_partial_results_are_returned_but_not_cached():
+    cache = ToolCache("search", ttl=60)
+    assert cache.get_or_compute({"query": "x"}, lambda: PartialResult("some results")) == "some results"
+    assert cache.get_or_compute({"query": "x"}, lambda: "results") == "results"
+
+
+def test_stale_results_are_served_while_refreshed():
+    cache = ToolCache("search", ttl=0.05, stale_ttl=60)
+    cache.get_or_compute({"query": "x"}, lambda: "old")
+    time.sleep(0.06)
+
+    assert cache.get_or_compute({"query": "x"}, lambda: "new") == "old"
+    deadline = time.monotonic() + 5
+    while cache.get_stats()["refreshes"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_compute({"query": "x"}, lambda: "newer") == "new"
+    assert cache.get_stats()["stale_hits"] == 1
+
+
+class FakeOpenLibrary:
+    def __init__(self):
+        self.edition_down = True
+
+    def __call__(self, url: str, params: dict = None):
+        response = requests.Response()
+        response.status_code = 200
+        if url.endswith("search.json"):
+            response._content = b'{"docs": [{"title": "Biology", "key": "/works/W1", "edition_key": ["E1"]}]}'
+        elif self.edition_down:
+            response.status_code = 503
+        else:
+            response._content = b'{"ocaid": "biology"}'
+        return response
+
+
+def test_textbooks_missing_an_edition_are_not_cached(monkeypatch):
+    open_library = FakeOpenLibrary()
+    monkeypatch.setattr(agents, "http_get", open_library)
+    monkeypatch.setattr(agents, "_edition_cache", {})
+    cache = ToolCache("textbook_search", ttl=60)
+
+    def search():
+        return cache.get_or_compute({"query": "biology"}, lambda: agents.get_public_domain_textbooks("biology"))
+
+    assert "Read online: https://openlibrary.org/works/W1" in search()
+    open_library.edition_down = False
+    assert "Download PDF: https://archive.org/download/biology/biology.pdf" in search()
+    assert cache.get_stats()["size"] == 1
@@ -0,0 +1,225 @@
+"""Tests of the parallel tool calls of an agent step."""
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain.agents.agent import RunnableMultiActionAgent
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import Tool
+
+from agents import tool_executor
+from agents.tool_executor import ParallelToolAgentExecutor, _PendingToolCall, _ToolCallWindow
+from services import circuit_breaker
+from utils.consts import TOOL_CALL_MAX_PER_TURN
+
+
+class Concurrency:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.running -= 1
+
+
+@pytest.fixture(autouse=True)
+def executor_state(monkeypatch):
+    monkeypatch.setattr(tool_executor, "_tool_pools", {})
+    monkeypatch.setattr(tool_executor, "_tool_slots", {})
+    monkeypatch.setattr(tool_executor, "_tool_stats", {})
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+
+def _make_executor(tool_names: list[str], seconds: float, concurrency: Concurrency) -> ParallelToolAgentExecutor:
+    def make_tool(name: str) -> Tool:
+        def run(query: str) -> str:
+            with concurrency:
+                time.sleep(seconds)
+            return f"{name}:{query}"
+
+        async def arun(query: str) -> str:
+            with concurrency:
+                await asyncio.sleep(seconds)
+            return f"{name}:{query}"
+
+        return Tool(name=name, func=run, coroutine=arun, description=f"The {name} tool.")
+
+    def plan(inputs: dict):
+        # Asks for every tool at once, then answers with their observations
+        steps = inputs["intermediate_steps"]
+        if steps:
+            return AgentFinish({"output": [observation for _, observation in steps]}, log="")
+        return [AgentAction(tool=name, tool_input=str(index), log="") for index, name in enumerate(tool_names)]
+
+    return ParallelToolAgentExecutor(
+        agent=RunnableMultiActionAgent(runnable=RunnableLambda(plan)),
+        tools=[make_tool(name) for name in dict.fromkeys(tool_names)],
+    )
+
+
+def _make_call(tool: str, func) -> _PendingToolCall:
+    return _PendingToolCall(AgentAction(tool=tool, tool_input="", log=""), func)
+
+
+def test_window_starts_at_most_max_in_flight_calls():
+    concurrency = Concurrency()
+
+    def run(index: int):
+        with concurrency:
+            time.sleep(0.05)
+        return AgentStep(action=AgentAction(tool="search", tool_input="", log=""), observation=index)
+
+    window = _ToolCallWindow(max_in_flight=2)
+    calls = [_make_call("search", lambda index=index: run(index)) for index in range(5)]
+    for call in calls:
+        window.add(call)
+
+    assert [call.result().observation for call in calls] == [0, 1, 2, 3, 4]
+    assert concurrency.peak == 2
+
+
+def test_step_runs_its_tool_calls_concurrently_in_order():
+    concurrency = Concurrency()
+    executor = _make_executor(["alpha", "beta", "gamma"], 0.2, concurrency)
+
+    started = time.monotonic()
+    output = executor.invoke({"input": "hi"})["output"]
+
+    assert output == ["alpha:0", "beta:1", "gamma:2"]
+    assert concurrency.peak == 3
+    assert time.monotonic() - started < 0.5
+    assert tool_executor.get_tool_call_stats()["parallel_steps"] >= 1
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_step_runs_at_most_max_per_turn_calls_at_once(run_async):
+    concurrency = Concurrency()
+    tool_names = [f"tool_{index}" for index in range(TOOL_CALL_MAX_PER_TURN + 2)]
+    executor = _make_executor(tool_names, 0.05, concurrency)
+
+    if run_async:
+        output = asyncio.run(executor.ainvoke({"input": "hi"}))["output"]
+    else:
+        output = executor.invoke({"input": "hi"})["output"]
+
+    assert output == [f"{name}:{index}" for index, name in enumerate(tool_names)]
+    assert concurrency.peak == TOOL_CALL_MAX_PER_TURN
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    timeouts = {}
+    monkeypatch.setattr(tool_executor, "TOOL_TIMEOUTS", timeouts)
+    monkeypatch.setattr(tool_executor, "TOOL_CALL_MAX_WORKERS_BY_TOOL", {"busy": 1})
+    return timeouts
+
+
+def _make_step_call(tool: str, seconds: float, ran: list = None, error: Exception = None) -> _PendingToolCall:
+    def run():
+        if ran is not None:
+            ran.append(tool)
+        time.sleep(seconds)
+        if error is not None:
+            raise error
+        return AgentStep(action=AgentAction(tool=tool, tool_input="", log=""), observation=f"{tool} done")
+
+    return _make_call(tool, run)
+
+
+def _run_in_window(*calls: _PendingToolCall, max_in_flight: int = TOOL_CALL_MAX_PER_TURN) -> list[str]:
+    window = _ToolCallWindow(max_in_flight)
+    for call in calls:
+        window.add(call)
+    return [call.result().observation for call in calls]
+
+
+def test_budget_starts_when_the_call_runs(budgets):
+    budgets["search"] = 0.5
+    # The second call waits 0.3s for the first, so its budget would be spent if counted from the queue
+    observations = _run_in_window(_make_step_call("search", 0.3), _make_step_call("search", 0.3), max_in_flight=1)
+
+    assert observations == ["search done", "search done"]
+    assert tool_executor.get_tool_call_stats()["tools"]["search"]["timeouts"] == 0
+
+
+def test_calls_over_budget_or_failing_get_a_fallback(budgets):
+    budgets["slow"] = 0.1
+    observations = _run_in_window(_make_step_call("slow", 0.3), _make_step_call("broken", 0, error=RuntimeError("down")))
+
+    assert "timed out" in observations[0]
+    assert "failed" in observations[1]
+    stats = tool_executor.get_tool_call_stats()["tools"]
+    assert (stats["slow"]["timeouts"], stats["broken"]["errors"]) == (1, 1)
+    assert circuit_breaker.get_circuit_breaker("slow").get_stats()["failures"] == {"timeout": 1}
+
+
+def test_call_waiting_its_budget_in_the_window_never_runs(budgets):
+    budgets.update({"slow": 1, "quick": 0.1})
+    ran = []
+    observations = _run_in_window(_make_step_call("slow", 0.3, ran), _make_step_call("quick", 0, ran), max_in_flight=1)
+
+    assert observations[0] == "slow done"
+    assert "waiting" in observations[1]
+    assert ran == ["slow"]
+    assert tool_executor.get_tool_call_stats()["tools"]["quick"]["queue_timeouts"] == 1
+    # A call that never ran does not count against the breaker
+    assert circuit_breaker.get_circuit_breaker("quick").get_stats()["failures"] == {}
+
+
+def test_call_waiting_its_budget_in_the_tool_pool_is_cancelled(budgets):
+    budgets["busy"] = 0.2
+    ran = []
+    first, second = _make_step_call("busy", 0.5, ran), _make_step_call("busy", 0, ran)
+    _ToolCallWindow().add(first)
+    # Another step's call finds the only thread of the tool's pool busy
+    _ToolCallWindow().add(second)
+
+    assert "waiting" in second.result().observation
+    assert "timed out" in first.result().observation
+    time.sleep(0.4)
+    assert ran == ["busy"]
+    assert second.future.cancelled()
+
+
+def test_slow_tool_only_delays_its_own_calls(budgets):
+    budgets["busy"] = 1
+    slow = [_make_step_call("busy", 0.3) for _ in range(2)]
+    fast = _make_step_call("search", 0)
+    started = time.monotonic()
+    for call in slow:
+        _ToolCallWindow().add(call)
+    _ToolCallWindow().add(fast)
+
+    assert fast.result().observation == "search done"
+    assert time.monotonic() - started < 0.2
+    assert [call.result().observation for call in slow] == ["busy done", "busy done"]
+
+
+def test_async_call_waiting_its_budget_for_a_slot_never_runs(budgets):
+    budgets["busy"] = 0.1
+    concurrency = Concurrency()
+    executor = _make_executor(["busy"], 0, concurrency)
+
+    async def run():
+        # Another turn holds the only slot of the tool
+        slots = tool_executor._get_tool_slots("busy")
+        await slots.acquire()
+        try:
+            return await executor.ainvoke({"input": "hi"})
+        finally:
+            slots.release()
+
+    output = asyncio.run(run())["output"]
+    assert "waiting" in output[0]
+    assert concurrency.peak == 0
+    assert tool_executor.get_tool_call_stats()["tools"]["busy"]["queue_timeouts"] == 1
+    assert circuit_breaker.get_circuit_breaker("busy").allow_request()
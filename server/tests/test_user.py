@@ -0,0 +1,29 @@
+"""Tests of the user profile lookups."""
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+
+from services.db import user
+
+
+@pytest.fixture
+def users(db, monkeypatch):
+    monkeypatch.setattr(user, "db", db)
+    user_id = db["users"].insert_one(
+        {"name": "Ada", "email": "ada@example.com", "password": "hash", "contentVector": [0.1]}
+    ).inserted_id
+    return str(user_id)
+
+
+def test_profile_leaves_out_credentials_and_vectors(users):
+    for profile in (user.get_user_profile_by_user_id(users), asyncio.run(user.aget_user_profile_by_user_id(users))):
+        assert json.loads(profile) == {"_id": users, "name": "Ada"}
+
+
+def test_unknown_or_invalid_users_have_no_profile(users):
+    unknown = str(ObjectId())
+    assert user.get_user_profile_by_user_id(unknown) == ""
+    assert asyncio.run(user.aget_user_profile_by_user_id(unknown)) == ""
+    assert asyncio.run(user.aget_user_profile_by_user_id("not-an-id")) == ""
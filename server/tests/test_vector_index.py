@@ -0,0 +1,66 @@
+"""Tests of the in-memory vector index."""
+import numpy as np
+import pytest
+
+from services.vector_index import InMemoryVectorIndex, InMemoryRetriever
+from benchmarks.retrieval import HashingEmbeddings
+
+
+@pytest.fixture
+def vectors(db):
+    collection = db["notes_vector_store"]
+    collection.insert_many([
+        {"textContent": "east", "vectorContent": [1.0, 0.0, 0.0], "metadata": {"id": 1}},
+        {"textContent": "north", "vectorContent": [0.0, 2.0, 0.0], "metadata": {"id": 2}},
+        {"textContent": "north-east", "vectorContent": [1.0, 1.0, 0.0], "metadata": {"id": 3}},
+        {"textContent": "no vector"},
+    ])
+    return collection
+
+
+def test_search_ranks_documents_by_cosine_similarity(vectors):
+    index = InMemoryVectorIndex(vectors, quantization="none")
+    results = index.search([0.0, 5.0, 0.0], k=2)
+
+    assert [document.page_content for document, _ in results] == ["north", "north-east"]
+    assert results[0][1] == pytest.approx(1.0)
+    assert results[1][1] == pytest.approx(np.sqrt(0.5))
+    assert results[0][0].metadata == {"id": 2}
+    assert len(index) == 3
+
+
+def test_k_larger_than_the_index_returns_every_document(vectors):
+    assert len(InMemoryVectorIndex(vectors, quantization="none").search([1.0, 0.0, 0.0], k=10)) == 3
+
+
+def test_empty_collection_returns_nothing(db):
+    assert InMemoryVectorIndex(db["empty_vector_store"], quantization="none").search([1.0, 0.0], k=3) == []
+
+
+def test_index_reloads_when_the_collection_changes(vectors):
+    index = InMemoryVectorIndex(vectors, refresh_interval=0, quantization="none")
+    assert index.search([0.0, 0.0, 1.0], k=1)[0][0].page_content != "up"
+
+    vectors.insert_one({"textContent": "up", "vectorContent": [0.0, 0.0, 1.0]})
+    assert index.search([0.0, 0.0, 1.0], k=1)[0][0].page_content == "up"
+
+
+def test_index_is_not_checked_again_within_the_refresh_interval(vectors):
+    index = InMemoryVectorIndex(vectors, refresh_interval=3600, quantization="none")
+    index.search([1.0, 0.0, 0.0])
+
+    vectors.insert_one({"textContent": "up", "vectorContent": [0.0, 0.0, 1.0]})
+    assert len(index.search([0.0, 0.0, 1.0], k=10)) == 3
+
+
+def test_retriever_embeds_the_query(db):
+    embeddings = HashingEmbeddings(dimensions=64)
+    texts = ["sleep helps memory", "exercise reduces stress", "homework schedule"]
+    db["facts_vector_store"].insert_many([
+        {"textContent": text, "vectorContent": vector} for text, vector in zip(texts, embeddings.embed_documents(texts))
+    ])
+    retriever = InMemoryRetriever(
+        index=InMemoryVectorIndex(db["facts_vector_store"], quantization="none"), embeddings=embeddings, k=1
+    )
+
+    assert retriever.invoke("exercise reduces stress")[0].page_content == "exercise reduces stress"
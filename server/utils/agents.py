@@ -2,12 +2,12 @@
 """STEP 1: Import necessary modules"""
 import os
 import random
-import requests
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from langchain_google_community import GoogleSearchAPIWrapper
-from langchain_community.utilities import BingSearchAPIWrapper
 from langchain_community.tools import YouTubeSearchTool
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.textanalytics import TextAnalyticsClient
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from docx import Document as DocxDocument
@@ -18,10 +18,23 @@ from uuid import uuid4
 import os
 from PIL import Image, ImageDraw, ImageFont
 
-# Initialize Azure Text Analytics Client
-text_analytics_key = os.getenv("AZURE_TEXT_ANALYTICS_KEY")
-text_analytics_endpoint = os.getenv("AZURE_TEXT_ANALYTICS_ENDPOINT")
-text_analytics_client = TextAnalyticsClient(endpoint=text_analytics_endpoint, credential=AzureKeyCredential(text_analytics_key))
+from services.http_client import http_get, ahttp_get
+from services.sentiment import sentiment_service
+from services.tool_cache import PartialResult
+from utils.consts import (
+    BING_SEARCH_DEFAULT_URL,
+    BING_SEARCH_RESULT_COUNT,
+    OPEN_LIBRARY_LOOKUP_WORKERS,
+    OPEN_LIBRARY_EDITION_CACHE_SIZE,
+    OPEN_LIBRARY_EDITION_CACHE_TTL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Open Library edition lookups run concurrently, and edition data is cached across searches
+_edition_pool = ThreadPoolExecutor(max_workers=OPEN_LIBRARY_LOOKUP_WORKERS, thread_name_prefix="open-library")
+_edition_cache = TTLCache(maxsize=OPEN_LIBRARY_EDITION_CACHE_SIZE, ttl=OPEN_LIBRARY_EDITION_CACHE_TTL)
+_edition_cache_lock = threading.Lock()
 
 
 """Step 2: Define the agent functions"""
@@ -40,14 +53,14 @@ def get_google_search_results(query: str):
     try:
         google_search_wrapper = GoogleSearchAPIWrapper(k=3)
         search_results = google_search_wrapper.run(query)
-        print("Search results obtained:", search_results)
+        logger.debug(f"Google search returned {len(search_results)} characters for '{query}'.")
 
         # Ensure the results are JSON-serializable
         
         return search_results
     
     except Exception as e:
-        print(f"Failed to fetch Google search results: {e}", exc_info=True)
+        logger.error(f"Failed to fetch Google search results: {e}", exc_info=True)
         return None
     
 
@@ -67,13 +80,13 @@ def get_youtube_search_results(query: str):
     try:
         youtube_search_tool = YouTubeSearchTool()
         search_results = youtube_search_tool.run(query)
-        print("Search results obtained:", search_results)
+        logger.debug(f"YouTube search returned {len(search_results)} characters for '{query}'.")
 
         # Ensure the results are JSON-serializable
         return search_results
 
     except Exception as e:
-        print(f"Failed to fetch YouTube search results: {e}", exc_info=True)
+        logger.error(f"Failed to fetch YouTube search results: {e}", exc_info=True)
         return None
 
 
@@ -91,15 +104,24 @@ def get_bing_search_results(query: str):
         list: A list of search results with titles and links.
     """
     try:
-        bing_search_wrapper = BingSearchAPIWrapper()
-        search_results = bing_search_wrapper.run(query)
-        print("Search results obtained:", search_results)
+        # Same request and snippet format as BingSearchAPIWrapper.run, through the pooled session
+        response = http_get(
+            os.getenv("BING_SEARCH_URL", BING_SEARCH_DEFAULT_URL),
+            params={"q": query, "count": BING_SEARCH_RESULT_COUNT, "textDecorations": True, "textFormat": "HTML"},
+            headers={"Ocp-Apim-Subscription-Key": os.getenv("BING_SUBSCRIPTION_KEY")},
+        )
+        response.raise_for_status()
+        results = response.json().get("webPages", {}).get("value", [])
+        if not results:
+            return "No good Bing Search Result was found"
+        search_results = " ".join(result["snippet"] for result in results)
+        logger.debug(f"Bing search returned {len(results)} results for '{query}'.")
 
         # Ensure the results are JSON-serializable
         return search_results
 
     except Exception as e:
-        print(f"Failed to fetch Bing search results: {e}", exc_info=True)
+        logger.error(f"Failed to fetch Bing search results: {e}", exc_info=True)
         return None
     
 
@@ -117,18 +139,56 @@ def generate_suggestions(mood: str, user_input: str):
     Returns:
         list: A list of suggested activities or coping mechanisms.
     """
-    # Analyze sentiment
-    sentiment_response = text_analytics_client.analyze_sentiment(documents=[{"id": "1", "text": user_input}])
-    sentiment = sentiment_response[0].sentiment
+    # Analyze sentiment; requests are batched with those of other users and cached by text
+    sentiment = sentiment_service.analyze(user_input)
 
     # Generate suggestions based on mood and sentiment
     prompt = f"Suggest some personalized activities or coping mechanisms for someone who is feeling {mood} and has a sentiment of {sentiment}."
-    response = text_analytics_client.analyze_sentiment(documents=[{"id": "2", "text": prompt}])
-    suggestions = response[0].sentiment.split('\n')
+    suggestions = sentiment_service.analyze(prompt).split('\n')
     
     return suggestions
 
 
+def _fetch_edition(edition_key: str):
+    """
+    Returns the Open Library data of an edition, or None if it cannot be fetched.
+    Only successful lookups are cached.
+    """
+    with _edition_cache_lock:
+        edition_data = _edition_cache.get(edition_key)
+    if edition_data is not None:
+        return edition_data
+
+    try:
+        edition_response = http_get(f"https://openlibrary.org/books/{edition_key}.json")
+        edition_response.raise_for_status()
+        edition_data = edition_response.json()
+    except Exception as e:
+        logger.warning(f"Failed to fetch Open Library edition '{edition_key}': {e}")
+        return None
+
+    with _edition_cache_lock:
+        _edition_cache[edition_key] = edition_data
+    return edition_data
+
+
+def _get_pdf_link(edition_data: dict):
+    """
+    Returns the PDF link of an edition, if one is available.
+    """
+    formats = edition_data.get('formats', {})
+
+    # Check if a PDF is available in formats
+    if 'pdf' in formats:
+        return formats['pdf'].get('url')
+
+    # Alternatively, check for Internet Archive links
+    if 'ocaid' in edition_data:
+        ocaid = edition_data['ocaid']
+        return f"https://archive.org/download/{ocaid}/{ocaid}.pdf"
+    return None
+
+
 def get_public_domain_textbooks(query: str):
     """
     Searches for textbooks in public domain libraries based on the user's query.
@@ -140,41 +200,35 @@ def get_public_domain_textbooks(query: str):
         str: A formatted string containing the search results with PDF links if available.
     """
     try:
-        # Use Open Library Search API
-        search_response = requests.get(
+        # Use Open Library Search API, asking only for the top 3 results and the fields we read
+        search_response = http_get(
             "https://openlibrary.org/search.json",
-            params={"title": query, "has_fulltext": "true"}
+            params={
+                "title": query,
+                "has_fulltext": "true",
+                "limit": 3,
+                "fields": "title,author_name,key,edition_key",
+            }
         )
+        search_response.raise_for_status()
         search_data = search_response.json()
         books = search_data.get("docs", [])[:3]  # Get top 3 results
 
         if not books:
             return "No textbooks found for your query."
 
+        # Fetch the editions of all results at once, so the search costs one round trip more instead of three
+        edition_keys = [(book.get('edition_key') or [None])[0] for book in books]
+        editions = list(_edition_pool.map(
+            lambda edition_key: _fetch_edition(edition_key) if edition_key else {}, edition_keys
+        ))
+
         results = "Here are some textbooks you might find useful:\n"
-        for book in books:
+        for book, edition_data in zip(books, editions):
             title = book.get("title", "Unknown Title")
             author = ', '.join(book.get("author_name", ["Unknown Author"]))
             work_key = book.get('key')
-            edition_key = book.get('edition_key', [None])[0]
-
-            # Initialize PDF link
-            pdf_link = None
-
-            if edition_key:
-                # Fetch edition data to check for available formats
-                edition_response = requests.get(f"https://openlibrary.org/books/{edition_key}.json")
-                edition_data = edition_response.json()
-                formats = edition_data.get('formats', {})
-
-                # Check if a PDF is available in formats
-                if 'pdf' in formats:
-                    pdf_link = formats['pdf'].get('url')
-
-                # Alternatively, check for Internet Archive links
-                elif 'ocaid' in edition_data:
-                    ocaid = edition_data['ocaid']
-                    pdf_link = f"https://archive.org/download/{ocaid}/{ocaid}.pdf"
+            pdf_link = _get_pdf_link(edition_data or {})
 
             # Fallback to the work link if no PDF is available
             if pdf_link:
@@ -186,6 +240,9 @@ def get_public_domain_textbooks(query: str):
 
             results += f"- {title} by {author}\n  {link_text}: {link}\n"
 
+        # A failed edition lookup turned a PDF link into a "Read online" one; don't cache that
+        if any(edition_data is None for edition_data in editions):
+            return PartialResult(results)
         return results
 
     except Exception as e:
@@ -205,10 +262,11 @@ def get_gutendex_domain_textbooks(query: str):
     """
     try:
         # Use Project Gutenberg's catalog via a third-party API
-        search_response = requests.get(
+        search_response = http_get(
             "http://gutendex.com/books",
             params={"search": query}
         )
+        search_response.raise_for_status()
         search_data = search_response.json()
         books = search_data.get("results", [])[:3]  # Get top 3 results
 
@@ -337,7 +395,8 @@ def get_job_listings(skills: str, location: str = None):
         params['where'] = location
 
     try:
-        response = requests.get(base_url, params=params)
+        response = http_get(base_url, params=params)
+        response.raise_for_status()
         data = response.json()
         results = data.get('results', [])
         if not results:
@@ -359,6 +418,50 @@ def get_job_listings(skills: str, location: str = None):
         return "Sorry, I couldn't fetch job listings at the moment."
     
 
+def search_memes(topic: str, limit: int = 1, offset: int = 0) -> list[str]:
+    """
+    Searches Giphy for memes related to the given topic.
+
+    Args:
+        topic (str): The topic to search memes for.
+        limit (int): The number of memes to return.
+        offset (int): The position of the first result.
+
+    Returns:
+        list[str]: URLs of the meme GIFs; empty if none were found.
+    """
+    response = http_get(
+        "https://api.giphy.com/v1/gifs/search",
+        params={
+            "api_key": os.getenv("GIPHY_API_KEY"),
+            "q": topic,
+            "limit": limit,
+            "offset": offset,
+            "rating": "pg-13",
+        }
+    )
+    response.raise_for_status()
+    return [gif["images"]["downsized_medium"]["url"] for gif in response.json()["data"]]
+
+
+async def asearch_memes(topic: str, limit: int = 1, offset: int = 0) -> list[str]:
+    """
+    Async version of search_memes.
+    """
+    response = await ahttp_get(
+        "https://api.giphy.com/v1/gifs/search",
+        params={
+            "api_key": os.getenv("GIPHY_API_KEY"),
+            "q": topic,
+            "limit": limit,
+            "offset": offset,
+            "rating": "pg-13",
+        }
+    )
+    response.raise_for_status()
+    return [gif["images"]["downsized_medium"]["url"] for gif in response.json()["data"]]
+
+
 def fetch_meme(topic: str) -> str:
     """
     Fetches a popular meme related to the given topic using Giphy API.
@@ -369,27 +472,33 @@ def fetch_meme(topic: str) -> str:
     Returns:
         str: URL of the fetched meme GIF.
     """
-    giphy_api_key = os.getenv("GIPHY_API_KEY")
-    if not giphy_api_key:
+    if not os.getenv("GIPHY_API_KEY"):
         return "Giphy API key is not configured."
 
     try:
-        response = requests.get(
-            "https://api.giphy.com/v1/gifs/search",
-            params={
-                "api_key": giphy_api_key,
-                "q": topic,
-                "limit": 1,
-                "rating": "pg-13",
-            }
-        )
-        data = response.json()
-        if data["data"]:
-            meme_url = data["data"][0]["images"]["downsized_medium"]["url"]
-            return meme_url
-        else:
-            return "No memes found for the given topic."
+        meme_urls = search_memes(topic)
+        return meme_urls[0] if meme_urls else "No memes found for the given topic."
+    except Exception as e:
+        print(f"Error fetching meme: {e}")
+        return "Failed to fetch meme."
+
+
+async def afetch_meme(topic: str) -> str:
+    """
+    Async version of fetch_meme.
+
+    Args:
+        topic (str): The topic to search memes for.
+
+    Returns:
+        str: URL of the fetched meme GIF.
+    """
+    if not os.getenv("GIPHY_API_KEY"):
+        return "Giphy API key is not configured."
+
+    try:
+        meme_urls = await asearch_memes(topic)
+        return meme_urls[0] if meme_urls else "No memes found for the given topic."
     except Exception as e:
         print(f"Error fetching meme: {e}")
         return "Failed to fetch meme."
-    
@@ -80,6 +80,176 @@ AGENT_FACTS = [
     }
 ]
 
+"""STEP 4: Define the tools available to the AI mentor agent."""
+AI_MENTOR_TOOL_NAMES = [
+    "gutendex_textbook_search",
+    "generate_suggestions",
+    "web_search_tavily",
+    "location_search_gplaces",
+    "textbook_search",
+    "user_profile_retrieval",
+    "agent_facts",
+    "generate_document",
+    "job_search",
+    "web_search_bing",
+    "fetch_meme",
+]
+
+"""STEP 5: Define the deadlines of the post-response stage (in seconds)."""
+MEME_BRANCH_TIMEOUT = 8
+TTS_BRANCH_TIMEOUT = 20
+POST_RESPONSE_MAX_WORKERS = 16
+SUMMARY_MAX_WORKERS = 2
+
+"""STEP 6: Define the budget of the past summaries placed in the prompt."""
+PAST_SUMMARIES_TOKEN_BUDGET = 800
+PAST_SUMMARIES_MAX_CHATS = 10
+PAST_SUMMARIES_CACHE_TTL = 600  # seconds
+PAST_SUMMARIES_CACHE_SIZE = 1024  # users
+PAST_SUMMARIES_VERSIONS_COLLECTION = "past_summaries_versions"  # per-user marker bumped whenever a summary is written
+
+"""STEP 7: Define the cache of the users' preferred languages used to pick the prompt prefix."""
+PREFERRED_LANGUAGE_CACHE_TTL = 600  # seconds
+PREFERRED_LANGUAGE_CACHE_SIZE = 4096  # users
+
+"""STEP 8: Define the window of the chat history placed in the prompt; older turns are replaced by the rolling summary."""
+CHAT_HISTORY_MAX_MESSAGES = 20
+CHAT_HISTORY_TOKEN_BUDGET = 2000
+
+"""STEP 9: Define the cache of the auxiliary LLM calls (meme topic, mood)."""
+LLM_CACHE_SIZE = 2048  # entries per call type
+LLM_CACHE_TTL = 3600  # seconds
+LLM_CACHE_SIMILARITY_THRESHOLD = 0.95  # cosine similarity for the optional semantic lookup
+LLM_CACHE_INITIAL_ROWS = 64  # embedding rows allocated up front; doubled as needed up to LLM_CACHE_SIZE
+MEME_TOPIC_KEY_TOKENS = 32  # leading words of the AI response that key its meme topic
+
+"""STEP 10: Define the background job queue that finalizes chats."""
+FINALIZATION_JOBS_COLLECTION = "finalization_jobs"
+FINALIZATION_WORKERS = 2
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 5  # seconds, doubled after every failed attempt
+JOB_BACKOFF_MAX = 300  # seconds
+JOB_POLL_INTERVAL = 2  # seconds
+JOB_LOCK_TIMEOUT = 600  # seconds before a running job of a dead worker is picked up again
+FINALIZATION_SHUTDOWN_TIMEOUT = 10  # seconds a stopping worker gets to finish its job before it is queued again
+
+"""STEP 11: Define the in-memory vector index used for small vector store collections."""
+VECTOR_SEARCH_BACKEND = "auto"  # "auto" (in memory up to IN_MEMORY_INDEX_MAX_DOCS), "memory" or "cosmos"
+IN_MEMORY_INDEX_MAX_DOCS = 10000
+IN_MEMORY_INDEX_REFRESH_INTERVAL = 60  # seconds between checks for collection changes
+
+"""STEP 12: Define the embedding cache in front of the embeddings model."""
+EMBEDDING_CACHE_COLLECTION = "embedding_cache"
+EMBEDDING_CACHE_SIZE = 5000  # vectors kept in memory (about 6 KB each for 1536 dimensions)
+EMBEDDING_CACHE_TTL = 7 * 86400  # seconds a vector is kept in MongoDB after it was first stored
+
+"""STEP 13: Define how the source collections of the vector stores are indexed."""
+VECTOR_STORE_SOURCES = {
+    "agent_facts": {"text_key": "fact", "metadata_keys": ["sample_query"]},
+}
+EMBEDDING_BATCH_SIZE = 64  # chunks per embeddings request during a sync
+VECTOR_STORE_LOCKS_COLLECTION = "vector_store_locks"  # one lock per vector store, so one process syncs it at a time
+VECTOR_STORE_SYNC_LOCK_TIMEOUT = 1800  # seconds before the lock of a dead syncing process can be taken over
+
+"""STEP 14: Define the throughput settings of the embedding ingestion pipeline."""
+EMBEDDING_CONCURRENCY = 4  # embedding batches in flight
+EMBEDDING_MAX_RETRIES = 6  # retries of a rate-limited or failed batch
+EMBEDDING_BACKOFF_BASE = 1  # seconds, doubled after every retry
+EMBEDDING_BACKOFF_MAX = 60  # seconds
+INGESTION_READ_BATCH_SIZE = 500  # source documents read from MongoDB at a time
+
+"""STEP 15: Define the semantic retrieval of past chat summaries."""
+PAST_SUMMARIES_TOP_K = 4  # most relevant past chats placed in the prompt
+PAST_SUMMARIES_INDEX_MAX_CHATS = 500  # newest summarized chats indexed per user
+PAST_SUMMARIES_MIN_QUERY_WORDS = 3  # shorter messages use the recent summaries without an embedding call
+PAST_SUMMARIES_SKIP_QUERIES = {"how are you", "how are you doing", "thanks a lot", "thank you so much", "see you later"}  # greetings of searchable length
+
+"""STEP 16: Define the quantized vector storage."""
+VECTOR_QUANTIZATION = "none"  # "none", "float16" or "int8"; overridden by the VECTOR_QUANTIZATION env variable
+VECTOR_RESCORE_FACTOR = 4  # candidates per requested result rescored with full-precision vectors
+VECTOR_INDEX_SCAN_BLOCK = 4096  # rows of vectors loaded or scored per block
+
+"""STEP 17: Define the shared HTTP client of the agent tools."""
+HTTP_CONNECT_TIMEOUT = 3.05  # seconds
+HTTP_READ_TIMEOUT = 10  # seconds
+HTTP_POOL_MAXSIZE = 10  # keep-alive connections per host
+HTTP_MAX_RETRIES = 2  # retries of idempotent requests on connection errors and retryable statuses
+HTTP_BACKOFF_FACTOR = 0.3  # seconds, doubled per retry
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+BING_SEARCH_DEFAULT_URL = "https://api.bing.microsoft.com/v7.0/search"  # overridden by the BING_SEARCH_URL env variable
+BING_SEARCH_RESULT_COUNT = 10
+GOOGLE_MAPS_RETRY_TIMEOUT = 10  # seconds the googlemaps client keeps retrying a Places request
+
+"""STEP 18: Define the Open Library edition lookups."""
+OPEN_LIBRARY_LOOKUP_WORKERS = 8  # edition lookups in flight across requests
+OPEN_LIBRARY_EDITION_CACHE_SIZE = 2048
+OPEN_LIBRARY_EDITION_CACHE_TTL = 86400  # seconds; edition formats rarely change
+
+"""STEP 19: Define the response cache of the external lookup tools."""
+# tool name -> (seconds a result is fresh, further seconds it is served stale while it is refreshed)
+TOOL_CACHE_TTLS = {
+    "web_search_tavily": (900, 3600),
+    "web_search_bing": (900, 3600),
+    "job_search": (3600, 21600),
+    "textbook_search": (86400, 604800),
+    "gutendex_textbook_search": (86400, 604800),
+}
+TOOL_CACHE_SIZE = 1024  # entries per tool
+TOOL_CACHE_REFRESH_WORKERS = 4
+
+"""STEP 20: Define the meme catalog refreshed in the background."""
+MEME_CATALOG_SEED_TOPICS = ["welcome", "hello", "introduction", "greeting", "funny"]
+MEME_CATALOG_URLS_PER_TOPIC = 10  # GIFs kept and rotated per topic
+MEME_CATALOG_MAX_TOPICS = 256
+MEME_CATALOG_REFRESH_MINUTES = 30
+MEME_CATALOG_TOPIC_TTL = 86400  # seconds a topic is kept and refreshed after its last use
+MEME_CATALOG_MAX_OFFSET = 50  # refreshes page through the first results of a topic
+MEME_CATALOG_COLLECTION = "meme_catalog"  # topics and their URLs, shared by every process
+MEME_CATALOG_LOCKS_COLLECTION = "meme_catalog_locks"
+MEME_CATALOG_LOCAL_TTL = 600  # seconds a process serves a topic from memory before reloading it
+MEME_CATALOG_REFRESH_MAX_TOPICS = 32  # least recently refreshed topics fetched per refresh
+MEME_CATALOG_REFRESH_LEASE = 25 * 60  # seconds; one process refreshes per interval, shorter than MEME_CATALOG_REFRESH_MINUTES
+
+"""STEP 21: Define the parallel execution of tool calls."""
+TOOL_CALL_MAX_WORKERS = 4  # calls of one tool in flight across all agent turns; a slow tool only fills its own pool
+TOOL_CALL_MAX_WORKERS_BY_TOOL = {  # tool name as called by the model -> calls in flight, overriding TOOL_CALL_MAX_WORKERS
+    "vector_search_agent_facts": 8,
+    "user_profile_retrieval": 8,
+}
+TOOL_CALL_MAX_PER_TURN = 4  # tool calls of one agent step in flight at once; the others wait for a free slot
+
+"""STEP 22: Define the latency budgets and circuit breakers of the tools."""
+# tool name as called by the model -> seconds before the model gets a fallback observation
+TOOL_TIMEOUTS = {
+    "vector_search_agent_facts": 5,
+    "user_profile_retrieval": 3,
+    "fetch_meme": 5,
+    "web_search_bing": 8,
+    "tavily_search_results_json": 8,
+    "google_places": 6,
+    "textbook_search": 8,
+    "gutendex_textbook_search": 8,
+    "job_search": 8,
+    "generate_suggestions": 8,
+    "generate_document": 20,
+}
+TOOL_DEFAULT_TIMEOUT = 10
+TOOL_SLOW_CALL_RATIO = 0.8  # a call slower than this share of its timeout counts against the breaker
+TOOL_BREAKER_FAILURE_THRESHOLD = 3  # consecutive failed or slow calls that open a breaker
+TOOL_BREAKER_RESET_TIMEOUT = 30  # seconds an open breaker rejects calls before a trial call
+
+"""STEP 23: Define the micro-batched sentiment analysis."""
+SENTIMENT_BATCH_MAX_SIZE = 10  # documents per Text Analytics sentiment request (the API limit)
+SENTIMENT_BATCH_MAX_WAIT = 0.01  # seconds a batch waits for more requests after its first one
+SENTIMENT_MAX_CONCURRENT_BATCHES = 4
+SENTIMENT_CACHE_SIZE = 4096
+SENTIMENT_CACHE_TTL = 86400  # seconds
+SENTIMENT_REQUEST_TIMEOUT = 10  # seconds a caller waits for its result
+
+"""STEP 24: Define the size of the agent prototype pool."""
+AGENT_POOL_MAX_PROTOTYPES = 16  # roles kept built; the least recently used are dropped first
+AGENT_ROLE_MAX_LENGTH = 100  # characters of a role requested by a client
+
 """Language mapping for language codes to language names."""
 language_mapping = {
         'en': 'English',
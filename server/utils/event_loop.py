@@ -0,0 +1,65 @@
+""" This module runs a process-wide asyncio event loop in a background thread. """
+""" Step 1: Import necessary modules """
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+""" Step 2: Define the event loop helpers """
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared event loop, starting its thread on first use.
+
+    Every async view and background coroutine of the process runs on this loop, so
+    loop-bound clients (async MongoDB, async HTTP) are created once and shared.
+    Coroutines on it must not block; synchronous calls go through asyncio.to_thread.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="shared-event-loop", daemon=True)
+                thread.start()
+                _loop = loop
+                logger.info("Started the shared event loop.")
+    return _loop
+
+
+def run_coroutine(coro, timeout: float = None):
+    """
+    Runs a coroutine on the shared event loop and blocks the calling thread until it finishes.
+    The caller's context variables (e.g. the Flask request context) are visible to the coroutine.
+
+    Args:
+        coro: The coroutine to run.
+        timeout (float, optional): Seconds to wait before raising TimeoutError.
+
+    Returns:
+        The coroutine's result.
+    """
+    loop = get_event_loop()
+    context = contextvars.copy_context()
+    future = Future()
+
+    def transfer(task: asyncio.Task):
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def schedule():
+        task = loop.create_task(coro, context=context)
+        task.add_done_callback(transfer)
+
+    loop.call_soon_threadsafe(schedule)
+    return future.result(timeout=timeout)
@@ -0,0 +1,46 @@
+""" This module contains helpers for counting and truncating prompt tokens. """
+""" Step 1: Import necessary modules """
+import logging
+from functools import lru_cache
+import tiktoken
+
+# Rough characters-per-token ratio used when the tokenizer cannot be loaded
+CHARS_PER_TOKEN = 4
+
+
+""" Step 2: Define the token helpers """
+@lru_cache(maxsize=1)
+def get_encoding():
+    # DeepSeek's tokenizer is not public; cl100k_base is a close enough estimate for budgeting
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.warning(f"Could not load the tokenizer, estimating tokens from characters: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Returns the approximate number of tokens in a text.
+    """
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncates a text to at most max_tokens tokens.
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])